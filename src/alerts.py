@@ -0,0 +1,112 @@
+"""Per-account failure alert suppression.
+
+Repeats of the same ``error_code`` are emailed at most once per
+``notify.failure_cooldown_seconds``; inside the window an alert still goes
+out when the consecutive count reaches one of ``notify.failure_escalate_counts``.
+State lives next to the success-email marker in the run store's ``meta``
+table and is cleared by the next successful check-in, which sends a single
+"resolved" email for the codes that were alerted on; if that email cannot be
+delivered the alerts stay open and the following success tries again.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import List, Optional
+
+from .config import Config
+from .store import open_store
+
+_KEY_PREFIX = "alert:"
+
+
+@dataclass
+class AlertState:
+    error_code: str
+    first_seen: str
+    last_seen: str
+    count: int = 0
+    sent: int = 0
+    last_sent: Optional[str] = None
+
+    @property
+    def suppressed(self) -> int:
+        """Failures not (yet) emailed, including one still being decided on."""
+        return self.count - self.sent
+
+
+@dataclass
+class AlertDecision:
+    send: bool
+    escalated: bool
+    state: AlertState
+
+
+class FailureAlerts:
+    def __init__(self, config: Config) -> None:
+        self._config = config
+        self._store = open_store(config)
+
+    def _key(self, error_code: str) -> str:
+        return f"{_KEY_PREFIX}{error_code}"
+
+    def _save(self, state: AlertState, now: datetime) -> None:
+        self._store.set_meta(self._config.account, self._key(state.error_code), json.dumps(asdict(state)), now=now)
+
+    def observe(self, error_code: str, now: datetime) -> AlertDecision:
+        """Count one failure and decide whether it warrants an email."""
+        raw = self._store.get_meta(self._config.account, self._key(error_code))
+        state = AlertState(**json.loads(raw)) if raw else AlertState(error_code, now.isoformat(), now.isoformat())
+        state.count += 1
+        state.last_seen = now.isoformat()
+        notify = self._config.notify
+        cooldown = notify.failure_cooldown_seconds
+        if state.last_sent is None or cooldown <= 0:
+            decision = AlertDecision(True, False, state)
+        elif (now - datetime.fromisoformat(state.last_sent)).total_seconds() >= cooldown:
+            decision = AlertDecision(True, False, state)
+        elif state.count in notify.failure_escalate_counts:
+            decision = AlertDecision(True, True, state)
+        else:
+            decision = AlertDecision(False, False, state)
+        self._save(state, now)
+        return decision
+
+    def mark_sent(self, state: AlertState, now: datetime) -> None:
+        state.sent += 1
+        state.last_sent = now.isoformat()
+        self._save(state, now)
+
+    def emailed(self) -> List[AlertState]:
+        """Open alerts that were emailed, i.e. those a "resolved" email should close."""
+        items = self._store.meta_items(self._config.account, _KEY_PREFIX)
+        states = [AlertState(**json.loads(raw)) for _, raw in sorted(items.items())]
+        return [state for state in states if state.sent]
+
+    def clear(self) -> None:
+        """Forget every open alert; call only once the "resolved" email is out (or none was due)."""
+        account = self._config.account
+        for key in self._store.meta_items(account, _KEY_PREFIX):
+            self._store.delete_meta(account, key)
+
+
+def annotate_failure(subject: str, body: str, decision: AlertDecision) -> tuple[str, str]:
+    """Mark repeats so the recipient can tell a new failure from an ongoing one."""
+    state = decision.state
+    if state.count <= 1:
+        return subject, body
+    label = "ESCALATED" if decision.escalated else "REPEAT"
+    note = (
+        f"{label}: {state.error_code} has failed {state.count} times since {state.first_seen}; "
+        f"{state.suppressed - 1} alert(s) suppressed.\n\n"
+    )
+    return f"{subject} [{label} x{state.count}]", note + body
+
+
+def resolved_lines(states: List[AlertState]) -> List[str]:
+    return [
+        f"{state.error_code}: {state.count} failure(s) from {state.first_seen} to {state.last_seen}, "
+        f"{state.sent} alert(s) sent"
+        for state in states
+    ]
@@ -1,16 +1,23 @@
 """Manual GitHub OAuth helper to seed the persistent session."""
 from __future__ import annotations
 
+import argparse
 import sys
+from pathlib import Path
+from typing import Sequence
 
-from playwright.sync_api import TimeoutError as PlaywrightTimeoutError, sync_playwright
+from playwright.sync_api import sync_playwright
 
 from .browser import launch_user_context
-from .config import load_config
+from .config import Config, load_config, select_accounts
 from .logging_setup import setup_logging
+from .profiling import add_profile_arguments, profile_run, should_profile
+from .state_check import navigate
+from .store import RunRecord, record_run
+from .timing import Spans
 from .utils import (
     SignInError,
-    append_history_entry,
+    auth_state_path,
     ensure_data_tree,
     generate_run_id,
     get_timezone,
@@ -19,14 +26,11 @@ from .utils import (
 )
 
 
-def main() -> int:
-    config = load_config()
-    tz = get_timezone(config.timezone)
-    ensure_data_tree(config.data_dir, config.screenshots_dir, config.userdata_dir, config.meta_dir)
-    run_id = generate_run_id()
-    logger = setup_logging(config, run_id)
-    start = now_tz(tz)
-    stage = "AUTH"
+_STAGE = "AUTH"
+
+
+def _authorize(config: Config, logger, spans: Spans, *, trace_path: Path | None = None) -> tuple[str, str, str]:
+    """Drive the manual OAuth flow and return ``(result, error_code, notes)``."""
     result = "AUTH_OK"
     error_code = ""
     notes = "GitHub OAuth completed"
@@ -36,13 +40,18 @@ def main() -> int:
     context = None
     try:
         with sync_playwright() as p:
-            context = launch_user_context(p, config, headless=False)
+            with spans.span("launch"):
+                context = launch_user_context(p, config, headless=False)
+            if trace_path is not None:
+                context.tracing.start(screenshots=True, snapshots=True)
             page = context.new_page()
             logger.info("Navigating to base URL", extra={"step": "navigate", "url": config.site.base_url})
-            try:
-                page.goto(config.site.base_url, wait_until="networkidle", timeout=config.run.nav_timeout_ms)
-            except PlaywrightTimeoutError as exc:
-                raise SignInError("NAV_TIMEOUT", "Timed out opening base URL", retryable=False) from exc
+            with spans.span("navigate"):
+                timings = navigate(page, config.site.base_url, config, ready_selectors=())
+            logger.info(
+                "Base URL loaded",
+                extra={"step": "navigate", "duration_ms": timings["total_ms"], "nav": timings},
+            )
 
             print(
                 """
@@ -55,44 +64,74 @@ Manual authorization required.
 """
             )
             input("Press ENTER once authorization is complete...")
-            context.storage_state(path=str(config.data_dir / "auth_state.json"))
+            context.storage_state(path=str(auth_state_path(config.data_dir)))
     except SignInError as exc:
         result = "AUTH_FAIL"
         error_code = exc.error_code
         notes = str(exc)
-        logger.error("Authorization failed", extra={"error_code": exc.error_code, "step": stage})
+        logger.error("Authorization failed", extra={"error_code": exc.error_code, "step": _STAGE})
     except Exception as exc:  # pragma: no cover - defensive
         result = "AUTH_FAIL"
         error_code = "UNKNOWN"
         notes = str(exc)
-        logger.exception("Unexpected failure during authorization", extra={"step": stage})
+        logger.exception("Unexpected failure during authorization", extra={"step": _STAGE})
 
     finally:
         if context is not None:
             try:
+                if trace_path is not None:
+                    context.tracing.stop(path=str(trace_path))
                 context.close()
             except Exception:  # pragma: no cover - defensive cleanup
-                logger.warning("Failed to close browser context", extra={"step": stage})
+                logger.warning("Failed to close browser context", extra={"step": _STAGE})
+    return result, error_code, notes
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Seed the persistent AnyRouter session via GitHub OAuth.")
+    parser.add_argument("--account", help="authorize this [[accounts]] entry instead of the default profile")
+    add_profile_arguments(parser)
+    args = parser.parse_args(list(argv) if argv is not None else [])
+
+    config = load_config()
+    if args.account:
+        config = select_accounts(config, [args.account])[0]
+    tz = get_timezone(config.timezone)
+    ensure_data_tree(config.data_dir, config.screenshots_dir, config.userdata_dir, config.meta_dir)
+    run_id = generate_run_id()
+    logger = setup_logging(config, run_id)
+    start = now_tz(tz)
+
+    spans = Spans()
+    with profile_run(
+        config,
+        run_id,
+        logger,
+        enabled=should_profile(args),
+        top=args.profile_top,
+        trace=args.profile_trace,
+        spans=spans,
+    ) as profile:
+        result, error_code, notes = _authorize(config, logger, spans, trace_path=profile.trace_path if profile else None)
 
     end = now_tz(tz)
     duration = serialize_duration_ms(start, end)
-    append_history_entry(
-        config.history_file,
-        config.run.history_limit,
-        [
-            end.isoformat(),
-            run_id,
-            stage,
-            result,
-            error_code,
-            "0",
-            str(duration),
-            notes,
-        ],
+    record_run(
+        config,
+        RunRecord(
+            ts=end,
+            run_id=run_id,
+            stage=_STAGE,
+            result=result,
+            error_code=error_code,
+            duration_ms=duration,
+            notes=notes,
+            spans=spans.summary(),
+        ),
     )
     logger.info("Authorization complete", extra={"result": result, "error_code": error_code})
     return 0 if result == "AUTH_OK" else 1
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,440 @@
+"""Concurrent multi-account check-in engine built on async Playwright."""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from .browser import ContextPool, ResourceBlocker, launch_user_context_async
+from .config import Config, load_config, select_accounts
+from .digest import BatchDigest, DigestRow
+from .http_checkin import FastPathUnavailable, HttpClient, use_http_fast_path
+from .logging_setup import RunLoggerAdapter, setup_logging
+from .notifier_email import EmailNotifier
+from .notifiers import build_notifier
+from .screenshots import capture_bytes_async, screenshot_file, screenshot_writer
+from .signin import _attempt_http, _finalize_run, skip_if_checked_in
+from .smtp_session import pooled_smtp
+from .state_check import ensure_logged_in_async, navigate_async, perform_checkin_async
+from .timing import Spans
+from .utils import (
+    CheckInOutcome,
+    SignInError,
+    auth_state_path,
+    build_screenshot_path,
+    ensure_data_tree,
+    exponential_backoff,
+    generate_run_id,
+    get_timezone,
+    now_tz,
+    serialize_duration_ms,
+)
+
+
+@dataclass
+class AccountResult:
+    account: str
+    run_id: str
+    exit_code: int
+    duration_ms: int
+    attempts: int
+    outcome: Optional[CheckInOutcome] = None
+    error: Optional[SignInError] = None
+
+    def digest_row(self) -> DigestRow:
+        if self.outcome is not None:
+            result, error_code = self.outcome.status, ""
+        elif self.attempts == 0 and self.exit_code == 0:
+            result, error_code = "SKIPPED", ""
+        else:
+            result, error_code = "CHECKIN_FAIL", self.error.error_code if self.error else "UNKNOWN"
+        return DigestRow(
+            account=self.account,
+            result=result,
+            error_code=error_code,
+            attempts=self.attempts,
+            duration_ms=self.duration_ms,
+            run_id=self.run_id,
+        )
+
+
+class _DriverHandle:
+    """Start the async Playwright driver on first use so HTTP-only batches never launch it."""
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self._factory = factory
+        self._manager: Any = None
+        self._playwright: Any = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Any:
+        async with self._lock:
+            if self._playwright is None:
+                self._manager = self._factory()
+                self._playwright = await self._manager.__aenter__()
+        return self._playwright
+
+    async def close(self) -> None:
+        manager, self._manager = self._manager, None
+        self._playwright = None
+        if manager is not None:
+            await manager.__aexit__(None, None, None)
+
+
+async def _capture_failure_artifacts_async(
+    page, config: Config, run_id: str, tz, *, attempt: int, error_code: str, spans: Spans | None = None
+) -> str | None:
+    if not config.run.screenshot_on_failure or page is None:
+        return None
+    screenshot_path = screenshot_file(
+        build_screenshot_path(config.screenshots_dir, run_id, now_tz(tz), attempt=attempt, error_code=error_code),
+        config.run,
+    )
+    try:
+        with (spans if spans is not None else Spans()).span("screenshot"):
+            data = await capture_bytes_async(page, config.run)
+        screenshot_writer().submit(data, screenshot_path, config.run)
+        return str(screenshot_path)
+    except Exception:  # pragma: no cover - defensive
+        return None
+
+
+async def _attempt_account(
+    driver: _DriverHandle,
+    config: Config,
+    logger,
+    run_id: str,
+    tz,
+    *,
+    attempt: int,
+    headless: bool,
+    blocker: ResourceBlocker | None = None,
+    pool: ContextPool | None = None,
+    spans: Spans | None = None,
+) -> CheckInOutcome:
+    spans = spans if spans is not None else Spans()
+    context = None
+    page = None
+    healthy = True
+    try:
+        with spans.span("launch"):
+            if pool is not None:
+                context = await pool.acquire(config, blocker=blocker)
+            else:
+                playwright = await driver.get()
+                context = await launch_user_context_async(playwright, config, headless=headless, blocker=blocker)
+        with spans.span("context"):
+            page = await context.new_page()
+        logger.info(
+            "Navigating to check-in page",
+            extra={"step": "navigate", "url": config.site.checkin_url, "attempt": attempt},
+        )
+        with spans.span("navigate"):
+            timings = await navigate_async(page, config.site.checkin_url, config)
+        logger.info(
+            "Page ready",
+            extra={"step": "navigate", "attempt": attempt, "duration_ms": timings["total_ms"], "nav": timings},
+        )
+
+        with spans.span("login"):
+            await ensure_logged_in_async(page, config)
+        outcome = await perform_checkin_async(page, config, spans=spans)
+        logger.info("Outcome", extra={"result": outcome.status, "attempt": attempt, "url": page.url})
+        if config.run.http_fast_path and pool is None:
+            try:
+                await context.storage_state(path=str(auth_state_path(config.data_dir)))
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.warning("Failed to refresh storage state", extra={"step": "storage_state"}, exc_info=exc)
+        return outcome
+    except SignInError as exc:
+        exc.screenshot_path = await _capture_failure_artifacts_async(
+            page, config, run_id, tz, attempt=attempt, error_code=exc.error_code, spans=spans
+        )
+        raise
+    except PlaywrightTimeoutError as exc:
+        error = SignInError("NAV_TIMEOUT", "Navigation timeout during check-in")
+        error.screenshot_path = await _capture_failure_artifacts_async(
+            page, config, run_id, tz, attempt=attempt, error_code=error.error_code, spans=spans
+        )
+        raise error from exc
+    except Exception as exc:
+        healthy = False
+        error = SignInError("UNKNOWN", f"Unexpected error: {exc}")
+        error.screenshot_path = await _capture_failure_artifacts_async(
+            page, config, run_id, tz, attempt=attempt, error_code=error.error_code, spans=spans
+        )
+        raise error from exc
+    finally:
+        if context is not None:
+            try:
+                if pool is not None:
+                    if page is not None:
+                        await page.close()
+                    await pool.release(config, context, healthy=healthy)
+                else:
+                    await context.close()
+            except Exception as close_exc:  # pragma: no cover - defensive
+                logger.warning(
+                    "Failed to close browser context cleanly",
+                    extra={"step": "cleanup", "attempt": attempt},
+                    exc_info=close_exc,
+                )
+
+
+async def _run_account(
+    driver: _DriverHandle,
+    semaphore: asyncio.Semaphore,
+    config: Config,
+    tz,
+    http_client: HttpClient | None,
+    pool: ContextPool | None = None,
+    *,
+    force: bool = False,
+    digest: BatchDigest | None = None,
+    heartbeat: Callable[[], None] | None = None,
+) -> AccountResult:
+    beat = heartbeat or (lambda: None)
+    run_id = generate_run_id()
+    logger = RunLoggerAdapter(logging.getLogger("anyrouter"), extra={"run_id": run_id, "account": config.account})
+    if not force:
+        current = now_tz(tz)
+        if await asyncio.to_thread(skip_if_checked_in, config, logger, run_id, current):
+            return AccountResult(account=config.account, run_id=run_id, exit_code=0, duration_ms=0, attempts=0)
+    async with semaphore:
+        ensure_data_tree(config.data_dir, config.screenshots_dir, config.userdata_dir, config.meta_dir)
+        email = digest.notifier_for(config) if digest is not None else EmailNotifier(config, tz)
+        notifier = build_notifier(config, email, logger)
+        logger.info("Starting scheduled check-in", extra={"step": "start"})
+        start = now_tz(tz)
+
+        outcome: CheckInOutcome | None = None
+        error: SignInError | None = None
+        attempts_used = 0
+        spans = Spans()
+        blocker = ResourceBlocker.from_config(config)
+        use_http = http_client is not None and use_http_fast_path(config)
+        for attempt in range(1, config.run.max_retries + 1):
+            headless = config.run.headless_preferred
+            if attempt > 1 and config.run.fallback_to_headed_on_retry:
+                headless = False
+            beat()
+            logger.info(
+                "Attempting check-in",
+                extra={"step": "attempt", "attempt": attempt, "headless": headless},
+            )
+            try:
+                if use_http:
+                    try:
+                        outcome = await asyncio.to_thread(
+                            _attempt_http, config, logger, http_client, attempt=attempt, spans=spans
+                        )
+                    except FastPathUnavailable as exc:
+                        logger.warning(
+                            "HTTP fast path unavailable; falling back to browser",
+                            extra={"step": "http", "error_code": exc.error_code, "attempt": attempt},
+                        )
+                        use_http = False
+                if outcome is None:
+                    outcome = await _attempt_account(
+                        driver,
+                        config,
+                        logger,
+                        run_id,
+                        tz,
+                        attempt=attempt,
+                        headless=headless,
+                        blocker=blocker,
+                        pool=pool,
+                        spans=spans,
+                    )
+                attempts_used = attempt
+                break
+            except SignInError as exc:
+                attempts_used = attempt
+                error = exc
+                logger.error(
+                    "Check-in attempt failed",
+                    extra={
+                        "step": "attempt",
+                        "attempt": attempt,
+                        "error_code": exc.error_code,
+                        "retryable": exc.retryable,
+                    },
+                )
+                if not exc.retryable or attempt >= config.run.max_retries:
+                    break
+                delay = exponential_backoff(config.run.retry_backoff_seconds, attempt)
+                logger.info("Retrying after backoff", extra={"step": "retry", "delay": delay})
+                await asyncio.sleep(delay)
+
+        beat()
+        end = now_tz(tz)
+        if blocker is not None:
+            logger.info("Resource blocking summary", extra={"step": "resources", "blocked": blocker.summary()})
+    # History and SMTP are blocking; keep them off the event loop and outside the slot.
+    with notifier:
+        exit_code = await asyncio.to_thread(
+            _finalize_run,
+            config,
+            logger,
+            notifier,
+            run_id,
+            start=start,
+            end=end,
+            outcome=outcome,
+            error=error,
+            attempts_used=attempts_used,
+            spans=spans,
+        )
+    return AccountResult(
+        account=config.account,
+        run_id=run_id,
+        exit_code=exit_code,
+        duration_ms=serialize_duration_ms(start, end),
+        attempts=attempts_used,
+        outcome=outcome,
+        error=error,
+    )
+
+
+class BatchEngine:
+    """Async driver, context pool and HTTP client shared by batch runs until :meth:`close`.
+
+    :func:`run_batch` uses one engine per call; the daemon keeps one across
+    firings so the driver and pooled contexts stay warm between slots.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        accounts: Sequence[Config],
+        *,
+        concurrency: int | None = None,
+        driver_factory: Callable[[], Any] | None = None,
+    ) -> None:
+        self.config = config
+        self.tz = get_timezone(config.timezone)
+        self.limit = max(1, concurrency or config.run.account_concurrency)
+        if driver_factory is None:
+            from playwright.async_api import async_playwright
+
+            driver_factory = async_playwright
+        self._driver = _DriverHandle(driver_factory)
+        self._http_client = None
+        if any(use_http_fast_path(account) for account in accounts):
+            self._http_client = HttpClient(timeout=config.run.nav_timeout_ms / 1000, max_idle_per_origin=self.limit)
+        self._pool = ContextPool(self._driver.get, config) if config.run.browser_mode == "pool" else None
+
+    async def warm_up(self) -> None:
+        """Start the driver (and the pool's shared Chromium) ahead of the first run."""
+        if self._pool is not None:
+            await self._pool.start()
+        else:
+            await self._driver.get()
+
+    async def run(
+        self,
+        accounts: Sequence[Config],
+        *,
+        force: bool = False,
+        digest: bool | None = None,
+        heartbeat: Callable[[], None] | None = None,
+    ) -> list[AccountResult]:
+        semaphore = asyncio.Semaphore(self.limit)
+        if digest is None:
+            digest = self.config.notify.digest
+        batch_digest = BatchDigest(self.config, self.tz) if digest else None
+        with pooled_smtp():
+            results = list(
+                await asyncio.gather(
+                    *(
+                        _run_account(
+                            self._driver,
+                            semaphore,
+                            account,
+                            self.tz,
+                            self._http_client,
+                            self._pool,
+                            force=force,
+                            digest=batch_digest,
+                            heartbeat=heartbeat,
+                        )
+                        for account in accounts
+                    )
+                )
+            )
+            if batch_digest is not None:
+                await asyncio.to_thread(batch_digest.send, [result.digest_row() for result in results])
+        return results
+
+    async def close(self) -> None:
+        try:
+            if self._http_client is not None:
+                self._http_client.close()
+            if self._pool is not None:
+                await self._pool.close()
+        finally:
+            await self._driver.close()
+
+
+async def run_batch(
+    config: Config,
+    accounts: Sequence[Config],
+    *,
+    concurrency: int | None = None,
+    driver_factory: Callable[[], Any] | None = None,
+    force: bool = False,
+    digest: bool | None = None,
+) -> list[AccountResult]:
+    """Check in every account on one async Playwright driver with bounded concurrency.
+
+    Emails go out over shared SMTP connections; with ``digest`` (default
+    ``notify.digest``) they are folded into one message sent after all accounts finish.
+    """
+    engine = BatchEngine(config, accounts, concurrency=concurrency, driver_factory=driver_factory)
+    try:
+        return await engine.run(accounts, force=force, digest=digest)
+    finally:
+        await engine.close()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Check in several AnyRouter accounts concurrently.")
+    parser.add_argument("--account", action="append", dest="accounts", help="limit the run to this account")
+    parser.add_argument("--concurrency", type=int, help="override run.account_concurrency")
+    parser.add_argument("--force", action="store_true", help="ignore today's recorded successes")
+    parser.add_argument(
+        "--digest",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="send one summary email for the whole batch (default: notify.digest)",
+    )
+    args = parser.parse_args(list(argv) if argv is not None else [])
+
+    config = load_config()
+    accounts = select_accounts(config, args.accounts)
+    ensure_data_tree(config.data_dir, config.screenshots_dir, config.userdata_dir, config.meta_dir)
+    batch_id = generate_run_id()
+    logger = setup_logging(config, batch_id)
+    logger.info(
+        "Starting batch check-in",
+        extra={"step": "batch", "accounts": len(accounts), "concurrency": args.concurrency},
+    )
+    results = asyncio.run(
+        run_batch(config, accounts, concurrency=args.concurrency, force=args.force, digest=args.digest)
+    )
+    failed = [result.account for result in results if result.exit_code != 0]
+    logger.info(
+        "Batch check-in finished",
+        extra={"step": "batch", "result": "FAIL" if failed else "OK", "failed": failed},
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
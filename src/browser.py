@@ -1,15 +1,24 @@
 """Browser helper utilities for Playwright launches."""
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Dict, List
+import asyncio
+import re
+from collections import Counter, OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
 
 if TYPE_CHECKING:  # pragma: no cover - imported for type checking only
-    from playwright.sync_api import BrowserContext, Playwright
+    from playwright.sync_api import BrowserContext, Page, Playwright
 else:  # pragma: no cover - runtime fallback for tests without Playwright
     BrowserContext = object  # type: ignore[assignment]
+    Page = object  # type: ignore[assignment]
     Playwright = object  # type: ignore[assignment]
 
-from .config import Config
+from .config import Config, RunConfig
+from .timing import Spans
+from .utils import auth_state_path
 
 
 def _accept_language_header(locale: str | None) -> str:
@@ -21,8 +30,69 @@ def _accept_language_header(locale: str | None) -> str:
     return f"{locale},{lang};q=0.9,en;q=0.8"
 
 
-def launch_user_context(playwright: Playwright, config: Config, *, headless: bool) -> BrowserContext:
-    """Launch the persistent Chromium context optimized for automation."""
+class ResourceBlocker:
+    """Route handler aborting requests that are irrelevant to the check-in flow.
+
+    A request is blocked when its resource type is listed in
+    ``run.block_resource_types`` or its URL matches ``run.block_url_patterns``,
+    unless the URL matches ``run.allow_url_patterns``. Patterns are regular
+    expressions searched in the full URL.
+    """
+
+    def __init__(self, run_cfg: RunConfig) -> None:
+        self._types = frozenset(t.lower() for t in run_cfg.block_resource_types)
+        self._deny = [re.compile(p) for p in run_cfg.block_url_patterns]
+        self._allow = [re.compile(p) for p in run_cfg.allow_url_patterns]
+        self.allowed = 0
+        self.blocked: Counter[str] = Counter()
+
+    @classmethod
+    def from_config(cls, config: Config) -> Optional["ResourceBlocker"]:
+        run_cfg = config.run
+        if not (run_cfg.block_resource_types or run_cfg.block_url_patterns):
+            return None
+        return cls(run_cfg)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if any(pattern.search(url) for pattern in self._allow):
+            return False
+        return resource_type in self._types or any(pattern.search(url) for pattern in self._deny)
+
+    def _decide(self, route) -> bool:
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked[request.resource_type] += 1
+            return True
+        self.allowed += 1
+        return False
+
+    def handle(self, route) -> None:
+        if self._decide(route):
+            route.abort("blockedbyclient")
+        else:
+            route.continue_()
+
+    async def handle_async(self, route) -> None:
+        if self._decide(route):
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    def install(self, context: BrowserContext) -> None:
+        context.route("**/*", self.handle)
+
+    async def install_async(self, context: Any) -> None:
+        await context.route("**/*", self.handle_async)
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "requests": sum(self.blocked.values()),
+            "allowed": self.allowed,
+            "by_type": dict(self.blocked),
+        }
+
+
+def _persistent_launch_kwargs(config: Config, *, headless: bool) -> Dict[str, object]:
     launch_args: List[str] = [str(arg) for arg in config.run.chromium_launch_args]
     locale = config.run.browser_locale
     if locale and not any(arg.startswith("--lang=") for arg in launch_args):
@@ -36,21 +106,367 @@ def launch_user_context(playwright: Playwright, config: Config, *, headless: boo
         launch_kwargs["locale"] = locale
     if launch_args:
         launch_kwargs["args"] = launch_args
+    return launch_kwargs
 
-    context = playwright.chromium.launch_persistent_context(**launch_kwargs)
-    accept_language = config.run.accept_language or _accept_language_header(locale)
-    context.set_extra_http_headers({"Accept-Language": accept_language})
-    context.set_default_navigation_timeout(config.run.nav_timeout_ms)
-    context.set_default_timeout(config.run.action_timeout_ms)
-    if locale:
-        context.add_init_script(
-            """
+
+def _locale_init_script(locale: str) -> str:
+    return (
+        """
             (() => {
                 const locale = %r;
                 Object.defineProperty(navigator, 'language', { value: locale, configurable: true });
                 Object.defineProperty(navigator, 'languages', { value: [locale, 'en'], configurable: true });
             })();
             """
-            % locale
-        )
+        % locale
+    )
+
+
+def launch_user_context(
+    playwright: Playwright,
+    config: Config,
+    *,
+    headless: bool,
+    blocker: Optional[ResourceBlocker] = None,
+) -> BrowserContext:
+    """Launch the persistent Chromium context optimized for automation."""
+    context = playwright.chromium.launch_persistent_context(
+        **_persistent_launch_kwargs(config, headless=headless)
+    )
+    locale = config.run.browser_locale
+    accept_language = config.run.accept_language or _accept_language_header(locale)
+    context.set_extra_http_headers({"Accept-Language": accept_language})
+    context.set_default_navigation_timeout(config.run.nav_timeout_ms)
+    context.set_default_timeout(config.run.action_timeout_ms)
+    if locale:
+        context.add_init_script(_locale_init_script(locale))
+    if blocker is not None:
+        blocker.install(context)
     return context
+
+
+async def launch_user_context_async(
+    playwright: Any,
+    config: Config,
+    *,
+    headless: bool,
+    blocker: Optional[ResourceBlocker] = None,
+) -> Any:
+    """Async Playwright counterpart of :func:`launch_user_context`."""
+    context = await playwright.chromium.launch_persistent_context(
+        **_persistent_launch_kwargs(config, headless=headless)
+    )
+    await _configure_context_async(context, config)
+    if blocker is not None:
+        await blocker.install_async(context)
+    return context
+
+
+async def _configure_context_async(context: Any, config: Config) -> None:
+    locale = config.run.browser_locale
+    accept_language = config.run.accept_language or _accept_language_header(locale)
+    await context.set_extra_http_headers({"Accept-Language": accept_language})
+    context.set_default_navigation_timeout(config.run.nav_timeout_ms)
+    context.set_default_timeout(config.run.action_timeout_ms)
+    if locale:
+        await context.add_init_script(_locale_init_script(locale))
+
+
+@dataclass
+class _PooledContext:
+    context: Any
+    uses: int = 0
+    busy: bool = False
+
+
+class ContextPool:
+    """Serve many accounts from one shared Chromium through lightweight contexts.
+
+    Each account gets its own ``browser.new_context`` seeded from its
+    ``auth_state.json``. Idle contexts are kept for reuse until they have served
+    ``run.pool_context_max_uses`` runs; at most ``run.pool_max_contexts`` are
+    open at once, evicting the least recently used idle context when full.
+    """
+
+    def __init__(self, get_playwright: Callable[[], Awaitable[Any]], config: Config) -> None:
+        self._get_playwright = get_playwright
+        self._config = config
+        self._max_contexts = max(1, config.run.pool_max_contexts)
+        self._max_uses = max(1, config.run.pool_context_max_uses)
+        self._browser: Any = None
+        self._entries: "OrderedDict[str, _PooledContext]" = OrderedDict()
+        self._reserved = 0
+        self._cond = asyncio.Condition()
+        self._browser_lock = asyncio.Lock()
+
+    async def _ensure_browser(self) -> Any:
+        async with self._browser_lock:
+            if self._browser is None:
+                playwright = await self._get_playwright()
+                launch_kwargs = _persistent_launch_kwargs(self._config, headless=self._config.run.headless_preferred)
+                launch_kwargs.pop("user_data_dir")
+                launch_kwargs.pop("locale", None)
+                self._browser = await playwright.chromium.launch(**launch_kwargs)
+        return self._browser
+
+    async def _new_context(self, config: Config) -> Any:
+        browser = await self._ensure_browser()
+        kwargs: Dict[str, object] = {}
+        state_file = auth_state_path(config.data_dir)
+        if state_file.exists():
+            kwargs["storage_state"] = str(state_file)
+        if config.run.browser_locale:
+            kwargs["locale"] = config.run.browser_locale
+        context = await browser.new_context(**kwargs)
+        await _configure_context_async(context, config)
+        return context
+
+    def _evict_idle(self) -> Optional[Any]:
+        for name, entry in self._entries.items():
+            if not entry.busy:
+                del self._entries[name]
+                return entry.context
+        return None
+
+    async def acquire(self, config: Config, *, blocker: Optional[ResourceBlocker] = None) -> Any:
+        name = config.account
+        evicted = None
+        async with self._cond:
+            while True:
+                entry = self._entries.get(name)
+                if entry is not None and not entry.busy:
+                    entry.busy = True
+                    entry.uses += 1
+                    self._entries.move_to_end(name)
+                    context = entry.context
+                    break
+                if entry is None:
+                    if len(self._entries) + self._reserved < self._max_contexts:
+                        self._reserved += 1
+                        context = None
+                        break
+                    evicted = self._evict_idle()
+                    if evicted is not None:
+                        self._reserved += 1
+                        context = None
+                        break
+                await self._cond.wait()
+        if evicted is not None:
+            with suppress(Exception):
+                await evicted.close()
+        if context is None:
+            try:
+                context = await self._new_context(config)
+            except BaseException:
+                async with self._cond:
+                    self._reserved -= 1
+                    self._cond.notify_all()
+                raise
+            async with self._cond:
+                self._reserved -= 1
+                self._entries[name] = _PooledContext(context=context, uses=1, busy=True)
+        else:
+            await context.unroute_all(behavior="ignoreErrors")
+        if blocker is not None:
+            await blocker.install_async(context)
+        return context
+
+    async def release(self, config: Config, context: Any, *, healthy: bool = True) -> None:
+        """Write the account's storage state back and recycle the context when due."""
+        name = config.account
+        if healthy:
+            try:
+                await context.storage_state(path=str(auth_state_path(config.data_dir)))
+            except Exception:
+                healthy = False
+        async with self._cond:
+            entry = self._entries.get(name)
+            retire = entry is None or entry.context is not context or not healthy or entry.uses >= self._max_uses
+            if entry is not None and entry.context is context:
+                if retire:
+                    del self._entries[name]
+                else:
+                    entry.busy = False
+            self._cond.notify_all()
+        if retire:
+            with suppress(Exception):
+                await context.close()
+
+    async def start(self) -> None:
+        """Launch the shared Chromium now instead of on the first :meth:`acquire`."""
+        await self._ensure_browser()
+
+    async def close(self) -> None:
+        async with self._cond:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            with suppress(Exception):
+                await entry.context.close()
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            with suppress(Exception):
+                await browser.close()
+
+
+class BrowserSession:
+    """Run-scoped Playwright driver and persistent context shared across attempts.
+
+    The driver and Chromium are started lazily on the first :meth:`new_page`
+    call and kept alive until :meth:`close`. Each attempt receives a fresh page
+    on the same context; the context is only relaunched when the requested
+    headless mode changes or the previous attempt invalidated it.
+
+    When ``run.trace_on_failure`` or ``trace_path`` is set, each launched
+    context records a Playwright trace and every attempt is one trace chunk
+    (:meth:`start_trace_chunk` / :meth:`stop_trace_chunk`). A chunk stopped
+    without a path is discarded in the browser and never written to disk,
+    unless ``trace_path`` (profiling) asks for every attempt to be kept as
+    ``trace-1.zip``, ``trace-2.zip``, ...
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        *,
+        driver_factory: Callable[[], Any] | None = None,
+        trace_path: Path | None = None,
+    ) -> None:
+        self._config = config
+        self._driver_factory = driver_factory
+        self._trace_path = trace_path
+        self._tracing = False
+        self._chunk_open = False
+        self._chunks = 0
+        self._driver_manager: Any = None
+        self._playwright: Playwright | None = None
+        self._context: BrowserContext | None = None
+        self._headless: bool | None = None
+        self._healthy = False
+        self.launches = 0
+        self.blocker = ResourceBlocker.from_config(config)
+
+    @property
+    def context(self) -> BrowserContext | None:
+        return self._context
+
+    @property
+    def headless(self) -> bool | None:
+        return self._headless
+
+    def _start_driver(self) -> Playwright:
+        if self._playwright is None:
+            factory = self._driver_factory
+            if factory is None:
+                from playwright.sync_api import sync_playwright
+
+                factory = sync_playwright
+            self._driver_manager = factory()
+            self._playwright = self._driver_manager.start()
+        return self._playwright
+
+    def _close_context(self) -> None:
+        context, self._context = self._context, None
+        self._headless = None
+        self._healthy = False
+        if context is not None:
+            if self._tracing:
+                self._stop_chunk(context, None)
+                with suppress(Exception):
+                    context.tracing.stop()
+            with suppress(Exception):
+                context.close()
+        self._tracing = False
+        self._chunk_open = False
+
+    def _start_trace(self, context: BrowserContext) -> None:
+        run_cfg = self._config.run
+        if self._trace_path is None and not run_cfg.trace_on_failure:
+            return
+        with suppress(Exception):
+            context.tracing.start(screenshots=run_cfg.trace_screenshots, snapshots=run_cfg.trace_snapshots)
+            self._tracing = True
+
+    def start_trace_chunk(self) -> None:
+        """Begin recording the current attempt; a no-op when tracing is off."""
+        if not self._tracing or self._context is None or self._chunk_open:
+            return
+        with suppress(Exception):
+            self._context.tracing.start_chunk()
+            self._chunk_open = True
+            self._chunks += 1
+
+    def _stop_chunk(self, context: BrowserContext, path: Path | None) -> Path | None:
+        if not self._chunk_open:
+            return None
+        self._chunk_open = False
+        if path is None and self._trace_path is not None:
+            path = self._trace_path.with_name(f"{self._trace_path.stem}-{self._chunks}{self._trace_path.suffix}")
+        try:
+            if path is None:
+                context.tracing.stop_chunk()
+                return None
+            path.parent.mkdir(parents=True, exist_ok=True)
+            context.tracing.stop_chunk(path=str(path))
+            return path
+        except Exception:
+            return None
+
+    def stop_trace_chunk(self, path: Path | None = None) -> Path | None:
+        """End the current attempt's chunk, saving it to ``path`` or discarding it.
+
+        Returns the file written, if any.
+        """
+        if self._context is None:
+            self._chunk_open = False
+            return None
+        return self._stop_chunk(self._context, path)
+
+    def _reset_context(self, context: BrowserContext) -> None:
+        for page in list(context.pages):
+            page.close()
+        context.unroute_all(behavior="ignoreErrors")
+        if self.blocker is not None:
+            self.blocker.install(context)
+
+    def new_page(self, *, headless: bool, spans: Spans | None = None) -> Page:
+        """Return a fresh page, relaunching Chromium only when required."""
+        spans = spans if spans is not None else Spans()
+        if self._context is not None and (not self._healthy or self._headless != headless):
+            self._close_context()
+        with spans.span("context"):
+            if self._context is not None:
+                try:
+                    self._reset_context(self._context)
+                except Exception:
+                    self._close_context()
+        if self._context is None:
+            with spans.span("launch"):
+                playwright = self._start_driver()
+                self._context = launch_user_context(
+                    playwright, self._config, headless=headless, blocker=self.blocker
+                )
+            self._headless = headless
+            self._healthy = True
+            self.launches += 1
+            self._start_trace(self._context)
+        with spans.span("context"):
+            return self._context.new_page()
+
+    def invalidate(self) -> None:
+        """Mark the context as crashed so the next attempt relaunches it."""
+        self._healthy = False
+
+    def close(self) -> None:
+        self._close_context()
+        manager, self._driver_manager = self._driver_manager, None
+        self._playwright = None
+        if manager is not None:
+            with suppress(Exception):
+                manager.stop()
+
+    def __enter__(self) -> "BrowserSession":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -1,9 +1,10 @@
 """Configuration loading utilities for AnyRouter automation."""
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
+from datetime import time as dtime
 from pathlib import Path
-from typing import Any, Dict, Optional, Sequence
+from typing import Any, Dict, Mapping, Optional, Sequence
 
 try:  # Python 3.11+
     import tomllib  # type: ignore[attr-defined]
@@ -23,19 +24,49 @@ class SMTPConfig:
     recipients: Sequence[str] = field(default_factory=list)
 
 
+WEBHOOK_EVENTS: Sequence[str] = ("success", "failure", "resolved")
+
+
+@dataclass
+class WebhookConfig:
+    url: str
+    name: str = "webhook"
+    events: Sequence[str] = ("failure", "resolved")
+    timeout_seconds: float = 5.0
+    headers: Mapping[str, str] = field(default_factory=dict)
+
+
 @dataclass
 class NotifyConfig:
     enable_email: bool = False
     success_email_once_per_day: bool = True
     email_on_failure_always: bool = True
     smtp: Optional[SMTPConfig] = None
+    outbox: bool = False
+    outbox_max_attempts: int = 10
+    outbox_backoff_seconds: Sequence[float] = field(default_factory=lambda: (30.0, 120.0, 600.0, 1800.0, 3600.0))
+    outbox_flush_seconds: float = 5.0
+    digest: bool = False
+    digest_max_attachment_bytes: int = 5_000_000
+    failure_cooldown_seconds: float = 86400.0
+    failure_escalate_counts: Sequence[int] = field(default_factory=lambda: (3, 10))
+    email_timeout_seconds: float = 30.0
+    webhooks: Sequence[WebhookConfig] = field(default_factory=tuple)
 
 
 @dataclass
 class ScheduleConfig:
     times: Sequence[str] = field(default_factory=lambda: ("08:30", "12:30", "20:30"))
+    jitter_seconds: float = 0.0
+    catch_up_seconds: float = 21600.0
+    warm_browser: bool = True
 
 
+DEFAULT_ACCOUNT = "default"
+BROWSER_MODES: Sequence[str] = ("persistent", "pool")
+NAV_WAIT_STRATEGIES: Sequence[str] = ("commit", "domcontentloaded", "load", "networkidle")
+SCREENSHOT_MODES: Sequence[str] = ("full_page", "viewport", "element")
+SCREENSHOT_FORMATS: Sequence[str] = ("png", "jpeg", "webp")
 DEFAULT_BROWSER_LOCALE = "en-US"
 DEFAULT_CHROMIUM_ARGS: Sequence[str] = (
     "--disable-extensions",
@@ -52,17 +83,39 @@ class RunConfig:
     headless_preferred: bool = True
     fallback_to_headed_on_retry: bool = True
     nav_timeout_ms: int = 20000
+    nav_wait_until: str = "networkidle"
+    nav_ready_selectors: Sequence[str] = field(default_factory=tuple)
     action_timeout_ms: int = 15000
     max_retries: int = 3
     retry_backoff_seconds: Sequence[float] = field(default_factory=lambda: (1.0, 4.0, 9.0))
     history_limit: int = 1000
+    history_csv: bool = True
     screenshot_on_failure: bool = True
     trace_on_failure: bool = False
     log_max_bytes: int = 1_000_000
-    log_backup_count: int = 7
+    log_max_total_bytes: int = 20_000_000
+    log_rotate_daily: bool = False
+    log_compress: bool = True
     chromium_launch_args: Sequence[str] = field(default_factory=lambda: tuple(DEFAULT_CHROMIUM_ARGS))
     browser_locale: str = DEFAULT_BROWSER_LOCALE
     accept_language: Optional[str] = None
+    account_concurrency: int = 4
+    http_fast_path: bool = False
+    browser_mode: str = "persistent"
+    pool_max_contexts: int = 8
+    pool_context_max_uses: int = 20
+    block_resource_types: Sequence[str] = field(default_factory=tuple)
+    block_url_patterns: Sequence[str] = field(default_factory=tuple)
+    allow_url_patterns: Sequence[str] = field(default_factory=tuple)
+    profile_max_bytes: int = 50_000_000
+    trace_screenshots: bool = True
+    trace_snapshots: bool = True
+    trace_max_bytes: int = 100_000_000
+    screenshot_mode: str = "viewport"
+    screenshot_clip_selectors: Sequence[str] = field(default_factory=tuple)
+    screenshot_format: str = "jpeg"
+    screenshot_quality: int = 70
+    screenshot_email_max_width: int = 1024
 
 
 @dataclass
@@ -74,10 +127,23 @@ class SelectorConfig:
     already_checked: Sequence[str] = field(default_factory=list)
 
 
+@dataclass
+class CheckinResponseConfig:
+    url_pattern: Optional[str] = None
+    method: Optional[str] = None
+    timeout_ms: Optional[int] = None
+    success: Mapping[str, Any] = field(default_factory=dict)
+    already: Mapping[str, Any] = field(default_factory=dict)
+    auth_statuses: Sequence[int] = field(default_factory=lambda: (401, 403))
+
+
 @dataclass
 class SiteConfig:
     base_url: str
     checkin_url: str
+    checkin_api_url: Optional[str] = None
+    checkin_api_method: str = "POST"
+    checkin_api_headers: Mapping[str, str] = field(default_factory=dict)
 
 
 @dataclass
@@ -85,6 +151,21 @@ class LoggingConfig:
     log_file: Path
 
 
+DEFAULT_DURATION_BUCKETS: Sequence[float] = (1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+
+@dataclass
+class MetricsConfig:
+    textfile: Optional[Path] = None
+    duration_buckets: Sequence[float] = field(default_factory=lambda: tuple(DEFAULT_DURATION_BUCKETS))
+
+
+@dataclass
+class AccountConfig:
+    name: str
+    userdata_dir: Optional[Path] = None
+
+
 @dataclass
 class Config:
     timezone: str
@@ -100,6 +181,12 @@ class Config:
     screenshots_dir: Path
     userdata_dir: Path
     meta_dir: Path
+    accounts: Sequence[AccountConfig] = field(default_factory=tuple)
+    account: str = DEFAULT_ACCOUNT
+    checkin_response: CheckinResponseConfig = field(default_factory=CheckinResponseConfig)
+    store_file: Optional[Path] = None
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    traces_dir: Optional[Path] = None
 
 
 def _load_smtp(data: Dict[str, Any]) -> SMTPConfig:
@@ -115,6 +202,25 @@ def _load_smtp(data: Dict[str, Any]) -> SMTPConfig:
     )
 
 
+def _load_webhook(data: Dict[str, Any], index: int) -> WebhookConfig:
+    url = str(data.get("url", ""))
+    if not url.startswith(("http://", "https://")):
+        raise ValueError(f"notify.webhooks[{index}].url must be an http(s) URL; got {url!r}")
+    events = tuple(str(event) for event in data.get("events", ("failure", "resolved")))
+    unknown = [event for event in events if event not in WEBHOOK_EVENTS]
+    if unknown:
+        raise ValueError(
+            f"notify.webhooks[{index}].events must be drawn from {', '.join(WEBHOOK_EVENTS)}; got {unknown!r}"
+        )
+    return WebhookConfig(
+        url=url,
+        name=str(data.get("name") or f"webhook{index}"),
+        events=events,
+        timeout_seconds=max(0.1, float(data.get("timeout_seconds", 5.0))),
+        headers={str(k): str(v) for k, v in (data.get("headers") or {}).items()},
+    )
+
+
 def _load_notify(data: Dict[str, Any]) -> NotifyConfig:
     smtp_cfg = data.get("smtp")
     smtp = _load_smtp(smtp_cfg) if isinstance(smtp_cfg, dict) else None
@@ -123,12 +229,39 @@ def _load_notify(data: Dict[str, Any]) -> NotifyConfig:
         success_email_once_per_day=bool(data.get("success_email_once_per_day", True)),
         email_on_failure_always=bool(data.get("email_on_failure_always", True)),
         smtp=smtp,
+        outbox=bool(data.get("outbox", False)),
+        outbox_max_attempts=max(1, int(data.get("outbox_max_attempts", 10))),
+        outbox_backoff_seconds=tuple(
+            float(v) for v in data.get("outbox_backoff_seconds") or (30.0, 120.0, 600.0, 1800.0, 3600.0)
+        ),
+        outbox_flush_seconds=max(0.0, float(data.get("outbox_flush_seconds", 5.0))),
+        digest=bool(data.get("digest", False)),
+        digest_max_attachment_bytes=max(0, int(data.get("digest_max_attachment_bytes", 5_000_000))),
+        failure_cooldown_seconds=max(0.0, float(data.get("failure_cooldown_seconds", 86400.0))),
+        failure_escalate_counts=tuple(int(v) for v in data.get("failure_escalate_counts", (3, 10))),
+        email_timeout_seconds=max(0.1, float(data.get("email_timeout_seconds", 30.0))),
+        webhooks=tuple(_load_webhook(item, i) for i, item in enumerate(data.get("webhooks") or ())),
     )
 
 
+def parse_schedule_time(value: str) -> dtime:
+    """Parse one ``schedule.times`` entry; ``8:5`` is accepted like ``08:05``."""
+    hour, _, minute = value.partition(":")
+    if not (hour.isdigit() and minute.isdigit() and int(hour) < 24 and int(minute) < 60):
+        raise ValueError(f"schedule.times entries must be HH:MM; got {value!r}")
+    return dtime(int(hour), int(minute))
+
+
 def _load_schedule(data: Dict[str, Any]) -> ScheduleConfig:
-    times = data.get("times", ["08:30", "12:30", "20:30"])
-    return ScheduleConfig(times=tuple(times))
+    times = tuple(str(value) for value in data.get("times", ["08:30", "12:30", "20:30"]))
+    for value in times:
+        parse_schedule_time(value)
+    return ScheduleConfig(
+        times=times,
+        jitter_seconds=max(0.0, float(data.get("jitter_seconds", 0.0))),
+        catch_up_seconds=max(0.0, float(data.get("catch_up_seconds", 21600.0))),
+        warm_browser=bool(data.get("warm_browser", True)),
+    )
 
 
 def _load_run(data: Dict[str, Any]) -> RunConfig:
@@ -142,21 +275,67 @@ def _load_run(data: Dict[str, Any]) -> RunConfig:
     raw_accept_language = data.get("accept_language")
     accept_language = str(raw_accept_language) if raw_accept_language else None
     raw_locale = data.get("browser_locale") or DEFAULT_BROWSER_LOCALE
+    browser_mode = str(data.get("browser_mode", "persistent"))
+    if browser_mode not in BROWSER_MODES:
+        raise ValueError(f"run.browser_mode must be one of {', '.join(BROWSER_MODES)}; got {browser_mode!r}")
+    log_max_bytes = int(data.get("log_max_bytes", 1_000_000))
+    log_max_total_bytes = data.get("log_max_total_bytes")
+    if log_max_total_bytes is None:
+        # Older configs capped rotation by backup count; keep that footprint when no quota is set.
+        backups = data.get("log_backup_count")
+        log_max_total_bytes = log_max_bytes * int(backups) if backups is not None else 20_000_000
+    nav_wait_until = str(data.get("nav_wait_until", "networkidle"))
+    if nav_wait_until not in NAV_WAIT_STRATEGIES:
+        raise ValueError(
+            f"run.nav_wait_until must be one of {', '.join(NAV_WAIT_STRATEGIES)}; got {nav_wait_until!r}"
+        )
+    screenshot_mode = str(data.get("screenshot_mode", "viewport"))
+    if screenshot_mode not in SCREENSHOT_MODES:
+        raise ValueError(
+            f"run.screenshot_mode must be one of {', '.join(SCREENSHOT_MODES)}; got {screenshot_mode!r}"
+        )
+    screenshot_format = str(data.get("screenshot_format", "jpeg")).lower()
+    if screenshot_format not in SCREENSHOT_FORMATS:
+        raise ValueError(
+            f"run.screenshot_format must be one of {', '.join(SCREENSHOT_FORMATS)}; got {screenshot_format!r}"
+        )
     return RunConfig(
         headless_preferred=bool(data.get("headless_preferred", True)),
         fallback_to_headed_on_retry=bool(data.get("fallback_to_headed_on_retry", True)),
         nav_timeout_ms=int(data.get("nav_timeout_ms", 20000)),
+        nav_wait_until=nav_wait_until,
+        nav_ready_selectors=tuple(str(v) for v in data.get("nav_ready_selectors", [])),
         action_timeout_ms=int(data.get("action_timeout_ms", 15000)),
         max_retries=int(data.get("max_retries", 3)),
         retry_backoff_seconds=tuple(float(v) for v in retry_backoff),
         history_limit=int(data.get("history_limit", 1000)),
+        history_csv=bool(data.get("history_csv", True)),
         screenshot_on_failure=bool(data.get("screenshot_on_failure", True)),
         trace_on_failure=bool(data.get("trace_on_failure", False)),
-        log_max_bytes=int(data.get("log_max_bytes", 1_000_000)),
-        log_backup_count=int(data.get("log_backup_count", 7)),
+        log_max_bytes=log_max_bytes,
+        log_max_total_bytes=int(log_max_total_bytes),
+        log_rotate_daily=bool(data.get("log_rotate_daily", False)),
+        log_compress=bool(data.get("log_compress", True)),
         chromium_launch_args=launch_args,
         browser_locale=str(raw_locale),
         accept_language=accept_language,
+        account_concurrency=max(1, int(data.get("account_concurrency", 4))),
+        http_fast_path=bool(data.get("http_fast_path", False)),
+        browser_mode=browser_mode,
+        pool_max_contexts=max(1, int(data.get("pool_max_contexts", 8))),
+        pool_context_max_uses=max(1, int(data.get("pool_context_max_uses", 20))),
+        block_resource_types=tuple(str(v) for v in data.get("block_resource_types", [])),
+        block_url_patterns=tuple(str(v) for v in data.get("block_url_patterns", [])),
+        allow_url_patterns=tuple(str(v) for v in data.get("allow_url_patterns", [])),
+        profile_max_bytes=int(data.get("profile_max_bytes", 50_000_000)),
+        trace_screenshots=bool(data.get("trace_screenshots", True)),
+        trace_snapshots=bool(data.get("trace_snapshots", True)),
+        trace_max_bytes=int(data.get("trace_max_bytes", 100_000_000)),
+        screenshot_mode=screenshot_mode,
+        screenshot_clip_selectors=tuple(str(v) for v in data.get("screenshot_clip_selectors", [])),
+        screenshot_format=screenshot_format,
+        screenshot_quality=min(100, max(1, int(data.get("screenshot_quality", 70)))),
+        screenshot_email_max_width=max(0, int(data.get("screenshot_email_max_width", 1024))),
     )
 
 
@@ -170,10 +349,29 @@ def _load_selectors(data: Dict[str, Any]) -> SelectorConfig:
     )
 
 
+def _load_checkin_response(data: Dict[str, Any]) -> CheckinResponseConfig:
+    raw_timeout = data.get("timeout_ms")
+    raw_method = data.get("method")
+    return CheckinResponseConfig(
+        url_pattern=data.get("url_pattern") or None,
+        method=str(raw_method).upper() if raw_method else None,
+        timeout_ms=int(raw_timeout) if raw_timeout is not None else None,
+        success=dict(data.get("success", {}) or {}),
+        already=dict(data.get("already", {}) or {}),
+        auth_statuses=tuple(int(v) for v in data.get("auth_statuses", (401, 403))),
+    )
+
+
 def _load_site(data: Dict[str, Any]) -> SiteConfig:
     base_url = data.get("base_url") or "https://anyrouter.top/"
     checkin_url = data.get("checkin_url") or base_url
-    return SiteConfig(base_url=base_url, checkin_url=checkin_url)
+    return SiteConfig(
+        base_url=base_url,
+        checkin_url=checkin_url,
+        checkin_api_url=data.get("checkin_api_url") or None,
+        checkin_api_method=str(data.get("checkin_api_method") or "POST").upper(),
+        checkin_api_headers={str(k): str(v) for k, v in (data.get("checkin_api_headers") or {}).items()},
+    )
 
 
 def _load_logging(data: Dict[str, Any], project_root: Path) -> LoggingConfig:
@@ -182,6 +380,68 @@ def _load_logging(data: Dict[str, Any], project_root: Path) -> LoggingConfig:
     return LoggingConfig(log_file=log_file)
 
 
+def _load_metrics(data: Dict[str, Any], project_root: Path) -> MetricsConfig:
+    raw_textfile = data.get("textfile")
+    buckets = sorted(float(v) for v in data.get("duration_buckets", DEFAULT_DURATION_BUCKETS))
+    return MetricsConfig(
+        textfile=(project_root / raw_textfile).resolve() if raw_textfile else None,
+        duration_buckets=tuple(buckets),
+    )
+
+
+def _load_accounts(entries: Sequence[Dict[str, Any]], project_root: Path) -> tuple[AccountConfig, ...]:
+    accounts: list[AccountConfig] = []
+    seen: set[str] = set()
+    for entry in entries:
+        name = str(entry.get("name") or "").strip()
+        if not name:
+            raise ValueError("Each [[accounts]] entry requires a non-empty name")
+        if name in seen:
+            raise ValueError(f"Duplicate account name: {name}")
+        seen.add(name)
+        raw_userdata = entry.get("userdata_dir")
+        userdata_dir = (project_root / raw_userdata).resolve() if raw_userdata else None
+        accounts.append(AccountConfig(name=name, userdata_dir=userdata_dir))
+    return tuple(accounts)
+
+
+def traces_dir(config: Config) -> Path:
+    """Ring buffer of failure traces, a sibling of ``screenshots_dir`` by default."""
+    return config.traces_dir or config.screenshots_dir.with_name("traces")
+
+
+def resolve_account(config: Config, account: AccountConfig) -> Config:
+    """Return a copy of ``config`` whose data paths are scoped to ``account``."""
+    data_dir = config.data_dir / "accounts" / account.name
+    return replace(
+        config,
+        data_dir=data_dir,
+        history_file=data_dir / "history.csv",
+        screenshots_dir=config.screenshots_dir / account.name,
+        traces_dir=traces_dir(config) / account.name,
+        userdata_dir=account.userdata_dir or data_dir / "userdata",
+        meta_dir=data_dir / "meta",
+        accounts=(),
+        account=account.name,
+    )
+
+
+def select_accounts(config: Config, names: Sequence[str] | None = None) -> list[Config]:
+    """Return per-account configs, falling back to the single default account."""
+    if not config.accounts:
+        if names:
+            raise ValueError("No [[accounts]] configured; --account cannot be used")
+        return [config]
+    accounts: Sequence[AccountConfig] = config.accounts
+    if names:
+        known = {account.name: account for account in accounts}
+        missing = [name for name in names if name not in known]
+        if missing:
+            raise ValueError(f"Unknown account(s): {', '.join(missing)}")
+        accounts = [known[name] for name in names]
+    return [resolve_account(config, account) for account in accounts]
+
+
 def load_config(path: Path | str = "config.toml") -> Config:
     """Load configuration from ``config.toml`` and expand derived paths."""
     config_path = Path(path).expanduser().resolve()
@@ -199,10 +459,21 @@ def load_config(path: Path | str = "config.toml") -> Config:
     selectors = _load_selectors(raw.get("selectors", {}))
     site = _load_site(raw.get("site", {}))
     logging_cfg = _load_logging(raw.get("logging", {}), project_root)
+    accounts = _load_accounts(raw.get("accounts", []), project_root)
+    checkin_response = _load_checkin_response(raw.get("checkin_response", {}))
+    metrics = _load_metrics(raw.get("metrics", {}), project_root)
+    if (checkin_response.url_pattern or site.checkin_api_url) and not checkin_response.success:
+        # The site answers rejections with HTTP 200, so a bare 2xx must not count as success.
+        raise ValueError(
+            "[checkin_response].success rules are required when checkin_response.url_pattern "
+            "or site.checkin_api_url is set"
+        )
 
     data_dir = (project_root / "data").resolve()
     history_file = data_dir / "history.csv"
+    store_file = data_dir / "runs.db"
     screenshots_dir = (project_root / "screenshots").resolve()
+    traces = (project_root / "traces").resolve()
     userdata_dir = data_dir / "userdata"
     meta_dir = data_dir / "meta"
 
@@ -220,4 +491,9 @@ def load_config(path: Path | str = "config.toml") -> Config:
         screenshots_dir=screenshots_dir,
         userdata_dir=userdata_dir,
         meta_dir=meta_dir,
+        accounts=accounts,
+        checkin_response=checkin_response,
+        store_file=store_file,
+        metrics=metrics,
+        traces_dir=traces,
     )
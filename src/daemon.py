@@ -0,0 +1,409 @@
+"""Long-running scheduler that fires check-ins at ``schedule.times``.
+
+``python -m src.daemon`` loads the configuration once and runs the check-in
+at every configured time, delayed by up to
+``schedule.jitter_seconds``. A single account in ``browser_mode =
+"persistent"`` goes through the regular check-in flow on one Chromium context
+kept open between firings; several accounts, or ``browser_mode = "pool"``, go
+through the batch engine (``run.account_concurrency``, ``notify.digest``) on
+an async driver and context pool kept alive across firings. With
+``schedule.warm_browser = false`` browsers are started per firing instead.
+A slot missed by less than
+``schedule.catch_up_seconds`` - the daemon was down or the machine was
+suspended - is run as soon as possible; older slots are logged and skipped.
+
+Under systemd (``Type=notify``) it reports ``READY=1`` once the browsers are
+warm, keeps ``STATUS=`` pointing at the next firing and pings the watchdog
+while idle. During a firing it keeps pinging only as long as the check-in
+makes progress (a heartbeat per account, attempt and retry), so a hung run is
+still caught without sizing ``WatchdogSec=`` for the longest possible run.
+SIGTERM/SIGINT stop after the current run; SIGHUP reloads the
+configuration and relaunches the browsers.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Sequence
+
+from .batch import BatchEngine
+from .browser import BrowserSession
+from .config import Config, load_config, parse_schedule_time, select_accounts
+from .logging_setup import RunLoggerAdapter, setup_logging
+from .notifier_email import EmailNotifier
+from .notifiers import build_notifier
+from .signin import _run_checkin, skip_if_checked_in
+from .store import open_store
+from .timing import Spans
+from .utils import ensure_data_tree, generate_run_id, get_timezone, now_tz
+
+_IDLE_STEP_SECONDS = 60.0
+# Page loads and waits one attempt may spend its full timeout on.
+_ATTEMPT_STEPS = 8
+
+
+def parse_times(times: Sequence[str]) -> List[dtime]:
+    """``schedule.times`` as sorted clock times."""
+    return sorted(parse_schedule_time(value) for value in times)
+
+
+def next_slot(now: datetime, times: Sequence[dtime]) -> datetime:
+    """Earliest scheduled time strictly after ``now`` (in ``now``'s timezone)."""
+    for offset in range(2):
+        day = now.date() + timedelta(days=offset)
+        for at in times:
+            slot = datetime.combine(day, at, tzinfo=now.tzinfo)
+            if slot > now:
+                return slot
+    raise ValueError("schedule.times is empty")
+
+
+def previous_slot(now: datetime, times: Sequence[dtime]) -> datetime:
+    """Latest scheduled time at or before ``now``."""
+    for offset in range(2):
+        day = now.date() - timedelta(days=offset)
+        for at in reversed(times):
+            slot = datetime.combine(day, at, tzinfo=now.tzinfo)
+            if slot <= now:
+                return slot
+    raise ValueError("schedule.times is empty")
+
+
+def missed_slot(
+    accounts: Sequence[Config], now: datetime, times: Sequence[dtime], catch_up_seconds: float
+) -> Optional[datetime]:
+    """The last slot if some account has no check-in recorded since it and it is recent enough."""
+    slot = previous_slot(now, times)
+    if (now - slot).total_seconds() > catch_up_seconds:
+        return None
+    for account in accounts:
+        last = next(open_store(account).query_runs(account=account.account, stage="CHECKIN", limit=1), None)
+        if last is None or datetime.fromisoformat(last["ts"]) < slot:
+            return slot
+    return None
+
+
+def sd_notify(*fields: str) -> bool:
+    """Send ``fields`` to systemd's notify socket; a no-op outside ``Type=notify`` units."""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall("\n".join(fields).encode("utf-8"))
+    except OSError:
+        return False
+    return True
+
+
+def stall_seconds(config: Config) -> float:
+    """Longest a healthy check-in goes between heartbeats: one attempt, its backoff and notifications."""
+    run = config.run
+    attempt = _ATTEMPT_STEPS * max(run.nav_timeout_ms, run.action_timeout_ms) / 1000
+    backoff = max(run.retry_backoff_seconds, default=0.0)
+    notify = max([config.notify.email_timeout_seconds] + [hook.timeout_seconds for hook in config.notify.webhooks])
+    return attempt + backoff + notify
+
+
+def watchdog_interval() -> Optional[float]:
+    """Half of ``WatchdogSec=``, the recommended ping period, if the watchdog is enabled for us."""
+    usec = os.environ.get("WATCHDOG_USEC")
+    pid = os.environ.get("WATCHDOG_PID")
+    if not usec or (pid and int(pid) != os.getpid()):
+        return None
+    return int(usec) / 2_000_000
+
+
+class Heartbeat:
+    """Feed the watchdog from a side thread while :meth:`beat` keeps being called.
+
+    Pings stop once no beat arrived for ``stall`` seconds, letting systemd
+    restart a check-in that hangs inside a single attempt.
+    """
+
+    def __init__(self, interval: Optional[float], stall: float) -> None:
+        self._interval = interval
+        self._stall = stall
+        self._last = time.monotonic()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def beat(self) -> None:
+        self._last = time.monotonic()
+        if self._interval:
+            sd_notify("WATCHDOG=1")
+
+    def _run(self) -> None:
+        while not self._done.wait(self._interval):
+            if time.monotonic() - self._last <= self._stall:
+                sd_notify("WATCHDOG=1")
+
+    def __enter__(self) -> "Heartbeat":
+        if self._interval:
+            self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+            self._thread.start()
+        self.beat()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._done.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class Daemon:
+    def __init__(
+        self,
+        config: Config,
+        *,
+        account_names: Sequence[str] | None = None,
+        clock: Callable[[], datetime] | None = None,
+        jitter: Callable[[], float] = random.random,
+    ) -> None:
+        self._account_names = account_names
+        self._clock = clock
+        self._jitter = jitter
+        self._wake = threading.Event()
+        self._stopping = False
+        self._reload = False
+        self._sessions: Dict[str, BrowserSession] = {}
+        self._engine: Optional[BatchEngine] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._watchdog = watchdog_interval()
+        self._load(config)
+
+    def _load(self, config: Config) -> None:
+        self.config = config
+        self.tz = get_timezone(config.timezone)
+        self.times = parse_times(config.schedule.times)
+        self.accounts = select_accounts(config, self._account_names)
+        self.logger = setup_logging(config, generate_run_id())
+
+    def now(self) -> datetime:
+        return self._clock() if self._clock is not None else now_tz(self.tz)
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wake.set()
+
+    def request_reload(self) -> None:
+        self._reload = True
+        self._wake.set()
+
+    def _wait(self, seconds: float) -> bool:
+        """Sleep up to ``seconds``; ``True`` when woken by stop or reload."""
+        return self._wake.wait(seconds)
+
+    def _sleep_until(self, target: datetime) -> bool:
+        """Idle until ``target`` while pinging the watchdog; ``False`` if interrupted."""
+        step = min(_IDLE_STEP_SECONDS, self._watchdog or _IDLE_STEP_SECONDS)
+        while True:
+            if self._watchdog:
+                sd_notify("WATCHDOG=1")
+            # Re-read the wall clock each step so a suspend/resume is noticed promptly.
+            remaining = (target - self.now()).total_seconds()
+            if remaining <= 0:
+                return True
+            if self._wait(min(remaining, step)):
+                self._wake.clear()
+                return False
+
+    def _session(self, account: Config) -> Optional[BrowserSession]:
+        if not self.config.schedule.warm_browser:
+            return None
+        session = self._sessions.get(account.account)
+        if session is None:
+            session = self._sessions[account.account] = BrowserSession(account)
+        return session
+
+    @property
+    def uses_batch(self) -> bool:
+        return len(self.accounts) > 1 or self.config.run.browser_mode == "pool"
+
+    def _batch_engine(self) -> BatchEngine:
+        if self._engine is None:
+            self._engine = BatchEngine(self.config, self.accounts)
+        return self._engine
+
+    def _run_async(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        # One loop for the daemon's lifetime: the async driver and pool are bound to it.
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+
+    def _close_engine(self) -> None:
+        engine, self._engine = self._engine, None
+        if engine is not None:
+            try:
+                self._run_async(engine.close())
+            except Exception:
+                self.logger.warning("Failed to close batch engine cleanly", extra={"step": "daemon"}, exc_info=True)
+
+    def warm_up(self) -> None:
+        for account in self.accounts:
+            ensure_data_tree(account.data_dir, account.screenshots_dir, account.userdata_dir, account.meta_dir)
+        if self.uses_batch:
+            if self.config.schedule.warm_browser:
+                try:
+                    self._run_async(self._batch_engine().warm_up())
+                except Exception:
+                    self.logger.warning("Browser warm-up failed", extra={"step": "daemon"}, exc_info=True)
+                    self._close_engine()
+            return
+        for account in self.accounts:
+            session = self._session(account)
+            if session is None:
+                continue
+            try:
+                session.new_page(headless=account.run.headless_preferred).close()
+            except Exception:
+                # The first firing retries the launch and reports the failure properly.
+                self.logger.warning(
+                    "Browser warm-up failed", extra={"step": "daemon", "account": account.account}, exc_info=True
+                )
+                session.invalidate()
+
+    def close_sessions(self) -> None:
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+        self._close_engine()
+        loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.close()
+
+    def fire(self, slot: datetime, *, catch_up: bool = False) -> Dict[str, int]:
+        """Check in every account for ``slot``; returns exit codes by account."""
+        sd_notify(f"STATUS=Running check-in for {slot.isoformat(timespec='minutes')}")
+        stall = max(stall_seconds(account) for account in self.accounts)
+        with Heartbeat(self._watchdog, stall) as heartbeat:
+            if self.uses_batch:
+                return self._fire_batch(slot, catch_up, heartbeat)
+            return self._fire_accounts(slot, catch_up, heartbeat)
+
+    def _fire_batch(self, slot: datetime, catch_up: bool, heartbeat: Heartbeat) -> Dict[str, int]:
+        self.logger.info(
+            "Starting scheduled batch check-in",
+            extra={
+                "step": "batch",
+                "action": "catch_up" if catch_up else "scheduled",
+                "slot": slot.isoformat(),
+                "accounts": len(self.accounts),
+            },
+        )
+        try:
+            results = self._run_async(self._batch_engine().run(self.accounts, heartbeat=heartbeat.beat))
+        except Exception:
+            self.logger.exception("Scheduled batch check-in crashed", extra={"step": "daemon"})
+            self._close_engine()  # relaunch the driver on the next firing
+            return {account.account: 1 for account in self.accounts}
+        if not self.config.schedule.warm_browser:
+            self._close_engine()
+        return {result.account: result.exit_code for result in results}
+
+    def _fire_accounts(self, slot: datetime, catch_up: bool, heartbeat: Heartbeat) -> Dict[str, int]:
+        codes: Dict[str, int] = {}
+        for account in self.accounts:
+            heartbeat.beat()
+            run_id = generate_run_id()
+            logger = RunLoggerAdapter(
+                logging.getLogger("anyrouter"), extra={"run_id": run_id, "account": account.account}
+            )
+            start = now_tz(self.tz)
+            if skip_if_checked_in(account, logger, run_id, start):
+                codes[account.account] = 0
+                continue
+            logger.info(
+                "Starting scheduled check-in",
+                extra={"step": "start", "action": "catch_up" if catch_up else "scheduled", "slot": slot.isoformat()},
+            )
+            session = self._session(account)
+            if session is not None and session.blocker is not None:
+                session.blocker.blocked.clear()  # per-run summary on a long-lived session
+            notifier = build_notifier(account, EmailNotifier(account, self.tz), logger)
+            try:
+                codes[account.account] = _run_checkin(
+                    account,
+                    logger,
+                    notifier,
+                    run_id,
+                    self.tz,
+                    start=start,
+                    spans=Spans(),
+                    session=session,
+                    heartbeat=heartbeat.beat,
+                )
+            except Exception:
+                logger.exception("Scheduled check-in crashed", extra={"step": "daemon"})
+                codes[account.account] = 1
+                if session is not None:
+                    session.invalidate()
+            finally:
+                notifier.close()
+        return codes
+
+    def run(self) -> int:
+        self.warm_up()
+        sd_notify("READY=1", f"MAINPID={os.getpid()}")
+        missed = missed_slot(self.accounts, self.now(), self.times, self.config.schedule.catch_up_seconds)
+        if missed is not None:
+            self.logger.info("Catching up missed check-in", extra={"step": "daemon", "slot": missed.isoformat()})
+            self.fire(missed, catch_up=True)
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                self.logger.info("Reloading configuration", extra={"step": "daemon"})
+                sd_notify("RELOADING=1")
+                self.close_sessions()
+                try:
+                    self._load(load_config())
+                except (OSError, ValueError) as exc:
+                    self.logger.error(
+                        "Configuration reload failed; keeping the previous one: %s", exc, extra={"step": "daemon"}
+                    )
+                self.warm_up()
+                sd_notify("READY=1")
+            slot = next_slot(self.now(), self.times)
+            fire_at = slot + timedelta(seconds=self._jitter() * self.config.schedule.jitter_seconds)
+            sd_notify(f"STATUS=Next check-in at {fire_at.isoformat(timespec='seconds')}")
+            self.logger.info("Waiting for next check-in", extra={"step": "daemon", "slot": fire_at.isoformat()})
+            if not self._sleep_until(fire_at):
+                continue
+            late = (self.now() - slot).total_seconds()
+            if late > self.config.schedule.catch_up_seconds:
+                self.logger.warning(
+                    "Skipping check-in missed by %.0fs", late, extra={"step": "daemon", "slot": slot.isoformat()}
+                )
+                continue
+            self.fire(slot, catch_up=late > self.config.schedule.jitter_seconds + _IDLE_STEP_SECONDS)
+        sd_notify("STOPPING=1")
+        self.close_sessions()
+        return 0
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run check-ins at schedule.times from one long-lived process.")
+    parser.add_argument("--account", action="append", dest="accounts", help="limit the daemon to this account")
+    args = parser.parse_args(list(argv) if argv is not None else [])
+
+    daemon = Daemon(load_config(), account_names=args.accounts)
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+    signal.signal(signal.SIGHUP, lambda *_: daemon.request_reload())
+    return daemon.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
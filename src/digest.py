@@ -0,0 +1,207 @@
+"""Fold the notifications of one batch run into a single digest email.
+
+With ``notify.digest = true`` the batch engine hands each account a
+:class:`DigestNotifier` instead of an :class:`EmailNotifier`. It applies the
+same rules (success once per day, failures always) but only collects what
+would have been sent; :meth:`BatchDigest.send` then mails one message with a
+per-account table and as many failure screenshots as fit in
+``notify.digest_max_attachment_bytes``.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+from zoneinfo import ZoneInfo
+
+from .alerts import AlertState, FailureAlerts, annotate_failure, resolved_lines
+from .config import Config
+from .notifier_email import EmailNotifier
+from .store import open_store
+from .utils import now_tz
+
+
+@dataclass
+class DigestItem:
+    config: Config
+    kind: str
+    subject: str
+    attachments: List[Path] = field(default_factory=list)
+    details: List[str] = field(default_factory=list)
+    alert: Optional[AlertState] = None
+
+
+@dataclass
+class DigestRow:
+    account: str
+    result: str
+    error_code: str
+    attempts: int
+    duration_ms: int
+    run_id: str
+
+
+class DigestNotifier:
+    """Drop-in for :class:`EmailNotifier` that queues into a :class:`BatchDigest`."""
+
+    def __init__(self, digest: "BatchDigest", config: Config) -> None:
+        self._digest = digest
+        self._config = config
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.notify.enable_email and self._config.notify.smtp is not None
+
+    def send_success(self, subject: str, body: str) -> bool:
+        if not self.enabled:
+            return False
+        if self._config.notify.success_email_once_per_day:
+            now = now_tz(self._digest.tz)
+            if not open_store(self._config).should_send_success_email(self._config.account, now):
+                return False
+        self._digest.add(DigestItem(self._config, "success", subject))
+        return True
+
+    def send_failure(
+        self,
+        subject: str,
+        body: str,
+        *,
+        attachments: Optional[Iterable[Path]] = None,
+        error_code: Optional[str] = None,
+    ) -> bool:
+        if not self.enabled or not self._config.notify.email_on_failure_always:
+            return False
+        alert = None
+        if error_code:
+            decision = FailureAlerts(self._config).observe(error_code, now_tz(self._digest.tz))
+            if not decision.send:
+                return False
+            subject, _ = annotate_failure(subject, "", decision)
+            alert = decision.state
+        item = DigestItem(self._config, "failure", subject, [Path(p) for p in attachments or []], alert=alert)
+        self._digest.add(item)
+        return True
+
+    def send_resolved(self, subject: str, body: str) -> bool:
+        if not self.enabled:
+            return False
+        alerts = FailureAlerts(self._config)
+        states = alerts.emailed()
+        if not states:
+            alerts.clear()
+            return False
+        codes = ",".join(state.error_code for state in states)
+        self._digest.add(DigestItem(self._config, "resolved", f"{subject} {codes}", details=resolved_lines(states)))
+        return True
+
+
+def _file_size(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return None
+
+
+def render_table(rows: Sequence[DigestRow]) -> str:
+    header = ("account", "result", "error_code", "attempts", "duration_ms", "run_id")
+    cells = [header] + [
+        (row.account, row.result, row.error_code or "-", str(row.attempts), str(row.duration_ms), row.run_id)
+        for row in rows
+    ]
+    widths = [max(len(line[col]) for line in cells) for col in range(len(header))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip() for line in cells)
+
+
+class BatchDigest:
+    def __init__(self, config: Config, tz: ZoneInfo) -> None:
+        self._config = config
+        self.tz = tz
+        self._items: List[DigestItem] = []
+        self._lock = threading.Lock()
+
+    def notifier_for(self, config: Config) -> DigestNotifier:
+        return DigestNotifier(self, config)
+
+    def add(self, item: DigestItem) -> None:
+        with self._lock:
+            self._items.append(item)
+
+    @property
+    def items(self) -> List[DigestItem]:
+        with self._lock:
+            return list(self._items)
+
+    def ordered_items(self, rows: Sequence[DigestRow]) -> List[DigestItem]:
+        """Items grouped by account in ``rows`` order; accounts finish in any order under concurrency."""
+        order = {row.account: index for index, row in enumerate(rows)}
+        return sorted(self.items, key=lambda item: order.get(item.config.account, len(order)))
+
+    def pick_attachments(self, items: Sequence[DigestItem]) -> tuple[List[Path], List[Path]]:
+        """Split failure screenshots into those within the byte budget and the rest."""
+        budget = self._config.notify.digest_max_attachment_bytes
+        kept: List[Path] = []
+        omitted: List[Path] = []
+        used = 0
+        for item in items:
+            for path in item.attachments:
+                size = _file_size(path)
+                if size is None:
+                    continue
+                if used + size > budget:
+                    omitted.append(path)
+                    continue
+                kept.append(path)
+                used += size
+        return kept, omitted
+
+    def compose(self, rows: Sequence[DigestRow]) -> tuple[str, str, List[Path]]:
+        day = now_tz(self.tz).date().isoformat()
+        ok = sum(1 for row in rows if row.result in {"CHECKIN_OK", "CHECKIN_ALREADY", "SKIPPED"})
+        failed = len(rows) - ok
+        subject = f"[AnyRouter][DIGEST] {day} ok={ok} fail={failed}"
+        items = self.ordered_items(rows)
+        kept, omitted = self.pick_attachments(items)
+        lines = [
+            f"AnyRouter batch check-in: {ok} ok, {failed} failed.",
+            "",
+            render_table(rows),
+            "",
+        ]
+        if items:
+            lines.append("Notifications:")
+            for item in items:
+                lines.append(f"  {item.subject}")
+                lines += [f"    {detail}" for detail in item.details]
+            lines.append("")
+        if omitted:
+            lines.append(
+                f"{len(omitted)} screenshot(s) omitted to stay under "
+                f"{self._config.notify.digest_max_attachment_bytes} bytes:"
+            )
+            lines += [f"  {path}" for path in omitted]
+        return subject, "\n".join(lines).rstrip() + "\n", kept
+
+    def send(self, rows: Sequence[DigestRow]) -> bool:
+        """Mail the digest if any account had something to report."""
+        items = self.items
+        if not items:
+            return False
+        subject, body, attachments = self.compose(rows)
+        notifier = EmailNotifier(self._config, self.tz)
+        if not notifier.enabled:
+            return False
+        message = notifier.build_message(subject, body, attachments=attachments)
+        if not notifier.deliver(message, kind="digest"):
+            return False
+        now = now_tz(self.tz)
+        for item in items:
+            if item.kind == "success" and item.config.notify.success_email_once_per_day:
+                open_store(item.config).record_success_email_sent(item.config.account, now)
+            if item.alert is not None:
+                FailureAlerts(item.config).mark_sent(item.alert, now)
+            if item.kind == "resolved":
+                FailureAlerts(item.config).clear()
+        return True
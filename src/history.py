@@ -0,0 +1,168 @@
+"""Append-only run history with lazy compaction.
+
+Every run appends one CSV row under an exclusive file lock, so concurrent
+account workers never interleave or lose rows. The file is only trimmed back
+to ``history_limit`` rows once it grows past a size threshold, which keeps the
+per-run cost O(1) instead of rewriting the whole file each time. The size right
+after the last compaction is kept in ``history.csv.compacted`` so the threshold
+tracks the real row width (spans, long error notes) rather than an estimate.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sys
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Sequence
+
+try:  # POSIX only; history writers on other platforms run unlocked
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX fallback
+    fcntl = None  # type: ignore[assignment]
+
+from .config import load_config, select_accounts
+
+_ROW_BYTES_ESTIMATE = 160
+_COMPACT_SLACK = 2
+
+
+def history_header() -> list[str]:
+    return ["ts", "run_id", "stage", "result", "error_code", "retry_count", "duration_ms", "notes", "spans"]
+
+
+def _current_header(header: List[str]) -> List[str]:
+    """Upgrade a header written by an older release, whose columns are a prefix of today's."""
+    latest = history_header()
+    return latest if header == latest[: len(header)] else header
+
+
+def compaction_threshold(limit: int, compacted_size: int = 0) -> int:
+    """Size in bytes past which the history is trimmed back to ``limit`` rows.
+
+    ``compacted_size`` is the file size after the last compaction; doubling it
+    guarantees roughly ``limit`` appends between rewrites however wide rows are.
+    """
+    return max(max(limit, 1) * _ROW_BYTES_ESTIMATE, compacted_size) * _COMPACT_SLACK
+
+
+def _marker_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.compacted")
+
+
+def _compacted_size(path: Path) -> int:
+    try:
+        return int(_marker_path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return 0
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock_path = path.with_name(f"{path.name}.lock")
+    with lock_path.open("a") as lock_fh:
+        if fcntl is not None:
+            fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+
+
+def _tail_rows(fh: IO[str], limit: Optional[int]) -> tuple[List[str], List[List[str]]]:
+    reader = csv.reader(fh)
+    header = _current_header(next(reader, None) or history_header())
+    rows: "deque[List[str]]" = deque(maxlen=max(limit, 1) if limit is not None else None)
+    rows.extend(reader)
+    return header, list(rows)
+
+
+def _compact_locked(path: Path, limit: int) -> None:
+    with path.open("r", newline="", encoding="utf-8") as fh:
+        header, rows = _tail_rows(fh, limit)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with tmp_path.open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(header)
+        writer.writerows(rows)
+        fh.flush()
+        os.fsync(fh.fileno())
+        size = fh.tell()
+    os.replace(tmp_path, path)
+    _marker_path(path).write_text(str(size), encoding="utf-8")
+
+
+def append_history_entry(path: Path, limit: int, row: list[str]) -> None:
+    """Append ``row``, compacting to ``limit`` rows once the file is past the threshold."""
+    with _locked(path):
+        with path.open("a", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            if fh.tell() == 0:
+                writer.writerow(history_header())
+            writer.writerow(row)
+            size = fh.tell()
+        if size > compaction_threshold(limit, _compacted_size(path)):
+            _compact_locked(path, limit)
+
+
+def compact_history(path: Path, limit: int) -> None:
+    if not path.exists():
+        return
+    with _locked(path):
+        _compact_locked(path, limit)
+
+
+def iter_history(path: Path) -> Iterator[Dict[str, str]]:
+    """Stream history rows as dictionaries without loading the file."""
+    if not path.exists():
+        return
+    with path.open("r", newline="", encoding="utf-8") as fh:
+        reader = csv.reader(fh)
+        header = _current_header(next(reader, None) or history_header())
+        for row in reader:
+            yield dict(zip(header, row))
+
+
+def export_history(path: Path, out: IO[str], limit: Optional[int] = None) -> int:
+    """Write the newest ``limit`` rows (all when ``None``) as CSV and return the row count."""
+    header: List[str] = history_header()
+    rows: List[List[str]] = []
+    if path.exists():
+        with path.open("r", newline="", encoding="utf-8") as fh:
+            header, rows = _tail_rows(fh, limit)
+    writer = csv.writer(out)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return len(rows)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Export or compact the run history.")
+    parser.add_argument("command", choices=("export", "compact"))
+    parser.add_argument("--account", help="use this [[accounts]] entry's history")
+    parser.add_argument("--output", type=Path, help="export destination (default: stdout)")
+    parser.add_argument("--all", action="store_true", help="export every row instead of history_limit")
+    args = parser.parse_args(list(argv) if argv is not None else [])
+
+    config = load_config()
+    if args.account:
+        config = select_accounts(config, [args.account])[0]
+    limit = config.run.history_limit
+    if args.command == "compact":
+        compact_history(config.history_file, limit)
+        return 0
+    export_limit = None if args.all else limit
+    if args.output is None:
+        export_history(config.history_file, sys.stdout, export_limit)
+        return 0
+    with args.output.open("w", newline="", encoding="utf-8") as fh:
+        export_history(config.history_file, fh, export_limit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
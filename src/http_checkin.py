@@ -0,0 +1,196 @@
+"""Browserless check-in using the cookies saved by ``authorize``."""
+from __future__ import annotations
+
+import http.client
+import json
+import socket
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .browser import _accept_language_header
+from .config import Config
+from .response_rules import ResponseFormatError, classify_checkin_response
+from .utils import CheckInOutcome, SignInError, auth_state_path
+
+
+class FastPathUnavailable(Exception):
+    """Raised when the HTTP fast path cannot decide the outcome and the browser must take over."""
+
+    def __init__(self, error_code: str, message: str) -> None:
+        super().__init__(message)
+        self.error_code = error_code
+
+
+@dataclass
+class HttpResponse:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+_Origin = Tuple[str, str, int]
+
+
+class HttpClient:
+    """Minimal keep-alive HTTP client pooling idle connections per origin.
+
+    Safe to share between threads; each request checks a connection out of the
+    pool and returns it once the response body has been read.
+    """
+
+    def __init__(self, *, timeout: float = 15.0, max_idle_per_origin: int = 4) -> None:
+        self._timeout = timeout
+        self._max_idle = max_idle_per_origin
+        self._idle: Dict[_Origin, List[http.client.HTTPConnection]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _connect(self, origin: _Origin) -> http.client.HTTPConnection:
+        scheme, host, port = origin
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self._timeout)
+        return http.client.HTTPConnection(host, port, timeout=self._timeout)
+
+    def _checkout(self, origin: _Origin) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle[origin]
+            if idle:
+                return idle.pop(), True
+        return self._connect(origin), False
+
+    def _checkin(self, origin: _Origin, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle[origin]
+            if len(idle) < self._max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Mapping[str, str]] = None,
+        body: Optional[bytes] = None,
+    ) -> HttpResponse:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        port = parts.port or (443 if scheme == "https" else 80)
+        origin: _Origin = (scheme, parts.hostname or "", port)
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+
+        conn, reused = self._checkout(origin)
+        try:
+            try:
+                conn.request(method, target, body=body, headers=dict(headers or {}))
+                raw = conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                if not reused:
+                    raise
+                # Stale keep-alive connection; retry once on a fresh one.
+                conn = self._connect(origin)
+                conn.request(method, target, body=body, headers=dict(headers or {}))
+                raw = conn.getresponse()
+            payload = raw.read()
+        except Exception:
+            # Never pool (or leak) a connection left mid-request or mid-body.
+            conn.close()
+            raise
+        response = HttpResponse(status=raw.status, headers={k.lower(): v for k, v in raw.getheaders()}, body=payload)
+        if raw.will_close:
+            conn.close()
+        else:
+            self._checkin(origin, conn)
+        return response
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._idle = self._idle, defaultdict(list)
+        for conns in pools.values():
+            for conn in conns:
+                conn.close()
+
+
+def _domain_matches(host: str, domain: str) -> bool:
+    domain = domain.lstrip(".").lower()
+    return host == domain or host.endswith(f".{domain}")
+
+
+def load_cookie_header(storage_state: Path, url: str, *, now: Optional[float] = None) -> str:
+    """Build a ``Cookie`` header for ``url`` from a Playwright storage state file."""
+    with storage_state.open("r", encoding="utf-8") as fh:
+        state = json.load(fh)
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    path = parts.path or "/"
+    current = time.time() if now is None else now
+    pairs: List[str] = []
+    for cookie in state.get("cookies", []):
+        if not _domain_matches(host, cookie.get("domain", "")):
+            continue
+        if not path.startswith(cookie.get("path") or "/"):
+            continue
+        if cookie.get("secure") and parts.scheme != "https":
+            continue
+        expires = cookie.get("expires", -1)
+        if expires not in (None, -1) and expires <= current:
+            continue
+        pairs.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(pairs)
+
+
+def use_http_fast_path(config: Config) -> bool:
+    return config.run.http_fast_path and bool(config.site.checkin_api_url)
+
+
+def http_checkin(config: Config, client: HttpClient) -> CheckInOutcome:
+    """Call the check-in endpoint directly with the saved session cookies.
+
+    Raises :class:`FastPathUnavailable` on auth or format problems so the caller
+    can fall back to the browser flow; network failures surface as
+    :class:`SignInError` like any other attempt failure.
+    """
+    url = config.site.checkin_api_url
+    if not url:
+        raise FastPathUnavailable("BAD_RESPONSE", "site.checkin_api_url is not configured")
+    state_file = auth_state_path(config.data_dir)
+    try:
+        cookie_header = load_cookie_header(state_file, url)
+    except (OSError, ValueError) as exc:
+        raise FastPathUnavailable("NEED_AUTH", f"Cannot read storage state {state_file}: {exc}") from exc
+    if not cookie_header:
+        raise FastPathUnavailable("NEED_AUTH", "No unexpired session cookies for the check-in endpoint")
+
+    headers = {
+        "Accept": "application/json",
+        "Accept-Language": config.run.accept_language or _accept_language_header(config.run.browser_locale),
+        "Cookie": cookie_header,
+        **dict(config.site.checkin_api_headers),
+    }
+    body = b""
+    if config.site.checkin_api_method != "GET":
+        headers.setdefault("Content-Type", "application/json")
+        body = b"{}"
+    try:
+        response = client.request(config.site.checkin_api_method, url, headers=headers, body=body or None)
+    except socket.timeout as exc:
+        raise SignInError("NAV_TIMEOUT", "Timed out calling check-in API") from exc
+    except (OSError, http.client.HTTPException) as exc:
+        raise SignInError("UNKNOWN", f"Check-in API request failed: {exc}") from exc
+
+    try:
+        return classify_checkin_response(config.checkin_response, response.status, response.body, url=url)
+    except ResponseFormatError as exc:
+        raise FastPathUnavailable(exc.error_code, str(exc)) from exc
+    except SignInError as exc:
+        if exc.error_code == "NEED_AUTH":
+            raise FastPathUnavailable(exc.error_code, str(exc)) from exc
+        raise
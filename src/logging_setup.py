@@ -1,15 +1,46 @@
 """Logging configuration for AnyRouter automation."""
 from __future__ import annotations
 
+import atexit
+import copy
+import gzip
 import json
 import logging
-from logging.handlers import RotatingFileHandler
-from typing import Any, Dict
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime, time, timedelta, timezone
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
 
 from zoneinfo import ZoneInfo
 
 from .config import Config
-from .utils import ensure_directories, get_timezone, now_tz
+from .logs import LogIndex, entries_for_chunk, index_path, rotated_segments, segment_prefix
+from .utils import ensure_directories, get_timezone
+
+_EXTRA_KEYS = (
+    "run_id",
+    "account",
+    "step",
+    "action",
+    "selector",
+    "result",
+    "error_code",
+    "retry",
+    "attempt",
+    "duration_ms",
+    "url",
+    "blocked",
+    "nav",
+    "spans",
+    "profile",
+    "notify",
+    "slot",
+)
+_encode = json.JSONEncoder(ensure_ascii=False).encode
 
 
 class JsonFormatter(logging.Formatter):
@@ -18,40 +49,289 @@ class JsonFormatter(logging.Formatter):
     def __init__(self, tz: ZoneInfo | None = None) -> None:
         super().__init__()
         self._tz = tz
+        self._cached_second: Optional[int] = None
+        self._cached_parts: Tuple[str, str] = ("", "")
+
+    def _timestamp(self, created: float) -> str:
+        # The wall-clock prefix and UTC offset only change once per second, so
+        # build the timezone-aware datetime once and reuse it for that second.
+        second = int(created)
+        if second != self._cached_second:
+            moment = datetime.fromtimestamp(second, self._tz or timezone.utc)
+            self._cached_parts = (moment.strftime("%Y-%m-%dT%H:%M:%S"), moment.isoformat()[19:])
+            self._cached_second = second
+        prefix, offset = self._cached_parts
+        return f"{prefix}.{int((created - second) * 1_000_000):06d}{offset}"
 
     def format(self, record: logging.LogRecord) -> str:  # noqa: D401
         payload: Dict[str, Any] = {
-            "ts": getattr(record, "ts", None) or now_tz(self._tz).isoformat(),
+            "ts": getattr(record, "ts", None) or self._timestamp(record.created),
             "level": record.levelname,
             "message": record.getMessage(),
         }
-        for key in ("run_id", "step", "action", "selector", "result", "error_code", "retry", "duration_ms", "url"):
+        for key in _EXTRA_KEYS:
             if hasattr(record, key):
                 payload[key] = getattr(record, key)
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
-        return json.dumps(payload, ensure_ascii=False)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return _encode(payload)
+
+
+_COMPRESS_CHUNK_BYTES = 256 * 1024
+
+
+def compress_segment(source: Path, index: Optional[LogIndex] = None) -> Path:
+    """Gzip ``source`` next to itself and remove the original.
+
+    The output is a series of gzip members of roughly ``_COMPRESS_CHUNK_BYTES``
+    each, split on line boundaries, so a reader can start decompressing at any
+    member. ``gzip``-aware readers see one continuous stream. When ``index`` is
+    given, the run_ids, days and error codes of each member are recorded
+    against its byte offset.
+    """
+    target = source.with_name(f"{source.name}.gz")
+    tmp = source.with_name(f"{source.name}.gz.tmp")
+    members = []
+    with source.open("rb") as src, tmp.open("wb") as raw:
+        while True:
+            chunk = src.read(_COMPRESS_CHUNK_BYTES)
+            if not chunk:
+                break
+            chunk += src.readline()
+            if index is not None:
+                members.append((raw.tell(), entries_for_chunk(chunk)))
+            raw.write(gzip.compress(chunk, compresslevel=6))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, target)
+    source.unlink()
+    if index is not None:
+        index.add_segment(target.name, members)
+    return target
+
+
+class CompressingRotatingHandler(BaseRotatingHandler):
+    """JSONL file handler with size/daily rotation, background gzip and a disk quota.
+
+    Rotated segments are renamed to ``<stem>.<YYYYmmddTHHMMSS>[-n]<suffix>``
+    after the local time of their first record, then compressed on a worker
+    thread, which also indexes them by run_id (see :mod:`src.logs`). Once
+    compression finishes the oldest segments are deleted until all rotated
+    segments together fit in ``max_total_bytes``.
+    """
+
+    def __init__(
+        self,
+        filename: Path,
+        *,
+        max_bytes: int,
+        max_total_bytes: int,
+        tz: ZoneInfo,
+        daily: bool = False,
+        compress: bool = True,
+    ) -> None:
+        super().__init__(str(filename), "a", encoding="utf-8", delay=False)
+        self._path = Path(filename)
+        self._max_bytes = max_bytes
+        self._max_total_bytes = max_total_bytes
+        self._tz = tz
+        self._daily = daily
+        self._compress = compress
+        self._index = LogIndex(index_path(self._path))
+        self._segment_start = self._first_record_time() if self._path.stat().st_size else None
+        self._rollover_at = self._next_rollover(self._segment_start)
+        self._jobs: "queue.Queue[Tuple[str, Optional[Path]]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._work, name="log-compress", daemon=True)
+        self._worker.start()
+        if compress:
+            for segment in rotated_segments(self._path):  # left uncompressed by an interrupted run
+                if segment.name.startswith(segment_prefix(self._path)) and segment.suffix != ".gz":
+                    self._jobs.put(("compress", segment))
+        self._jobs.put(("quota", None))
+
+    def _first_record_time(self) -> datetime:
+        try:
+            with self._path.open("r", encoding="utf-8") as fh:
+                return datetime.fromisoformat(json.loads(fh.readline())["ts"]).astimezone(self._tz)
+        except (OSError, ValueError, KeyError, TypeError):
+            return datetime.fromtimestamp(self._path.stat().st_mtime, self._tz)
+
+    def _next_rollover(self, start: Optional[datetime]) -> Optional[float]:
+        if not self._daily or start is None:
+            return None
+        next_day = datetime.combine(start.date() + timedelta(days=1), time(), tzinfo=self._tz)
+        return next_day.timestamp()
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:  # noqa: N802 - logging API
+        if self.stream is None:
+            self.stream = self._open()
+        if self._rollover_at is not None and record.created >= self._rollover_at:
+            return True
+        # Checked after the previous write so each record is only encoded once.
+        return self._max_bytes > 0 and self.stream.tell() >= self._max_bytes
+
+    def _segment_name(self) -> Path:
+        start = self._segment_start or datetime.now(self._tz)
+        stem = f"{segment_prefix(self._path)}{start.strftime('%Y%m%dT%H%M%S')}"
+        candidate = self._path.with_name(f"{stem}{self._path.suffix}")
+        counter = 0
+        while candidate.exists() or candidate.with_name(f"{candidate.name}.gz").exists():
+            counter += 1
+            candidate = self._path.with_name(f"{stem}-{counter}{self._path.suffix}")
+        return candidate
+
+    def doRollover(self) -> None:  # noqa: N802 - logging API
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if self._path.exists() and self._path.stat().st_size:
+            segment = self._segment_name()
+            os.replace(self._path, segment)
+            self._jobs.put(("compress", segment) if self._compress else ("quota", None))
+        self._segment_start = None
+        self._rollover_at = None
+        self.stream = self._open()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        if self._segment_start is None:
+            self._segment_start = datetime.fromtimestamp(record.created, self._tz)
+            self._rollover_at = self._next_rollover(self._segment_start)
+
+    def _work(self) -> None:
+        while True:
+            action, segment = self._jobs.get()
+            try:
+                if action == "stop":
+                    return
+                if action == "compress" and segment is not None:
+                    compress_segment(segment, self._index)
+                self._enforce_quota()
+            except (OSError, sqlite3.Error):
+                # Not the anyrouter logger: this runs inside its own handler.
+                logging.getLogger(__name__).warning("Log segment maintenance failed for %s", segment, exc_info=True)
+            finally:
+                self._jobs.task_done()
+
+    def _enforce_quota(self) -> None:
+        segments = [path for path in rotated_segments(self._path) if path.exists()]
+        sizes = [path.stat().st_size for path in segments]
+        total = sum(sizes)
+        for path, size in zip(segments, sizes):
+            if total <= self._max_total_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._index.drop_segment(path.name)
+            total -= size
+
+    def close(self) -> None:
+        worker = getattr(self, "_worker", None)
+        if worker is not None and worker.is_alive():
+            self._jobs.put(("stop", None))
+            worker.join(timeout=30)
+        super().close()
+
+
+class _RecordQueueHandler(QueueHandler):
+    """Hand records to the listener thread with args and tracebacks already resolved.
+
+    Unlike :meth:`QueueHandler.prepare` this keeps the structured ``extra``
+    fields and defers JSON encoding to the listener, so the calling thread only
+    pays for message interpolation and a queue put.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RunLoggerAdapter(logging.LoggerAdapter):
+    """Adapter that merges call-site ``extra`` fields with the run context.
+
+    The stock adapter replaces per-call ``extra`` with its own, which silently
+    dropped fields such as ``step`` and ``error_code`` from every record.
+    """
+
+    def process(self, msg: Any, kwargs: Any) -> Tuple[Any, Any]:
+        kwargs["extra"] = {**self.extra, **(kwargs.get("extra") or {})}
+        return msg, kwargs
+
+
+_lock = threading.RLock()
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+_active_key: Optional[Tuple[Any, ...]] = None
+
+
+def _handler_key(config: Config) -> Tuple[Any, ...]:
+    return (
+        str(config.logging.log_file),
+        config.run.log_max_bytes,
+        config.run.log_max_total_bytes,
+        config.run.log_rotate_daily,
+        config.run.log_compress,
+        config.timezone,
+    )
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background listener."""
+    global _listener, _queue_handler, _active_key
+    with _lock:
+        listener, _listener = _listener, None
+        handler, _queue_handler = _queue_handler, None
+        _active_key = None
+    if handler is not None:
+        logging.getLogger("anyrouter").removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+        for target in listener.handlers:
+            target.close()
+
+
+atexit.register(shutdown_logging)
 
 
 def setup_logging(config: Config, run_id: str) -> logging.Logger:
-    """Configure a JSON rotating log handler and return the module logger."""
-    ensure_directories((config.logging.log_file.parent,))
+    """Configure queued JSON logging once per process and return a run-scoped logger.
+
+    Repeated calls with the same logging settings reuse the existing handlers;
+    different settings replace them. File writes and JSON encoding happen on a
+    background listener thread.
+    """
+    global _listener, _queue_handler, _active_key
     logger = logging.getLogger("anyrouter")
     logger.setLevel(logging.INFO)
-    tz = get_timezone(config.timezone)
-
-    handler = RotatingFileHandler(
-        filename=config.logging.log_file,
-        maxBytes=config.run.log_max_bytes,
-        backupCount=config.run.log_backup_count,
-        encoding="utf-8",
-    )
-    handler.setFormatter(JsonFormatter(tz))
-    logger.addHandler(handler)
+    key = _handler_key(config)
+    with _lock:
+        if _active_key != key:
+            shutdown_logging()
+            ensure_directories((config.logging.log_file.parent,))
+            tz = get_timezone(config.timezone)
+            file_handler = CompressingRotatingHandler(
+                config.logging.log_file,
+                max_bytes=config.run.log_max_bytes,
+                max_total_bytes=config.run.log_max_total_bytes,
+                tz=tz,
+                daily=config.run.log_rotate_daily,
+                compress=config.run.log_compress,
+            )
+            file_handler.setFormatter(JsonFormatter(tz))
+            stream_handler = logging.StreamHandler()
+            stream_handler.setFormatter(JsonFormatter(tz))
 
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(JsonFormatter(tz))
-    logger.addHandler(stream_handler)
+            records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            _queue_handler = _RecordQueueHandler(records)
+            _listener = QueueListener(records, file_handler, stream_handler, respect_handler_level=True)
+            _listener.start()
+            logger.addHandler(_queue_handler)
+            _active_key = key
 
-    logger = logging.LoggerAdapter(logger, extra={"run_id": run_id})
-    return logger
+    return RunLoggerAdapter(logger, extra={"run_id": run_id})
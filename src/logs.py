@@ -0,0 +1,308 @@
+"""Readers for the active JSONL log and its rotated, possibly compressed, segments.
+
+Compressed segments are indexed as they are written: a sidecar SQLite file
+maps run_id, day and error_code to the segment and gzip member holding the
+records, so ``python -m src.logs show <run_id>`` decompresses only those
+members instead of scanning every segment.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import re
+import sqlite3
+import sys
+import zlib
+from contextlib import closing
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+_LEGACY_SUFFIX = re.compile(r"^\.(\d+)$")
+
+
+def segment_prefix(log_file: Path) -> str:
+    """Name prefix shared by rotated segments, e.g. ``signin.`` for ``signin.jsonl``."""
+    return f"{log_file.stem}."
+
+
+def rotated_segments(log_file: Path) -> List[Path]:
+    """Return rotated segments of ``log_file``, oldest first.
+
+    Legacy ``signin.jsonl.N`` backups (higher N is older) come before the
+    timestamped ``signin.<YYYYmmddTHHMMSS>[-n].jsonl[.gz]`` segments, which
+    sort chronologically by name.
+    """
+    legacy = []
+    timestamped = []
+    for path in log_file.parent.glob(f"{log_file.name}.*"):
+        match = _LEGACY_SUFFIX.match(path.name[len(log_file.name):])
+        if match:
+            legacy.append((int(match.group(1)), path))
+    prefix = segment_prefix(log_file)
+    for path in log_file.parent.glob(f"{prefix}*{log_file.suffix}*"):
+        rest = path.name[len(prefix):]
+        if not rest[:1].isdigit():
+            continue
+        if path.name.endswith(f"{log_file.suffix}.gz") or path.name.endswith(log_file.suffix):
+            timestamped.append(path)
+    # A segment that is mid-compression exists in both forms; prefer the plain file.
+    names = {path.name for path in timestamped}
+    timestamped = [
+        path for path in timestamped if not (path.suffix == ".gz" and path.name[:-3] in names)
+    ]
+    legacy_paths = [path for _, path in sorted(legacy, reverse=True)]
+    return legacy_paths + sorted(timestamped, key=lambda path: path.name.removesuffix(".gz"))
+
+
+def log_segments(log_file: Path) -> List[Path]:
+    """Return every segment including the active file, oldest first."""
+    return [*rotated_segments(log_file), *([log_file] if log_file.exists() else [])]
+
+
+def open_segment(path: Path) -> IO[str]:
+    """Open a segment for text reading, transparently decompressing ``.gz`` files."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return path.open("r", encoding="utf-8", errors="replace")
+
+
+def iter_log_records(log_file: Path) -> Iterator[Dict[str, Any]]:
+    """Stream JSON records from all segments in chronological order, skipping bad lines."""
+    for segment in log_segments(log_file):
+        try:
+            fh = open_segment(segment)
+        except FileNotFoundError:  # removed by quota enforcement or compression meanwhile
+            continue
+        with fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    yield record
+
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS entries (
+    run_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    error_code TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    UNIQUE (run_id, error_code, segment, offset)
+);
+CREATE INDEX IF NOT EXISTS entries_run_id ON entries (run_id);
+CREATE INDEX IF NOT EXISTS entries_day ON entries (day, error_code);
+CREATE INDEX IF NOT EXISTS entries_error_code ON entries (error_code, day);
+CREATE INDEX IF NOT EXISTS entries_segment ON entries (segment);
+"""
+_READ_BYTES = 64 * 1024
+
+IndexEntry = Tuple[str, str, str]  # run_id, day, error_code
+
+
+def index_path(log_file: Path) -> Path:
+    return log_file.with_name(f"{log_file.stem}.index.db")
+
+
+def entries_for_chunk(chunk: bytes) -> Set[IndexEntry]:
+    """Collect the distinct (run_id, day, error_code) keys of the JSON lines in ``chunk``."""
+    keys: Set[IndexEntry] = set()
+    for line in chunk.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(record, dict) or not record.get("run_id"):
+            continue
+        keys.add((str(record["run_id"]), str(record.get("ts", ""))[:10], str(record.get("error_code") or "")))
+    return keys
+
+
+class LogIndex:
+    """Sidecar index of compressed segments; each call uses its own short-lived connection."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_INDEX_SCHEMA)
+        return conn
+
+    def add_segment(self, segment: str, members: Iterable[Tuple[int, Set[IndexEntry]]]) -> None:
+        rows = [
+            (run_id, day, error_code, segment, offset)
+            for offset, keys in members
+            for run_id, day, error_code in keys
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries (run_id, day, error_code, segment, offset) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("INSERT OR IGNORE INTO segments (name) VALUES (?)", (segment,))
+
+    def drop_segment(self, segment: str) -> None:
+        if not self.path.exists():
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM entries WHERE segment = ?", (segment,))
+            conn.execute("DELETE FROM segments WHERE name = ?", (segment,))
+
+    def indexed_segments(self) -> Set[str]:
+        if not self.path.exists():
+            return set()
+        with closing(self._connect()) as conn:
+            return {row[0] for row in conn.execute("SELECT name FROM segments")}
+
+    def locate(self, run_id: str) -> List[Tuple[str, int]]:
+        """Return ``(segment, member offset)`` pairs holding ``run_id``'s records, in log order."""
+        if not self.path.exists():
+            return []
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT segment, offset FROM entries WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        return sorted(rows, key=lambda row: (row[0].removesuffix(".gz"), row[1]))
+
+    def find_runs(self, *, day: Optional[str] = None, error_code: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """Return distinct ``(day, run_id, error_code)`` keys matching the filters."""
+        if not self.path.exists():
+            return []
+        clauses, params = [], []
+        if day:
+            clauses.append("day = ?")
+            params.append(day)
+        if error_code:
+            clauses.append("error_code = ?")
+            params.append(error_code)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                f"SELECT DISTINCT day, run_id, error_code FROM entries{where} ORDER BY day, run_id", params
+            ).fetchall()
+
+
+def iter_gzip_members(fh: IO[bytes], start: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """Yield ``(offset, data)`` for each gzip member from ``start`` onwards."""
+    fh.seek(start)
+    offset = start
+    pending = b""
+    while True:
+        member_offset = offset
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        parts: List[bytes] = []
+        while not decompressor.eof:
+            if not pending:
+                pending = fh.read(_READ_BYTES)
+                if not pending:
+                    if parts:  # truncated trailing member
+                        yield member_offset, b"".join(parts)
+                    return
+            parts.append(decompressor.decompress(pending))
+            used = len(pending) - len(decompressor.unused_data)
+            offset += used
+            pending = decompressor.unused_data
+        yield member_offset, b"".join(parts)
+
+
+def index_segment(index: LogIndex, segment: Path) -> None:
+    """Index an already compressed segment, e.g. one written before indexing existed."""
+    with segment.open("rb") as fh:
+        members = [(offset, entries_for_chunk(data)) for offset, data in iter_gzip_members(fh)]
+    index.add_segment(segment.name, members)
+
+
+def _matching_lines(data: bytes, run_id: str) -> Iterator[str]:
+    needle = run_id.encode("utf-8")
+    for line in data.splitlines():
+        if needle not in line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get("run_id") == run_id:
+            yield line.decode("utf-8", errors="replace")
+
+
+def find_run_lines(log_file: Path, run_id: str) -> Iterator[str]:
+    """Yield the raw JSON lines of ``run_id`` in log order.
+
+    Indexed segments are read only at the recorded gzip members; segments the
+    index does not cover (plain, legacy, or the active file) are scanned.
+    """
+    index = LogIndex(index_path(log_file))
+    indexed = index.indexed_segments()
+    located: Dict[str, List[int]] = {}
+    for segment, offset in index.locate(run_id):
+        located.setdefault(segment, []).append(offset)
+    for path in log_segments(log_file):
+        if path.name in indexed:
+            offsets = located.get(path.name)
+            if not offsets:
+                continue
+            try:
+                fh = path.open("rb")
+            except FileNotFoundError:
+                continue
+            with fh:
+                for offset in offsets:
+                    for _, data in iter_gzip_members(fh, offset):
+                        yield from _matching_lines(data, run_id)
+                        break
+            continue
+        try:
+            fh = gzip.open(path, "rb") if path.suffix == ".gz" else path.open("rb")
+        except FileNotFoundError:
+            continue
+        with fh:
+            for line in fh:
+                yield from _matching_lines(line, run_id)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    from .config import load_config
+
+    parser = argparse.ArgumentParser(description="Look up runs in the JSONL logs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="print every log record of a run")
+    show.add_argument("run_id")
+    runs = sub.add_parser("runs", help="list indexed runs by day and/or error code")
+    runs.add_argument("--day", help="YYYY-MM-DD in config.timezone")
+    runs.add_argument("--error-code", help="e.g. NEED_AUTH")
+    sub.add_parser("reindex", help="index compressed segments missing from the index")
+    args = parser.parse_args(list(argv) if argv is not None else [])
+
+    log_file = load_config().logging.log_file
+    index = LogIndex(index_path(log_file))
+    if args.command == "show":
+        found = False
+        for line in find_run_lines(log_file, args.run_id):
+            found = True
+            print(line)
+        if not found:
+            print(f"No log records for run {args.run_id}", file=sys.stderr)
+            return 1
+        return 0
+    if args.command == "runs":
+        for day, run_id, error_code in index.find_runs(day=args.day, error_code=args.error_code):
+            print(f"{day}  {run_id}  {error_code or '-'}")
+        return 0
+    indexed = index.indexed_segments()
+    for segment in rotated_segments(log_file):
+        if segment.suffix == ".gz" and segment.name not in indexed:
+            index_segment(index, segment)
+            print(f"indexed {segment.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,163 @@
+"""Check-in health metrics for the node_exporter textfile collector.
+
+Each finished check-in folds its result into a small per-account state file
+and re-renders the whole metrics file, which is written to a temporary name
+and renamed into place so a scrape never sees a partial file. The output uses
+the Prometheus text format that the textfile collector parses.
+"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from .config import Config
+from .history import _locked
+
+SUCCESS_RESULTS = frozenset({"CHECKIN_OK", "CHECKIN_ALREADY"})
+
+
+@dataclass
+class RunMetrics:
+    account: str
+    result: str
+    error_code: str
+    attempts: int
+    duration_ms: int
+    finished: datetime
+
+
+def state_path(textfile: Path) -> Path:
+    return textfile.with_name(f"{textfile.name}.state.json")
+
+
+def _load_state(path: Path) -> Dict[str, Dict[str, Any]]:
+    try:
+        with path.open("r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        fh.write(text)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def fold_run(state: Dict[str, Any], run: RunMetrics, buckets: Sequence[float]) -> Dict[str, Any]:
+    """Add one run to an account's cumulative counters."""
+    bounds = [float(bound) for bound in buckets]
+    if state.get("buckets") != bounds:
+        # Bucket layout changed: cumulative bucket counts can no longer be compared.
+        state = {key: value for key, value in state.items() if key not in ("buckets", "bucket_counts")}
+        state["buckets"] = bounds
+        state["bucket_counts"] = [0] * len(bounds)
+    seconds = run.duration_ms / 1000
+    for index, bound in enumerate(bounds):
+        if seconds <= bound:
+            state["bucket_counts"][index] += 1
+    state["duration_count"] = state.get("duration_count", 0) + 1
+    state["duration_sum"] = state.get("duration_sum", 0.0) + seconds
+    state["attempts_total"] = state.get("attempts_total", 0) + run.attempts
+    state["last_attempts"] = run.attempts
+    state["last_duration_seconds"] = seconds
+    state["last_run_timestamp"] = run.finished.timestamp()
+    if run.result in SUCCESS_RESULTS:
+        state["last_success_timestamp"] = run.finished.timestamp()
+    state["last_success"] = 1 if run.result in SUCCESS_RESULTS else 0
+    results = state.setdefault("results", {})
+    results[run.result] = results.get(run.result, 0) + 1
+    if run.error_code:
+        errors = state.setdefault("errors", {})
+        errors[run.error_code] = errors.get(run.error_code, 0) + 1
+    return state
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(accounts: Mapping[str, Mapping[str, Any]]) -> str:
+    """Render all accounts' state as a textfile-collector document."""
+    families: List[tuple[str, str, str, List[str]]] = []
+
+    def family(name: str, kind: str, help_text: str) -> List[str]:
+        samples: List[str] = []
+        families.append((name, kind, help_text, samples))
+        return samples
+
+    last_success = family(
+        "anyrouter_checkin_last_success_timestamp_seconds", "gauge", "Unix time of the last successful check-in."
+    )
+    last_run = family("anyrouter_checkin_last_run_timestamp_seconds", "gauge", "Unix time the last check-in finished.")
+    last_ok = family("anyrouter_checkin_last_run_success", "gauge", "1 if the last check-in succeeded, else 0.")
+    last_attempts = family("anyrouter_checkin_last_run_attempts", "gauge", "Attempts used by the last check-in.")
+    duration = family("anyrouter_checkin_duration_seconds", "histogram", "Check-in wall-clock duration.")
+    attempts = family("anyrouter_checkin_attempts_total", "counter", "Check-in attempts, including retries.")
+    runs = family("anyrouter_checkin_runs_total", "counter", "Finished check-ins by result.")
+    errors = family("anyrouter_checkin_errors_total", "counter", "Failed check-ins by error code.")
+
+    for account in sorted(accounts):
+        state = accounts[account]
+        label = _labels(account=account)
+        if "last_success_timestamp" in state:
+            last_success.append(f"anyrouter_checkin_last_success_timestamp_seconds{label} {_number(state['last_success_timestamp'])}")
+        if "last_run_timestamp" in state:
+            last_run.append(f"anyrouter_checkin_last_run_timestamp_seconds{label} {_number(state['last_run_timestamp'])}")
+            last_ok.append(f"anyrouter_checkin_last_run_success{label} {state.get('last_success', 0)}")
+            last_attempts.append(f"anyrouter_checkin_last_run_attempts{label} {state.get('last_attempts', 0)}")
+        for bound, count in zip(state.get("buckets", ()), state.get("bucket_counts", ())):
+            duration.append(f"anyrouter_checkin_duration_seconds_bucket{_labels(account=account, le=_number(bound))} {count}")
+        if "duration_count" in state:
+            count = state["duration_count"]
+            duration.append(f"anyrouter_checkin_duration_seconds_bucket{_labels(account=account, le='+Inf')} {count}")
+            duration.append(f"anyrouter_checkin_duration_seconds_sum{label} {_number(state.get('duration_sum', 0.0))}")
+            duration.append(f"anyrouter_checkin_duration_seconds_count{label} {count}")
+        attempts.append(f"anyrouter_checkin_attempts_total{label} {state.get('attempts_total', 0)}")
+        for result, count in sorted(state.get("results", {}).items()):
+            runs.append(f"anyrouter_checkin_runs_total{_labels(account=account, result=result)} {count}")
+        for code, count in sorted(state.get("errors", {}).items()):
+            errors.append(f"anyrouter_checkin_errors_total{_labels(account=account, error_code=code)} {count}")
+
+    lines: List[str] = []
+    for name, kind, help_text, samples in families:
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def export_run_metrics(config: Config, run: RunMetrics) -> Optional[Path]:
+    """Fold ``run`` into the metrics state and atomically rewrite the textfile.
+
+    Returns the textfile path, or ``None`` when ``[metrics] textfile`` is unset.
+    """
+    textfile = config.metrics.textfile
+    if textfile is None:
+        return None
+    textfile.parent.mkdir(parents=True, exist_ok=True)
+    state_file = state_path(textfile)
+    with _locked(state_file):
+        state = _load_state(state_file)
+        state[run.account] = fold_run(dict(state.get(run.account) or {}), run, config.metrics.duration_buckets)
+        _write_atomic(state_file, json.dumps(state, ensure_ascii=False, sort_keys=True))
+        _write_atomic(textfile, render_metrics(state))
+    return textfile
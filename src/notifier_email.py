@@ -4,19 +4,18 @@ from __future__ import annotations
 import logging
 import mimetypes
 import smtplib
-from contextlib import suppress
 from email.message import EmailMessage
 from pathlib import Path
 from typing import Iterable, Optional
 
 from zoneinfo import ZoneInfo
 
+from .alerts import FailureAlerts, annotate_failure, resolved_lines
 from .config import Config
-from .utils import (
-    now_tz,
-    record_success_email_sent,
-    should_send_success_email,
-)
+from .outbox import Outbox, outbox_dir, outbox_worker, set_exit_flush
+from .smtp_session import send_message
+from .store import open_store
+from .utils import now_tz
 
 logger = logging.getLogger(__name__)
 
@@ -25,12 +24,18 @@ class EmailNotifier:
     def __init__(self, config: Config, tz: ZoneInfo) -> None:
         self._config = config
         self._tz = tz
+        self._outbox: Optional[Outbox] = None
+        if self.enabled and config.notify.outbox:
+            self._outbox = Outbox(outbox_dir(config), config.notify)
+            set_exit_flush(config.notify.outbox_flush_seconds)
+            # Also retries whatever earlier runs left queued.
+            outbox_worker(self._outbox.directory, config.notify, self.send_now).kick()
 
     @property
     def enabled(self) -> bool:
         return self._config.notify.enable_email and self._config.notify.smtp is not None
 
-    def _build_message(
+    def build_message(
         self,
         subject: str,
         body: str,
@@ -61,40 +66,29 @@ class EmailNotifier:
                 )
         return msg
 
-    def _send(self, message: EmailMessage) -> None:
+    def send_now(self, message: EmailMessage) -> None:
+        """Send ``message`` over SMTP immediately, bypassing the outbox; raises on failure."""
         smtp = self._config.notify.smtp
         if smtp is None:
             raise RuntimeError("SMTP configuration missing")
-        if smtp.use_ssl:
-            smtp_cls = smtplib.SMTP_SSL
-        else:
-            smtp_cls = smtplib.SMTP
-        client = smtp_cls(smtp.host, smtp.port, timeout=30)
-        try:
-            client.ehlo()
-            if smtp.use_starttls and not smtp.use_ssl:
-                client.starttls()
-                client.ehlo()
-            if smtp.username:
-                client.login(smtp.username, smtp.password or "")
-            client.send_message(message)
-        except Exception:
-            raise
-        else:
+        send_message(smtp, message, timeout=self._config.notify.email_timeout_seconds)
+
+    def deliver(self, message: EmailMessage, *, kind: str) -> bool:
+        """Send now, or queue for the background worker when the outbox is enabled."""
+        if self._outbox is not None:
             try:
-                client.quit()
-            except smtplib.SMTPResponseException as exc:
-                logger.warning(
-                    "SMTP server error during quit (%s): %s",
-                    exc.smtp_code,
-                    exc.smtp_error,
-                    exc_info=False,
-                )
-            except smtplib.SMTPException as exc:
-                logger.warning("SMTP error during quit: %s", exc, exc_info=False)
-        finally:
-            with suppress(Exception):
-                client.close()
+                self._outbox.enqueue(message, kind=kind)
+            except OSError:
+                logger.exception("Failed to queue %s notification email; sending directly", kind)
+            else:
+                outbox_worker(self._outbox.directory, self._config.notify, self.send_now).kick()
+                return True
+        try:
+            self.send_now(message)
+        except (smtplib.SMTPException, OSError):
+            logger.exception("Failed to send %s notification email", kind)
+            return False
+        return True
 
     def send_success(
         self,
@@ -104,19 +98,15 @@ class EmailNotifier:
         if not self.enabled:
             return False
         now = now_tz(self._tz)
-        if (
-            self._config.notify.success_email_once_per_day
-            and not should_send_success_email(self._config.meta_dir, now)
-        ):
+        once_per_day = self._config.notify.success_email_once_per_day
+        store = open_store(self._config) if once_per_day else None
+        if store is not None and not store.should_send_success_email(self._config.account, now):
             return False
-        message = self._build_message(subject, body)
-        try:
-            self._send(message)
-        except (smtplib.SMTPException, OSError):
-            logger.exception("Failed to send success notification email")
+        message = self.build_message(subject, body)
+        if not self.deliver(message, kind="success"):
             return False
-        if self._config.notify.success_email_once_per_day:
-            record_success_email_sent(self._config.meta_dir, now)
+        if store is not None:
+            store.record_success_email_sent(self._config.account, now)
         return True
 
     def send_failure(
@@ -125,13 +115,39 @@ class EmailNotifier:
         body: str,
         *,
         attachments: Optional[Iterable[Path]] = None,
+        error_code: Optional[str] = None,
     ) -> bool:
+        """Alert on a failure; repeats of ``error_code`` inside the cooldown are suppressed."""
         if not self.enabled or not self._config.notify.email_on_failure_always:
             return False
-        message = self._build_message(subject, body, attachments=attachments)
-        try:
-            self._send(message)
-        except (smtplib.SMTPException, OSError):
-            logger.exception("Failed to send failure notification email")
+        decision = None
+        if error_code:
+            now = now_tz(self._tz)
+            decision = FailureAlerts(self._config).observe(error_code, now)
+            if not decision.send:
+                logger.info("Suppressed %s failure email (%d in a row)", error_code, decision.state.count)
+                return False
+            subject, body = annotate_failure(subject, body, decision)
+        message = self.build_message(subject, body, attachments=attachments)
+        if not self.deliver(message, kind="failure"):
+            return False
+        if decision is not None:
+            FailureAlerts(self._config).mark_sent(decision.state, now)
+        return True
+
+    def send_resolved(self, subject: str, body: str) -> bool:
+        """Close open failure alerts; email only if one of them was actually sent."""
+        if not self.enabled:
+            return False
+        alerts = FailureAlerts(self._config)
+        states = alerts.emailed()
+        if not states:
+            alerts.clear()
             return False
+        codes = ",".join(state.error_code for state in states)
+        body = body.rstrip("\n") + "\n\nResolved:\n" + "\n".join(resolved_lines(states)) + "\n"
+        message = self.build_message(f"{subject} {codes}", body)
+        if not self.deliver(message, kind="resolved"):
+            return False  # keep the alerts open so the next success retries
+        alerts.clear()
         return True
@@ -0,0 +1,82 @@
+"""Generic HTTP webhook notifications."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from .config import Config, WebhookConfig
+from .http_checkin import HttpClient
+from .store import open_store
+
+
+class WebhookError(RuntimeError):
+    pass
+
+
+class WebhookNotifier:
+    """POST one JSON document per event to ``webhook.url``.
+
+    Unlike email there is no per-day or cooldown bookkeeping: the receiver
+    gets every event listed in ``webhook.events`` and can group them itself.
+    A ``resolved`` event is only posted when the previous check-in failed.
+    One keep-alive :class:`HttpClient` serves every event until :meth:`close`.
+    """
+
+    def __init__(self, config: Config, webhook: WebhookConfig) -> None:
+        self._config = config
+        self._webhook = webhook
+        self.name = f"webhook:{webhook.name}"
+        self.timeout = webhook.timeout_seconds
+        self._client = HttpClient(timeout=webhook.timeout_seconds, max_idle_per_origin=1)
+
+    def _post(self, event: str, subject: str, body: str, **fields: Any) -> bool:
+        if event not in self._webhook.events:
+            return False
+        payload: Dict[str, Any] = {
+            "event": event,
+            "account": self._config.account,
+            "subject": subject,
+            "body": body,
+            **fields,
+        }
+        headers = {"Content-Type": "application/json", **self._webhook.headers}
+        response = self._client.request(
+            "POST", self._webhook.url, headers=headers, body=json.dumps(payload).encode("utf-8")
+        )
+        if not 200 <= response.status < 300:
+            raise WebhookError(f"{self.name} returned HTTP {response.status}")
+        return True
+
+    def close(self) -> None:
+        self._client.close()
+
+    def send_success(self, subject: str, body: str) -> bool:
+        return self._post("success", subject, body)
+
+    def send_failure(
+        self,
+        subject: str,
+        body: str,
+        *,
+        attachments: Optional[Iterable[Path]] = None,
+        error_code: Optional[str] = None,
+    ) -> bool:
+        return self._post(
+            "failure",
+            subject,
+            body,
+            error_code=error_code,
+            attachments=[str(path) for path in attachments or []],
+        )
+
+    def send_resolved(self, subject: str, body: str) -> bool:
+        if "resolved" not in self._webhook.events:
+            return False
+        # The current run is recorded after notifications, so this is the previous one.
+        previous = next(
+            open_store(self._config).query_runs(account=self._config.account, stage="CHECKIN", limit=1), None
+        )
+        if previous is None or previous["result"] != "CHECKIN_FAIL":
+            return False
+        return self._post("resolved", subject, body, error_code=previous["error_code"])
@@ -0,0 +1,127 @@
+"""Notifier interface and concurrent fan-out over the configured backends.
+
+``signin`` and ``batch`` talk to one :class:`FanoutNotifier`, which hands
+every event to each backend (email plus any ``[[notify.webhooks]]``) on its
+own daemon thread and waits at most that backend's timeout. A slow or
+failing channel is logged and skipped; it never holds up the others or the
+process exit. Per-backend latency and errors land in the run log under
+``step=notify``. :meth:`FanoutNotifier.close` releases the backends'
+connections once the run is done.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Protocol, Sequence
+
+from .config import Config
+from .notifier_webhook import WebhookNotifier
+
+
+class Notifier(Protocol):
+    def send_success(self, subject: str, body: str) -> bool:
+        ...
+
+    def send_failure(
+        self,
+        subject: str,
+        body: str,
+        *,
+        attachments: Optional[Iterable[Path]] = None,
+        error_code: Optional[str] = None,
+    ) -> bool:
+        ...
+
+    def send_resolved(self, subject: str, body: str) -> bool:
+        ...
+
+
+@dataclass
+class Backend:
+    name: str
+    notifier: Notifier
+    timeout: float
+
+
+class FanoutNotifier:
+    def __init__(self, backends: Sequence[Backend], logger) -> None:
+        self.backends = list(backends)
+        self._logger = logger
+
+    def _dispatch(self, event: str, call: Callable[[Notifier], bool]) -> bool:
+        slots: List[Dict[str, Any]] = []
+        threads: List[threading.Thread] = []
+        for backend in self.backends:
+            slot: Dict[str, Any] = {}
+
+            def run(backend: Backend = backend, slot: Dict[str, Any] = slot) -> None:
+                started = time.monotonic()
+                try:
+                    slot["sent"] = bool(call(backend.notifier))
+                except Exception as exc:
+                    slot["error"] = f"{type(exc).__name__}: {exc}"
+                slot["ms"] = int((time.monotonic() - started) * 1000)
+
+            thread = threading.Thread(target=run, name=f"notify-{backend.name}", daemon=True)
+            thread.start()
+            slots.append(slot)
+            threads.append(thread)
+
+        started = time.monotonic()
+        reports: Dict[str, Dict[str, Any]] = {}
+        for backend, thread, slot in zip(self.backends, threads, slots):
+            thread.join(max(0.0, started + backend.timeout - time.monotonic()))
+            if thread.is_alive():
+                reports[backend.name] = {"sent": False, "error": "timeout", "ms": int(backend.timeout * 1000)}
+            else:
+                reports[backend.name] = {"sent": False, **slot}
+        failed = [name for name, report in reports.items() if "error" in report]
+        log = self._logger.warning if failed else self._logger.info
+        log(
+            "Notification delivery failed" if failed else "Notifications dispatched",
+            extra={"step": "notify", "action": event, "notify": reports},
+        )
+        return any(report["sent"] for report in reports.values())
+
+    def send_success(self, subject: str, body: str) -> bool:
+        return self._dispatch("success", lambda notifier: notifier.send_success(subject, body))
+
+    def send_failure(
+        self,
+        subject: str,
+        body: str,
+        *,
+        attachments: Optional[Iterable[Path]] = None,
+        error_code: Optional[str] = None,
+    ) -> bool:
+        files = list(attachments) if attachments is not None else None
+        return self._dispatch(
+            "failure",
+            lambda notifier: notifier.send_failure(subject, body, attachments=files, error_code=error_code),
+        )
+
+    def send_resolved(self, subject: str, body: str) -> bool:
+        return self._dispatch("resolved", lambda notifier: notifier.send_resolved(subject, body))
+
+    def close(self) -> None:
+        for backend in self.backends:
+            close = getattr(backend.notifier, "close", None)
+            if callable(close):
+                close()
+
+    def __enter__(self) -> "FanoutNotifier":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def build_notifier(config: Config, email: Notifier, logger) -> FanoutNotifier:
+    """Fan out to ``email`` (or its batch-digest stand-in) and every configured webhook."""
+    backends = [Backend("email", email, config.notify.email_timeout_seconds)]
+    for webhook in config.notify.webhooks:
+        notifier = WebhookNotifier(config, webhook)
+        backends.append(Backend(notifier.name, notifier, notifier.timeout))
+    return FanoutNotifier(backends, logger)
@@ -0,0 +1,270 @@
+"""Persistent notification outbox with background delivery.
+
+With ``notify.outbox = true`` every email is first written to
+``<meta_dir>/outbox/`` and then delivered by a background thread, so the
+check-in never waits on the SMTP server. Entries are only removed after a
+successful send (at-least-once); failures are retried with
+``notify.outbox_backoff_seconds`` and moved to ``outbox/dead/`` after
+``notify.outbox_max_attempts``. Whatever is still queued when the process
+exits is picked up by the next run or ``python -m src.outbox deliver``.
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import email
+import email.policy
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import Config, NotifyConfig, load_config, select_accounts
+from .history import _locked
+from .smtp_session import pooled_smtp
+from .utils import exponential_backoff
+
+logger = logging.getLogger(__name__)
+
+Sender = Callable[[EmailMessage], None]
+
+
+def outbox_dir(config: Config) -> Path:
+    return config.meta_dir / "outbox"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with tmp.open("wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+class Outbox:
+    """Directory of ``<id>.eml`` messages with ``<id>.json`` delivery state.
+
+    The state file is written last, so a message only becomes visible once it
+    is fully on disk.
+    """
+
+    def __init__(self, directory: Path, notify: NotifyConfig) -> None:
+        self.directory = directory
+        self._max_attempts = notify.outbox_max_attempts
+        self._backoff = notify.outbox_backoff_seconds
+
+    def enqueue(self, message: EmailMessage, *, kind: str, now: Optional[float] = None) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        created = time.time() if now is None else now
+        entry_id = f"{int(created * 1000):013d}-{uuid.uuid4().hex[:8]}"
+        _write_atomic(self.directory / f"{entry_id}.eml", bytes(message))
+        state = {"kind": kind, "created": created, "attempts": 0, "next_attempt": created}
+        _write_atomic(self.directory / f"{entry_id}.json", json.dumps(state).encode("utf-8"))
+        return entry_id
+
+    def entries(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ``(entry_id, state)`` oldest first."""
+        if not self.directory.exists():
+            return
+        for state_path in sorted(self.directory.glob("*.json")):
+            try:
+                state = json.loads(state_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            yield state_path.stem, state
+
+    def next_due(self) -> Optional[float]:
+        return min((state.get("next_attempt", 0.0) for _, state in self.entries()), default=None)
+
+    def _remove(self, entry_id: str) -> None:
+        (self.directory / f"{entry_id}.json").unlink(missing_ok=True)
+        (self.directory / f"{entry_id}.eml").unlink(missing_ok=True)
+
+    def _bury(self, entry_id: str) -> None:
+        dead = self.directory / "dead"
+        dead.mkdir(exist_ok=True)
+        for suffix in (".eml", ".json"):
+            source = self.directory / f"{entry_id}{suffix}"
+            if source.exists():
+                os.replace(source, dead / source.name)
+
+    def deliver_due(self, send: Sender, *, now: Optional[float] = None, force: bool = False) -> Dict[str, int]:
+        """Send every due message (every message with ``force``) once.
+
+        Returns counts of sent, rescheduled and dead-lettered messages.
+        """
+        counts = {"sent": 0, "retry": 0, "dead": 0}
+        if not self.directory.exists():
+            return counts
+        # One deliverer per outbox, so concurrent runs do not send the same entry twice.
+        with _locked(self.directory / "deliver"):
+            current = time.time() if now is None else now
+            for entry_id, state in list(self.entries()):
+                if not force and state.get("next_attempt", 0.0) > current:
+                    continue
+                try:
+                    data = (self.directory / f"{entry_id}.eml").read_bytes()
+                except FileNotFoundError:
+                    self._remove(entry_id)
+                    continue
+                message = email.message_from_bytes(data, policy=email.policy.default)
+                started = time.monotonic()
+                try:
+                    send(message)  # type: ignore[arg-type]
+                except Exception as exc:
+                    state["attempts"] = state.get("attempts", 0) + 1
+                    state["last_error"] = f"{type(exc).__name__}: {exc}"
+                    if state["attempts"] >= self._max_attempts:
+                        logger.error("Giving up on queued %s email %s: %s", state.get("kind"), entry_id, exc)
+                        self._bury(entry_id)
+                        counts["dead"] += 1
+                        continue
+                    delay = exponential_backoff(self._backoff, state["attempts"])
+                    state["next_attempt"] = current + delay
+                    _write_atomic(self.directory / f"{entry_id}.json", json.dumps(state).encode("utf-8"))
+                    logger.warning(
+                        "Queued %s email %s failed (attempt %d); retrying in %.0fs: %s",
+                        state.get("kind"),
+                        entry_id,
+                        state["attempts"],
+                        delay,
+                        exc,
+                    )
+                    counts["retry"] += 1
+                    continue
+                self._remove(entry_id)
+                counts["sent"] += 1
+                logger.info(
+                    "Delivered queued %s email %s in %d ms",
+                    state.get("kind"),
+                    entry_id,
+                    int((time.monotonic() - started) * 1000),
+                )
+        return counts
+
+
+class OutboxWorker:
+    """Daemon thread delivering one outbox whenever kicked or a retry falls due."""
+
+    _IDLE_POLL_SECONDS = 60.0
+
+    def __init__(self, outbox: Outbox, send: Sender) -> None:
+        self._outbox = outbox
+        self._send = send
+        self._wake = threading.Event()
+        self._state = threading.Condition()
+        self._requested = 0
+        self._completed = 0
+        self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+        self._thread.start()
+
+    def kick(self) -> None:
+        with self._state:
+            self._requested += 1
+        self._wake.set()
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Wait until every pass requested so far has finished."""
+        with self._state:
+            return self._state.wait_for(lambda: self._completed >= self._requested, timeout)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self._sleep_seconds())
+            self._wake.clear()
+            with self._state:
+                target = self._requested
+            try:
+                with pooled_smtp():  # one SMTP login per pass, however many entries are due
+                    self._outbox.deliver_due(self._send)
+            except Exception:  # pragma: no cover - never let the worker die
+                logger.exception("Outbox delivery pass failed")
+            with self._state:
+                self._completed = target
+                self._state.notify_all()
+
+    def _sleep_seconds(self) -> float:
+        due = self._outbox.next_due()
+        if due is None:
+            return self._IDLE_POLL_SECONDS
+        return min(self._IDLE_POLL_SECONDS, max(0.0, due - time.time()))
+
+
+_workers: Dict[Path, OutboxWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def outbox_worker(directory: Path, notify: NotifyConfig, send: Sender) -> OutboxWorker:
+    """Return the process-wide worker for ``directory``, starting it if needed."""
+    with _workers_lock:
+        worker = _workers.get(directory)
+        if worker is None:
+            worker = _workers[directory] = OutboxWorker(Outbox(directory, notify), send)
+        return worker
+
+
+def flush_outboxes(timeout: float) -> bool:
+    """Give running workers up to ``timeout`` seconds to finish their current pass."""
+    deadline = time.monotonic() + timeout
+    with _workers_lock:
+        workers = list(_workers.values())
+    return all(worker.wait_idle(max(0.0, deadline - time.monotonic())) for worker in workers)
+
+
+_flush_seconds = 0.0
+
+
+def set_exit_flush(seconds: float) -> None:
+    """Bound how long interpreter exit waits for in-flight deliveries."""
+    global _flush_seconds
+    _flush_seconds = max(_flush_seconds, seconds)
+
+
+atexit.register(lambda: flush_outboxes(_flush_seconds))
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect or deliver queued notification emails.")
+    parser.add_argument("command", choices=("list", "deliver"))
+    parser.add_argument("--account", action="append", dest="accounts", help="limit to this account")
+    parser.add_argument("--all", action="store_true", help="deliver: ignore retry backoff")
+    args = parser.parse_args(list(argv) if argv is not None else [])
+
+    config = load_config()
+    with pooled_smtp():
+        failures = _run_command(args, config)
+    return 1 if failures else 0
+
+
+def _run_command(args: argparse.Namespace, config: Config) -> int:
+    from .notifier_email import EmailNotifier
+
+    failures = 0
+    for account in select_accounts(config, args.accounts):
+        box = Outbox(outbox_dir(account), account.notify)
+        if args.command == "list":
+            rows: List[str] = []
+            for entry_id, state in box.entries():
+                due = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(state.get("next_attempt", 0)))
+                rows.append(
+                    f"{account.account}  {entry_id}  {state.get('kind', '-')}  attempts={state.get('attempts', 0)}"
+                    f"  next={due}  {state.get('last_error', '')}".rstrip()
+                )
+            print("\n".join(rows) if rows else f"{account.account}: outbox empty")
+            continue
+        notifier = EmailNotifier(account, tz=None)
+        counts = box.deliver_due(notifier.send_now, force=args.all)
+        print(f"{account.account}: sent={counts['sent']} retry={counts['retry']} dead={counts['dead']}")
+        failures += counts["retry"] + counts["dead"]
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
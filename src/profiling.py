@@ -0,0 +1,149 @@
+"""Opt-in profiling of a single signin/authorize run.
+
+``--profile`` wraps the run in :mod:`cProfile` and writes, under
+``data/profiles/<run_id>/``, the raw ``profile.pstats`` dump, a plain-text
+``summary.txt`` and optionally a Playwright ``trace.zip``. The top functions
+and slowest timing spans are also logged as one ``step=profile`` record. The
+profiles directory is pruned oldest-first to ``run.profile_max_bytes`` so
+sampled profiling can stay enabled on scheduled runs.
+"""
+from __future__ import annotations
+
+import argparse
+import cProfile
+import io
+import pstats
+import random
+import shutil
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import Config
+from .timing import Spans
+
+DEFAULT_TOP = 20
+
+
+@dataclass
+class ProfileRun:
+    directory: Path
+    trace_path: Optional[Path] = None
+
+    def trace_files(self) -> List[Path]:
+        """Trace files actually written: ``trace.zip`` and/or one ``trace-<n>.zip`` per attempt."""
+        if self.trace_path is None:
+            return []
+        path = self.trace_path
+        chunks = path.parent.glob(f"{path.stem}-*{path.suffix}")
+        numbered = sorted(
+            (chunk for chunk in chunks if chunk.stem[len(path.stem) + 1 :].isdigit()),
+            key=lambda chunk: int(chunk.stem[len(path.stem) + 1 :]),
+        )
+        return ([path] if path.exists() else []) + numbered
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--profile", action="store_true", help="profile this run under data/profiles/<run_id>/")
+    parser.add_argument(
+        "--profile-sample",
+        type=float,
+        default=1.0,
+        metavar="RATE",
+        help="with --profile, only profile this fraction of runs (0-1, default 1)",
+    )
+    parser.add_argument("--profile-top", type=int, default=DEFAULT_TOP, help="functions listed in the summary")
+    parser.add_argument("--profile-trace", action="store_true", help="with --profile, also record a Playwright trace")
+
+
+def should_profile(args: argparse.Namespace) -> bool:
+    return bool(args.profile) and random.random() < args.profile_sample
+
+
+def profiles_dir(config: Config) -> Path:
+    return config.data_dir / "profiles"
+
+
+def top_functions(stats: pstats.Stats, limit: int) -> List[Dict[str, Any]]:
+    """Return the ``limit`` functions with the most self time."""
+    entries = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():  # type: ignore[attr-defined]
+        entries.append(
+            {
+                "function": f"{Path(filename).name}:{line}({name})",
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000, 1),
+                "cumtime_ms": round(cumtime * 1000, 1),
+            }
+        )
+    entries.sort(key=lambda entry: entry["tottime_ms"], reverse=True)
+    return entries[:limit]
+
+
+def _dir_size(path: Path) -> int:
+    return sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+
+
+def prune_profiles(root: Path, max_bytes: int, *, keep: Optional[Path] = None) -> None:
+    """Delete the oldest run directories until ``root`` fits in ``max_bytes``."""
+    if not root.exists():
+        return
+    runs = sorted((path for path in root.iterdir() if path.is_dir()), key=lambda path: path.stat().st_mtime)
+    sizes = {path: _dir_size(path) for path in runs}
+    total = sum(sizes.values())
+    for path in runs:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= sizes[path]
+
+
+@contextmanager
+def profile_run(
+    config: Config,
+    run_id: str,
+    logger,
+    *,
+    enabled: bool,
+    top: int = DEFAULT_TOP,
+    trace: bool = False,
+    spans: Optional[Spans] = None,
+) -> Iterator[Optional[ProfileRun]]:
+    """Profile the body when ``enabled``; yields ``None`` otherwise."""
+    if not enabled:
+        yield None
+        return
+    directory = profiles_dir(config) / run_id
+    directory.mkdir(parents=True, exist_ok=True)
+    run = ProfileRun(directory=directory, trace_path=directory / "trace.zip" if trace else None)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield run
+    finally:
+        profiler.disable()
+        try:
+            profiler.dump_stats(str(directory / "profile.pstats"))
+            buffer = io.StringIO()
+            stats = pstats.Stats(profiler, stream=buffer)
+            stats.sort_stats("tottime").print_stats(top)
+            (directory / "summary.txt").write_text(buffer.getvalue(), encoding="utf-8")
+            slowest = sorted((spans.as_dict() if spans else {}).items(), key=lambda item: item[1], reverse=True)
+            logger.info(
+                "Profile summary",
+                extra={
+                    "step": "profile",
+                    "profile": {
+                        "dir": str(directory),
+                        "top": top_functions(stats, top),
+                        "slowest_actions": [{"action": name, "ms": ms} for name, ms in slowest[:top]],
+                        "trace": [str(path) for path in run.trace_files()] or None,
+                    },
+                },
+            )
+            prune_profiles(profiles_dir(config), config.run.profile_max_bytes, keep=directory)
+        except OSError as exc:
+            logger.warning("Failed to write profile", extra={"step": "profile"}, exc_info=exc)
@@ -0,0 +1,98 @@
+"""Classify check-in API responses using the ``[checkin_response]`` rules."""
+from __future__ import annotations
+
+import json
+import re
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+from .config import CheckinResponseConfig
+from .utils import CheckInOutcome, SignInError
+
+_MISSING = object()
+
+
+class ResponseFormatError(SignInError):
+    """Raised when a check-in response cannot be interpreted with the configured rules."""
+
+    def __init__(self, message: str) -> None:
+        super().__init__("BAD_RESPONSE", message, retryable=True)
+
+
+@lru_cache(maxsize=16)
+def _compile(pattern: str) -> re.Pattern[str]:
+    return re.compile(pattern)
+
+
+def response_matches(rules: CheckinResponseConfig, url: str, method: str | None = None) -> bool:
+    """Return ``True`` when ``url``/``method`` identify the check-in API call."""
+    if not rules.url_pattern or not _compile(rules.url_pattern).search(url):
+        return False
+    return rules.method is None or (method or "").upper() == rules.method
+
+
+def _lookup(payload: Any, dotted: str) -> Any:
+    current = payload
+    for part in dotted.split("."):
+        if isinstance(current, Mapping) and part in current:
+            current = current[part]
+        elif isinstance(current, list) and part.isdigit() and int(part) < len(current):
+            current = current[int(part)]
+        else:
+            return _MISSING
+    return current
+
+
+def _same_value(expected: Any, actual: Any) -> bool:
+    # ``True == 1`` in Python; a boolean rule must only match a JSON boolean and vice versa.
+    if isinstance(expected, bool) or isinstance(actual, bool):
+        return type(expected) is type(actual) and expected == actual
+    return expected == actual
+
+
+def _rules_match(payload: Any, rules: Mapping[str, Any]) -> bool:
+    for path, expected in rules.items():
+        actual = _lookup(payload, path)
+        if actual is _MISSING:
+            return False
+        accepted = expected if isinstance(expected, list) else [expected]
+        if not any(_same_value(value, actual) for value in accepted):
+            return False
+    return True
+
+
+def classify_checkin_response(
+    rules: CheckinResponseConfig,
+    status: int,
+    body: str | bytes,
+    *,
+    url: Optional[str] = None,
+) -> CheckInOutcome:
+    """Map an API response to an outcome, or raise :class:`SignInError`.
+
+    ``already`` rules are evaluated before ``success`` rules. With no ``success``
+    rules configured (``load_config`` refuses that once an API is set up) a 2xx
+    JSON object counts as a successful check-in unless it says ``"success": false``.
+    """
+    if status in rules.auth_statuses:
+        raise SignInError("NEED_AUTH", f"Check-in API returned HTTP {status}", retryable=False)
+    try:
+        payload = json.loads(body)
+    except (TypeError, ValueError) as exc:
+        raise ResponseFormatError(f"Check-in API returned non-JSON body (HTTP {status})") from exc
+    if not isinstance(payload, Mapping):
+        raise ResponseFormatError(f"Check-in API returned {type(payload).__name__}, expected an object")
+
+    if rules.already and _rules_match(payload, rules.already):
+        return CheckInOutcome(status="CHECKIN_ALREADY", notes="Check-in API reported already checked", url=url)
+    if rules.success:
+        if _rules_match(payload, rules.success):
+            return CheckInOutcome(status="CHECKIN_OK", notes="Check-in API reported success", url=url)
+    elif 200 <= status < 300 and payload.get("success") is not False:
+        return CheckInOutcome(status="CHECKIN_OK", notes=f"Check-in API returned HTTP {status}", url=url)
+
+    detail = f"Check-in API rejected request (HTTP {status})"
+    message = payload.get("message") or payload.get("msg")
+    if message:
+        detail = f"{detail}: {message}"
+    raise SignInError("UNKNOWN", detail)
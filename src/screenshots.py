@@ -0,0 +1,190 @@
+"""Compact failure screenshots with background encoding.
+
+Only the capture itself stays on the failure path: the page is rendered to
+bytes with the configured clip and format, and a worker thread writes the
+file while the retry backoff runs. When Pillow is installed the worker also
+re-encodes WebP output and writes a downscaled JPEG copy that failure emails
+attach instead of the full-size image.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:  # Optional: WebP output and downscaled email copies
+    from PIL import Image
+except ImportError:  # pragma: no cover - exercised when Pillow is absent
+    Image = None  # type: ignore[assignment]
+
+from .config import SCREENSHOT_FORMATS, RunConfig
+
+logger = logging.getLogger(__name__)
+
+_EXTENSIONS = dict(zip(SCREENSHOT_FORMATS, (".png", ".jpg", ".webp")))
+_ELEMENT_TIMEOUT_MS = 2000
+
+
+def output_format(run_cfg: RunConfig) -> str:
+    """Format actually written; WebP needs Pillow and falls back to JPEG."""
+    if run_cfg.screenshot_format == "webp" and Image is None:
+        return "jpeg"
+    return run_cfg.screenshot_format
+
+
+def screenshot_file(base: Path, run_cfg: RunConfig) -> Path:
+    """Give a path from :func:`utils.build_screenshot_path` the configured extension."""
+    return base.with_suffix(_EXTENSIONS[output_format(run_cfg)])
+
+
+def email_copy_path(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.email.jpg")
+
+
+def email_attachment(path: Path) -> Path:
+    """Prefer the downscaled copy of a screenshot when one was written."""
+    copy = email_copy_path(path)
+    return copy if copy.exists() else path
+
+
+def capture_options(run_cfg: RunConfig) -> Dict[str, Any]:
+    """Playwright ``screenshot`` options; WebP is captured losslessly and re-encoded."""
+    if output_format(run_cfg) == "jpeg":
+        return {"type": "jpeg", "quality": run_cfg.screenshot_quality}
+    return {"type": "png"}
+
+
+def capture_bytes(page, run_cfg: RunConfig) -> bytes:
+    """Render the failure screenshot in memory without touching disk."""
+    options = capture_options(run_cfg)
+    if run_cfg.screenshot_mode == "element":
+        for selector in run_cfg.screenshot_clip_selectors:
+            try:
+                locator = page.locator(selector).first
+                if locator.is_visible():
+                    return locator.screenshot(timeout=_ELEMENT_TIMEOUT_MS, **options)
+            except Exception:  # element vanished or timed out; try the next selector
+                continue
+    return page.screenshot(full_page=run_cfg.screenshot_mode == "full_page", **options)
+
+
+async def capture_bytes_async(page, run_cfg: RunConfig) -> bytes:
+    options = capture_options(run_cfg)
+    if run_cfg.screenshot_mode == "element":
+        for selector in run_cfg.screenshot_clip_selectors:
+            try:
+                locator = page.locator(selector).first
+                if await locator.is_visible():
+                    return await locator.screenshot(timeout=_ELEMENT_TIMEOUT_MS, **options)
+            except Exception:
+                continue
+    return await page.screenshot(full_page=run_cfg.screenshot_mode == "full_page", **options)
+
+
+@dataclass
+class _Job:
+    data: bytes
+    path: Path
+    fmt: str
+    quality: int
+    email_max_width: int
+
+
+def _write_bytes(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write_screenshot(job: _Job) -> None:
+    """Write one captured screenshot and, with Pillow, its email copy."""
+    job.path.parent.mkdir(parents=True, exist_ok=True)
+    if Image is None:
+        _write_bytes(job.path, job.data)
+        return
+    image = Image.open(io.BytesIO(job.data))
+    if job.fmt == "webp":
+        buffer = io.BytesIO()
+        image.save(buffer, format="WEBP", quality=job.quality, method=4)
+        _write_bytes(job.path, buffer.getvalue())
+    else:
+        _write_bytes(job.path, job.data)
+    if job.email_max_width > 0:
+        copy = image.convert("RGB")
+        if copy.width > job.email_max_width:
+            height = max(1, round(copy.height * job.email_max_width / copy.width))
+            copy = copy.resize((job.email_max_width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        copy.save(buffer, format="JPEG", quality=min(job.quality, 75), optimize=True)
+        _write_bytes(email_copy_path(job.path), buffer.getvalue())
+
+
+class ScreenshotWriter:
+    """Single background thread that encodes and writes queued screenshots."""
+
+    def __init__(self) -> None:
+        self._jobs: "queue.SimpleQueue[_Job]" = queue.SimpleQueue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._thread = threading.Thread(target=self._work, name="screenshot-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, data: bytes, path: Path, run_cfg: RunConfig) -> None:
+        with self._idle:
+            self._pending += 1
+        self._jobs.put(
+            _Job(
+                data=data,
+                path=path,
+                fmt=output_format(run_cfg),
+                quality=run_cfg.screenshot_quality,
+                email_max_width=run_cfg.screenshot_email_max_width,
+            )
+        )
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """Wait until every submitted screenshot is on disk; ``False`` on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _work(self) -> None:
+        while True:
+            job = self._jobs.get()
+            try:
+                write_screenshot(job)
+            except Exception:
+                logger.warning("Failed to write screenshot %s", job.path, exc_info=True)
+            finally:
+                with self._idle:
+                    self._pending -= 1
+                    self._idle.notify_all()
+
+
+_writer: Optional[ScreenshotWriter] = None
+_writer_lock = threading.Lock()
+
+
+def screenshot_writer() -> ScreenshotWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ScreenshotWriter()
+        return _writer
+
+
+def drain_screenshots(timeout: float = 10.0) -> bool:
+    """Block until queued screenshots are written; a no-op if none were taken."""
+    writer = _writer
+    return writer.drain(timeout) if writer is not None else True
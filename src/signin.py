@@ -1,28 +1,36 @@
 """Automated AnyRouter daily check-in."""
 from __future__ import annotations
 
+import argparse
 import sys
 import time
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Callable, Sequence
 
-from playwright.sync_api import TimeoutError as PlaywrightTimeoutError, sync_playwright
-
-from .browser import launch_user_context
-from .config import Config, load_config
+from .browser import BrowserSession
+from .config import DEFAULT_ACCOUNT, Config, load_config, traces_dir
+from .http_checkin import FastPathUnavailable, HttpClient, http_checkin, use_http_fast_path
 from .logging_setup import setup_logging
+from .metrics import RunMetrics, export_run_metrics
 from .notifier_email import EmailNotifier
-from .state_check import ensure_logged_in, perform_checkin
+from .notifiers import build_notifier
+from .profiling import add_profile_arguments, profile_run, should_profile
+from .screenshots import capture_bytes, drain_screenshots, email_attachment, screenshot_file, screenshot_writer
+from .store import RunRecord, open_store, record_run
+from .timing import Spans
 from .utils import (
     CheckInOutcome,
     SignInError,
-    append_history_entry,
+    auth_state_path,
     build_screenshot_path,
-    capture_screenshot,
+    build_trace_path,
     ensure_data_tree,
     exponential_backoff,
     generate_run_id,
     get_timezone,
     now_tz,
+    prune_ring_buffer,
     serialize_duration_ms,
 )
 
@@ -35,22 +43,62 @@ def _capture_failure_artifacts(
     *,
     attempt: int,
     error_code: str,
+    spans: Spans | None = None,
 ) -> str | None:
     if not config.run.screenshot_on_failure or page is None:
         return None
     ensure_data_tree(config.data_dir, config.screenshots_dir, config.userdata_dir, config.meta_dir)
     ts = now_tz(tz)
-    screenshot_path = build_screenshot_path(
-        config.screenshots_dir, run_id, ts, attempt=attempt, error_code=error_code
+    screenshot_path = screenshot_file(
+        build_screenshot_path(config.screenshots_dir, run_id, ts, attempt=attempt, error_code=error_code),
+        config.run,
     )
     try:
-        capture_screenshot(page, screenshot_path)
+        with (spans if spans is not None else Spans()).span("screenshot"):
+            data = capture_bytes(page, config.run)
+        # Encoding and the disk write overlap with the retry backoff.
+        screenshot_writer().submit(data, screenshot_path, config.run)
         return str(screenshot_path)
     except Exception:  # pragma: no cover - defensive
         return None
 
 
+def _keep_failure_trace(
+    session: BrowserSession, config: Config, run_id: str, tz, *, attempt: int, error_code: str
+) -> None:
+    """Save the failed attempt's trace chunk into the size-bounded ring buffer."""
+    if not config.run.trace_on_failure:
+        session.stop_trace_chunk()
+        return
+    directory = traces_dir(config)
+    path = build_trace_path(directory, run_id, now_tz(tz), attempt=attempt, error_code=error_code)
+    if session.stop_trace_chunk(path) is not None:
+        prune_ring_buffer(directory, config.run.trace_max_bytes, "*.zip")
+
+
+def _refresh_storage_state(context, config: Config, logger) -> None:
+    """Persist fresh cookies so the next run can take the HTTP fast path."""
+    try:
+        context.storage_state(path=str(auth_state_path(config.data_dir)))
+    except Exception as exc:  # pragma: no cover - defensive
+        logger.warning("Failed to refresh storage state", extra={"step": "storage_state"}, exc_info=exc)
+
+
+def _attempt_http(
+    config: Config, logger, client: HttpClient, *, attempt: int, spans: Spans | None = None
+) -> CheckInOutcome:
+    logger.info(
+        "Calling check-in API",
+        extra={"step": "http", "url": config.site.checkin_api_url, "attempt": attempt},
+    )
+    with (spans if spans is not None else Spans()).span("http"):
+        outcome = http_checkin(config, client)
+    logger.info("Outcome", extra={"step": "http", "result": outcome.status, "attempt": attempt})
+    return outcome
+
+
 def _attempt_checkin(
+    session: BrowserSession,
     config: Config,
     logger,
     run_id: str,
@@ -58,105 +106,98 @@ def _attempt_checkin(
     *,
     attempt: int,
     headless: bool,
+    spans: Spans | None = None,
 ) -> CheckInOutcome:
+    # Playwright is imported here so runs that short-circuit never load it.
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    from .state_check import ensure_logged_in, navigate, perform_checkin
+
+    spans = spans if spans is not None else Spans()
     page = None
     try:
-        with sync_playwright() as playwright:
-            context = None
-            try:
-                context = launch_user_context(playwright, config, headless=headless)
-                page = context.new_page()
-                logger.info(
-                    "Navigating to check-in page",
-                    extra={"step": "navigate", "url": config.site.checkin_url, "attempt": attempt},
-                )
-                try:
-                    page.goto(
-                        config.site.checkin_url,
-                        wait_until="networkidle",
-                        timeout=config.run.nav_timeout_ms,
-                    )
-                except PlaywrightTimeoutError as exc:
-                    raise SignInError("NAV_TIMEOUT", "Timed out waiting for page load") from exc
+        page = session.new_page(headless=headless, spans=spans)
+        session.start_trace_chunk()
+        logger.info(
+            "Navigating to check-in page",
+            extra={"step": "navigate", "url": config.site.checkin_url, "attempt": attempt},
+        )
+        with spans.span("navigate"):
+            timings = navigate(page, config.site.checkin_url, config)
+        logger.info(
+            "Page ready",
+            extra={"step": "navigate", "attempt": attempt, "duration_ms": timings["total_ms"], "nav": timings},
+        )
 
-                ensure_logged_in(page, config)
-                outcome = perform_checkin(page, config)
-                logger.info(
-                    "Outcome", extra={"result": outcome.status, "attempt": attempt, "url": page.url}
-                )
-                return outcome
-            finally:
-                if context is not None:
-                    try:
-                        context.close()
-                    except Exception as close_exc:  # pragma: no cover - defensive
-                        logger.warning(
-                            "Failed to close browser context cleanly",
-                            extra={"step": "cleanup", "attempt": attempt},
-                            exc_info=close_exc,
-                        )
+        with spans.span("login"):
+            ensure_logged_in(page, config)
+        outcome = perform_checkin(page, config, spans=spans)
+        logger.info(
+            "Outcome", extra={"result": outcome.status, "attempt": attempt, "url": page.url}
+        )
+        session.stop_trace_chunk()
+        if config.run.http_fast_path:
+            _refresh_storage_state(page.context, config, logger)
+        return outcome
     except SignInError as exc:
-        screenshot_path = _capture_failure_artifacts(page, config, run_id, tz, attempt=attempt, error_code=exc.error_code)
+        screenshot_path = _capture_failure_artifacts(page, config, run_id, tz, attempt=attempt, error_code=exc.error_code, spans=spans)
         exc.screenshot_path = screenshot_path
+        _keep_failure_trace(session, config, run_id, tz, attempt=attempt, error_code=exc.error_code)
         raise
     except PlaywrightTimeoutError as exc:
         error = SignInError("NAV_TIMEOUT", "Navigation timeout during check-in")
-        screenshot_path = _capture_failure_artifacts(page, config, run_id, tz, attempt=attempt, error_code=error.error_code)
+        screenshot_path = _capture_failure_artifacts(page, config, run_id, tz, attempt=attempt, error_code=error.error_code, spans=spans)
         error.screenshot_path = screenshot_path
+        _keep_failure_trace(session, config, run_id, tz, attempt=attempt, error_code=error.error_code)
         raise error from exc
     except Exception as exc:
         error = SignInError("UNKNOWN", f"Unexpected error: {exc}")
-        screenshot_path = _capture_failure_artifacts(page, config, run_id, tz, attempt=attempt, error_code=error.error_code)
+        session.invalidate()
+        screenshot_path = _capture_failure_artifacts(page, config, run_id, tz, attempt=attempt, error_code=error.error_code, spans=spans)
         error.screenshot_path = screenshot_path
+        _keep_failure_trace(session, config, run_id, tz, attempt=attempt, error_code=error.error_code)
         raise error from exc
 
 
-def main() -> int:
-    config = load_config()
-    tz = get_timezone(config.timezone)
-    ensure_data_tree(config.data_dir, config.screenshots_dir, config.userdata_dir, config.meta_dir)
-    run_id = generate_run_id()
-    logger = setup_logging(config, run_id)
-    notifier = EmailNotifier(config, tz)
-    logger.info("Starting scheduled check-in", extra={"step": "start"})
-    start = now_tz(tz)
+def _export_metrics(config: Config, logger, *, result: str, error_code: str, attempts: int, duration: int, end) -> None:
+    run = RunMetrics(
+        account=config.account,
+        result=result,
+        error_code=error_code,
+        attempts=attempts,
+        duration_ms=duration,
+        finished=end,
+    )
+    try:
+        export_run_metrics(config, run)
+    except OSError as exc:
+        logger.warning("Failed to write metrics textfile", extra={"step": "metrics"}, exc_info=exc)
 
-    outcome: CheckInOutcome | None = None
-    error: SignInError | None = None
-    attempts_used = 0
 
-    for attempt in range(1, config.run.max_retries + 1):
-        headless = config.run.headless_preferred
-        if attempt > 1 and config.run.fallback_to_headed_on_retry:
-            headless = False
-        logger.info(
-            "Attempting check-in",
-            extra={"step": "attempt", "attempt": attempt, "headless": headless},
-        )
-        try:
-            outcome = _attempt_checkin(config, logger, run_id, tz, attempt=attempt, headless=headless)
-            attempts_used = attempt
-            break
-        except SignInError as exc:
-            attempts_used = attempt
-            error = exc
-            logger.error(
-                "Check-in attempt failed",
-                extra={
-                    "step": "attempt",
-                    "attempt": attempt,
-                    "error_code": exc.error_code,
-                    "retryable": exc.retryable,
-                },
-            )
-            if not exc.retryable or attempt >= config.run.max_retries:
-                break
-            delay = exponential_backoff(config.run.retry_backoff_seconds, attempt)
-            logger.info("Retrying after backoff", extra={"step": "retry", "delay": delay})
-            time.sleep(delay)
+def _account_tag(config: Config) -> str:
+    return "" if config.account == DEFAULT_ACCOUNT else f"[{config.account}]"
 
-    end = now_tz(tz)
+
+def _account_line(config: Config) -> str:
+    return "" if config.account == DEFAULT_ACCOUNT else f"Account: {config.account}\n"
+
+
+def _finalize_run(
+    config: Config,
+    logger,
+    notifier,
+    run_id: str,
+    *,
+    start,
+    end,
+    outcome: CheckInOutcome | None,
+    error: SignInError | None,
+    attempts_used: int,
+    spans: Spans | None = None,
+) -> int:
+    """Record the run in history, send notifications and return the exit code."""
     duration = serialize_duration_ms(start, end)
+    spans = spans if spans is not None else Spans()
 
     if outcome is not None:
         result = outcome.status
@@ -172,49 +213,221 @@ def main() -> int:
             extra={"result": result, "error_code": error_code, "notes": notes},
         )
 
-    append_history_entry(
-        config.history_file,
-        config.run.history_limit,
-        [
-            end.isoformat(),
-            run_id,
-            "CHECKIN",
-            result,
-            error_code,
-            str(max(0, attempts_used - 1)),
-            str(duration),
-            notes,
-        ],
-    )
-
-    if outcome and outcome.status == "CHECKIN_OK":
-        day = end.date()
-        subject = f"[AnyRouter][OK] {day.isoformat()}"
-        body = (
-            f"AnyRouter check-in succeeded.\n"
-            f"Run ID: {run_id}\nAttempts: {attempts_used}\n"
-            f"Duration: {duration} ms\nURL: {outcome.url or config.site.checkin_url}\n"
+    tag = _account_tag(config)
+    try:
+        with spans.span("email"):
+            if outcome and outcome.status in {"CHECKIN_OK", "CHECKIN_ALREADY"}:
+                if outcome.status == "CHECKIN_OK":
+                    day = end.date()
+                    subject = f"[AnyRouter]{tag}[OK] {day.isoformat()}"
+                    body = (
+                        f"AnyRouter check-in succeeded.\n"
+                        f"{_account_line(config)}"
+                        f"Run ID: {run_id}\nAttempts: {attempts_used}\n"
+                        f"Duration: {duration} ms\nURL: {outcome.url or config.site.checkin_url}\n"
+                    )
+                    notifier.send_success(subject, body)
+                else:
+                    logger.info("Already checked in for the day; no success email sent")
+                notifier.send_resolved(
+                    f"[AnyRouter]{tag}[RESOLVED]",
+                    f"AnyRouter check-in is healthy again ({outcome.status}).\n"
+                    f"{_account_line(config)}Run ID: {run_id}\n",
+                )
+            elif error:
+                ts = end.isoformat()
+                subject = f"[AnyRouter]{tag}[FAIL][{error.error_code}] {ts}"
+                drain_screenshots()
+                screenshot = email_attachment(Path(error.screenshot_path)) if error.screenshot_path else None
+                body_lines = [
+                    f"Check-in failed with error {error.error_code}.",
+                    *([_account_line(config).rstrip()] if tag else []),
+                    f"Run ID: {run_id}",
+                    f"Attempts used: {attempts_used}",
+                    f"Duration: {duration} ms",
+                    f"Notes: {notes}",
+                    f"URL: {config.site.checkin_url}",
+                ]
+                notifier.send_failure(
+                    subject,
+                    "\n".join(body_lines),
+                    attachments=[screenshot] if screenshot else None,
+                    error_code=error.error_code,
+                )
+    finally:
+        # Recorded last so the row carries the email span; notification errors must not lose it.
+        logger.info("Run timings", extra={"step": "timings", "spans": spans.as_dict()})
+        record_run(
+            config,
+            RunRecord(
+                ts=end,
+                run_id=run_id,
+                stage="CHECKIN",
+                result=result,
+                error_code=error_code,
+                retry_count=max(0, attempts_used - 1),
+                duration_ms=duration,
+                notes=notes,
+                spans=spans.summary(),
+            ),
         )
-        notifier.send_success(subject, body)
-    elif outcome and outcome.status == "CHECKIN_ALREADY":
-        logger.info("Already checked in for the day; no success email sent")
-    else:
-        if error:
-            ts = end.isoformat()
-            subject = f"[AnyRouter][FAIL][{error.error_code}] {ts}"
-            screenshot = Path(error.screenshot_path) if error.screenshot_path else None
-            body_lines = [
-                f"Check-in failed with error {error.error_code}.",
-                f"Run ID: {run_id}",
-                f"Attempts used: {attempts_used}",
-                f"Duration: {duration} ms",
-                f"Notes: {notes}",
-                f"URL: {config.site.checkin_url}",
-            ]
-            notifier.send_failure(subject, "\n".join(body_lines), attachments=[screenshot] if screenshot else None)
+        _export_metrics(config, logger, result=result, error_code=error_code, attempts=attempts_used, duration=duration, end=end)
 
     return 0 if outcome and outcome.status in {"CHECKIN_OK", "CHECKIN_ALREADY"} else 1
 
 
+def skip_if_checked_in(config: Config, logger, run_id: str, current) -> bool:
+    """Record a SKIPPED run and return ``True`` when today's check-in already succeeded."""
+    previous = open_store(config).last_checkin(config.account, current.date())
+    if previous is None:
+        return False
+    notes = f"{previous['result']} already recorded by run {previous['run_id']}"
+    record_run(
+        config,
+        RunRecord(ts=current, run_id=run_id, stage="CHECKIN", result="SKIPPED", notes=notes),
+    )
+    logger.info("Check-in already recorded for today; skipping", extra={"step": "skip", "result": "SKIPPED"})
+    return True
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the AnyRouter daily check-in.")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="run the full check-in even if today's success is already recorded",
+    )
+    add_profile_arguments(parser)
+    return parser.parse_args(list(argv) if argv is not None else [])
+
+
+def _run_checkin(
+    config: Config,
+    logger,
+    notifier,
+    run_id: str,
+    tz,
+    *,
+    start,
+    spans: Spans,
+    trace_path: Path | None = None,
+    session: BrowserSession | None = None,
+    heartbeat: Callable[[], None] | None = None,
+) -> int:
+    """Run the attempt loop; a caller-owned ``session`` is reused and left open.
+
+    ``heartbeat`` is called before every attempt and before notifying, so a
+    supervisor (the daemon's watchdog) can tell a slow run from a hung one.
+    """
+    beat = heartbeat or (lambda: None)
+    outcome: CheckInOutcome | None = None
+    error: SignInError | None = None
+    attempts_used = 0
+    http_client = HttpClient(timeout=config.run.nav_timeout_ms / 1000) if use_http_fast_path(config) else None
+
+    scope = BrowserSession(config, trace_path=trace_path) if session is None else nullcontext(session)
+    with scope as session:
+        for attempt in range(1, config.run.max_retries + 1):
+            headless = config.run.headless_preferred
+            if attempt > 1 and config.run.fallback_to_headed_on_retry:
+                headless = False
+            beat()
+            logger.info(
+                "Attempting check-in",
+                extra={"step": "attempt", "attempt": attempt, "headless": headless},
+            )
+            try:
+                if http_client is not None:
+                    try:
+                        outcome = _attempt_http(config, logger, http_client, attempt=attempt, spans=spans)
+                    except FastPathUnavailable as exc:
+                        logger.warning(
+                            "HTTP fast path unavailable; falling back to browser",
+                            extra={"step": "http", "error_code": exc.error_code, "attempt": attempt},
+                        )
+                        http_client.close()
+                        http_client = None
+                if outcome is None:
+                    outcome = _attempt_checkin(
+                        session, config, logger, run_id, tz, attempt=attempt, headless=headless, spans=spans
+                    )
+                attempts_used = attempt
+                break
+            except SignInError as exc:
+                attempts_used = attempt
+                error = exc
+                logger.error(
+                    "Check-in attempt failed",
+                    extra={
+                        "step": "attempt",
+                        "attempt": attempt,
+                        "error_code": exc.error_code,
+                        "retryable": exc.retryable,
+                    },
+                )
+                if not exc.retryable or attempt >= config.run.max_retries:
+                    break
+                delay = exponential_backoff(config.run.retry_backoff_seconds, attempt)
+                logger.info("Retrying after backoff", extra={"step": "retry", "delay": delay})
+                time.sleep(delay)
+        if http_client is not None:
+            http_client.close()
+        if session.blocker is not None:
+            logger.info(
+                "Resource blocking summary",
+                extra={"step": "resources", "blocked": session.blocker.summary()},
+            )
+
+    beat()
+    end = now_tz(tz)
+    return _finalize_run(
+        config,
+        logger,
+        notifier,
+        run_id,
+        start=start,
+        end=end,
+        outcome=outcome,
+        error=error,
+        attempts_used=attempts_used,
+        spans=spans,
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parse_args(argv)
+    config = load_config()
+    tz = get_timezone(config.timezone)
+    ensure_data_tree(config.data_dir, config.screenshots_dir, config.userdata_dir, config.meta_dir)
+    run_id = generate_run_id()
+    logger = setup_logging(config, run_id)
+    start = now_tz(tz)
+    if not args.force and skip_if_checked_in(config, logger, run_id, start):
+        return 0
+    notifier = build_notifier(config, EmailNotifier(config, tz), logger)
+    logger.info("Starting scheduled check-in", extra={"step": "start"})
+
+    spans = Spans()
+    with notifier, profile_run(
+        config,
+        run_id,
+        logger,
+        enabled=should_profile(args),
+        top=args.profile_top,
+        trace=args.profile_trace,
+        spans=spans,
+    ) as profile:
+        return _run_checkin(
+            config,
+            logger,
+            notifier,
+            run_id,
+            tz,
+            start=start,
+            spans=spans,
+            trace_path=profile.trace_path if profile else None,
+        )
+
+
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,151 @@
+"""Authenticated SMTP connections that can carry many messages.
+
+A one-off :class:`SMTPSession` connects, sends and quits as before. Inside
+:func:`pooled_smtp` (batch runs, outbox delivery passes) sessions are shared
+per SMTP server, so connect/EHLO/STARTTLS/login happen once for any number of
+messages; a connection the server dropped in between is re-established once.
+"""
+from __future__ import annotations
+
+import logging
+import smtplib
+import threading
+from contextlib import contextmanager, suppress
+from email.message import EmailMessage
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .config import SMTPConfig
+
+logger = logging.getLogger(__name__)
+
+_TIMEOUT_SECONDS = 30
+
+
+class SMTPSession:
+    def __init__(self, smtp: SMTPConfig, *, timeout: float = _TIMEOUT_SECONDS) -> None:
+        self._smtp = smtp
+        self._timeout = timeout
+        self._client: Optional[smtplib.SMTP] = None
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.sent = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = self._smtp
+        smtp_cls = smtplib.SMTP_SSL if smtp.use_ssl else smtplib.SMTP
+        client = smtp_cls(smtp.host, smtp.port, timeout=self._timeout)
+        try:
+            client.ehlo()
+            if smtp.use_starttls and not smtp.use_ssl:
+                client.starttls()
+                client.ehlo()
+            if smtp.username:
+                client.login(smtp.username, smtp.password or "")
+        except Exception:
+            with suppress(Exception):
+                client.close()
+            raise
+        self.connects += 1
+        return client
+
+    def _drop(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            with suppress(Exception):
+                client.close()
+
+    def send(self, message: EmailMessage) -> None:
+        with self._lock:
+            reused = self._client is not None
+            if self._client is None:
+                self._client = self._connect()
+            try:
+                self._client.send_message(message)
+            except smtplib.SMTPResponseException:
+                raise  # the server answered; the connection is still usable
+            except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError):
+                self._drop()
+                if not reused:
+                    raise
+                # An idle pooled connection may have been closed by the server.
+                self._client = self._connect()
+                self._client.send_message(message)
+            except Exception:
+                self._drop()
+                raise
+            self.sent += 1
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is None:
+            return
+        try:
+            client.quit()
+        except smtplib.SMTPResponseException as exc:
+            logger.warning(
+                "SMTP server error during quit (%s): %s",
+                exc.smtp_code,
+                exc.smtp_error,
+                exc_info=False,
+            )
+        except (smtplib.SMTPException, OSError) as exc:
+            logger.warning("SMTP error during quit: %s", exc, exc_info=False)
+        finally:
+            with suppress(Exception):
+                client.close()
+
+    def __enter__(self) -> "SMTPSession":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._drop()
+
+
+_pool_lock = threading.Lock()
+_pool_depth = 0
+_sessions: Dict[Tuple[Any, ...], SMTPSession] = {}
+
+
+def _session_key(smtp: SMTPConfig, timeout: float) -> Tuple[Any, ...]:
+    return (smtp.host, smtp.port, smtp.use_ssl, smtp.use_starttls, smtp.username, timeout)
+
+
+@contextmanager
+def pooled_smtp() -> Iterator[None]:
+    """Share SMTP sessions for every send inside the block; closed when it exits."""
+    global _pool_depth
+    with _pool_lock:
+        _pool_depth += 1
+    try:
+        yield
+    finally:
+        with _pool_lock:
+            _pool_depth -= 1
+            closing = list(_sessions.values()) if _pool_depth == 0 else []
+            if _pool_depth == 0:
+                _sessions.clear()
+        for session in closing:
+            session.close()
+
+
+def send_message(smtp: SMTPConfig, message: EmailMessage, *, timeout: float = _TIMEOUT_SECONDS) -> None:
+    """Send over a pooled session when inside :func:`pooled_smtp`, else a one-off one.
+
+    ``timeout`` bounds every socket operation (connect, TLS, login, DATA).
+    """
+    key = _session_key(smtp, timeout)
+    with _pool_lock:
+        session = None
+        if _pool_depth:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = SMTPSession(smtp, timeout=timeout)
+    if session is not None:
+        session.send(message)
+        return
+    with SMTPSession(smtp, timeout=timeout) as one_off:
+        one_off.send(message)
@@ -1,35 +1,160 @@
 """State validation helpers for the AnyRouter flows."""
 from __future__ import annotations
 
-from typing import Iterable, Optional
+import time
+from typing import Dict, Iterable, Mapping, Optional, Sequence
 
 from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 
 from .config import Config
+from .response_rules import ResponseFormatError, classify_checkin_response, response_matches
+from .timing import Spans
 from .utils import CheckInOutcome, SignInError
 
 
-def _wait_for_any(page: Page, selectors: Iterable[str], *, timeout: int, state: str = "visible") -> bool:
+def _any_of(page, selectors: Sequence[str]):
+    """Combine candidate selectors into one locator resolving to the first *visible* match.
+
+    ``.first`` picks in DOM order across all candidates, so without the visibility
+    filter a hidden early match (e.g. a collapsed nav button) would mask a visible
+    later one and the wait would time out.
+    """
+    combined = None
     for selector in selectors:
+        locator = page.locator(f"{selector} >> visible=true")
+        combined = locator if combined is None else combined.or_(locator)
+    return combined.first
+
+
+def _active_groups(groups: Mapping[str, Iterable[str]]) -> dict[str, tuple[str, ...]]:
+    return {name: tuple(selectors) for name, selectors in groups.items() if selectors}
+
+
+def _remaining_ms(deadline: float) -> int:
+    return int((deadline - time.monotonic()) * 1000)
+
+
+def _wait_for_any(page: Page, selectors: Iterable[str], *, timeout: int, state: str = "visible") -> bool:
+    candidates = tuple(selectors)
+    if not candidates:
+        return False
+    try:
+        _any_of(page, candidates).wait_for(state=state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def _race_groups(page: Page, groups: Mapping[str, Iterable[str]], *, timeout: int) -> Optional[str]:
+    """Wait once for every group together and return the name of the first group that matched.
+
+    Groups are checked in mapping order, so an earlier group wins when several are visible.
+    """
+    active = _active_groups(groups)
+    if not active:
+        return None
+    union = [selector for selectors in active.values() for selector in selectors]
+    deadline = time.monotonic() + timeout / 1000
+    while True:
+        remaining = _remaining_ms(deadline)
+        if remaining <= 0 or not _wait_for_any(page, union, timeout=remaining):
+            return None
+        for name, selectors in active.items():
+            if _any_of(page, selectors).is_visible():
+                return name
+
+
+def _click_trigger(page: Page, selectors: Sequence[str], *, timeout: int) -> bool:
+    # Already-visible triggers go first so absent candidates do not burn the timeout.
+    ordered = sorted(selectors, key=lambda selector: not page.locator(selector).first.is_visible())
+    for selector in ordered:
         locator = page.locator(selector).first
         try:
-            locator.wait_for(state=state, timeout=timeout)
+            locator.wait_for(state="attached", timeout=timeout)
+            locator.click(timeout=timeout)
             return True
         except PlaywrightTimeoutError:
             continue
     return False
 
 
+def _elapsed_ms(started: float) -> int:
+    return int((time.monotonic() - started) * 1000)
+
+
+def navigate(
+    page: Page, url: str, config: Config, *, ready_selectors: Optional[Sequence[str]] = None
+) -> Dict[str, object]:
+    """Open ``url`` using ``run.nav_wait_until`` and optional ready selectors.
+
+    When ready selectors are configured the page counts as usable as soon as any
+    of them is visible, within what is left of ``nav_timeout_ms``. Returns the
+    per-phase timings for the run log.
+    """
+    run_cfg = config.run
+    selectors = run_cfg.nav_ready_selectors if ready_selectors is None else ready_selectors
+    started = time.monotonic()
+    try:
+        page.goto(url, wait_until=run_cfg.nav_wait_until, timeout=run_cfg.nav_timeout_ms)
+    except PlaywrightTimeoutError as exc:
+        raise SignInError("NAV_TIMEOUT", "Timed out waiting for page load") from exc
+    timings: Dict[str, object] = {"wait_until": run_cfg.nav_wait_until, "goto_ms": _elapsed_ms(started)}
+    if selectors:
+        ready_started = time.monotonic()
+        remaining = run_cfg.nav_timeout_ms - _elapsed_ms(started)
+        if remaining <= 0 or not _wait_for_any(page, selectors, timeout=remaining):
+            raise SignInError("NAV_TIMEOUT", "Page did not become ready before nav_timeout_ms")
+        timings["ready_ms"] = _elapsed_ms(ready_started)
+    timings["total_ms"] = _elapsed_ms(started)
+    return timings
+
+
+def _response_predicate(config: Config):
+    rules = config.checkin_response
+    return lambda response: response_matches(rules, response.url, response.request.method)
+
+
+def _click_and_capture_response(page: Page, config: Config):
+    """Click the trigger and return the matching API response, if one is configured and arrives."""
+    run_cfg = config.run
+    rules = config.checkin_response
+    if not rules.url_pattern:
+        if not _click_trigger(page, config.selectors.checkin_triggers, timeout=run_cfg.action_timeout_ms):
+            raise SignInError("SELECTOR_CHANGED", "Unable to locate check-in trigger", retryable=False)
+        return None
+    try:
+        with page.expect_response(
+            _response_predicate(config), timeout=rules.timeout_ms or run_cfg.action_timeout_ms
+        ) as response_info:
+            if not _click_trigger(page, config.selectors.checkin_triggers, timeout=run_cfg.action_timeout_ms):
+                raise SignInError("SELECTOR_CHANGED", "Unable to locate check-in trigger", retryable=False)
+        return response_info.value
+    except PlaywrightTimeoutError:
+        return None
+
+
+def _classify_response(response, config: Config, url: str) -> Optional[CheckInOutcome]:
+    try:
+        body = response.text()
+    except Exception:  # body unavailable (redirect, evicted); treat like a missing response
+        return None
+    try:
+        return classify_checkin_response(config.checkin_response, response.status, body, url=url)
+    except ResponseFormatError:
+        return None
+
+
 def ensure_logged_in(page: Page, config: Config) -> None:
     selectors = config.selectors
-    run_cfg = config.run
-    if selectors.login_required and _wait_for_any(
-        page, selectors.login_required, timeout=run_cfg.action_timeout_ms
-    ):
+    matched = _race_groups(
+        page,
+        {"login_required": selectors.login_required, "login_confirmed": selectors.login_confirmed},
+        timeout=config.run.action_timeout_ms,
+    )
+    if matched == "login_required":
         raise SignInError("NEED_AUTH", "Login indicator detected; session renewal required", retryable=False)
-    if selectors.login_confirmed:
-        if not _wait_for_any(page, selectors.login_confirmed, timeout=run_cfg.action_timeout_ms):
-            raise SignInError("NEED_AUTH", "Unable to confirm authenticated session", retryable=False)
+    if matched is None and selectors.login_confirmed:
+        raise SignInError("NEED_AUTH", "Unable to confirm authenticated session", retryable=False)
 
 
 def evaluate_checkin_state(page: Page, config: Config) -> Optional[CheckInOutcome]:
@@ -42,33 +167,177 @@ def evaluate_checkin_state(page: Page, config: Config) -> Optional[CheckInOutcom
     return None
 
 
-def perform_checkin(page: Page, config: Config) -> CheckInOutcome:
+def perform_checkin(page: Page, config: Config, *, spans: Optional[Spans] = None) -> CheckInOutcome:
     selectors = config.selectors
     run_cfg = config.run
-    preexisting = evaluate_checkin_state(page, config)
-    if preexisting is not None:
-        return preexisting
+    spans = spans if spans is not None else Spans()
+    with spans.span("trigger"):
+        ready = _race_groups(
+            page,
+            {"already_checked": selectors.already_checked, "checkin_triggers": selectors.checkin_triggers},
+            timeout=run_cfg.action_timeout_ms,
+        )
+    if ready == "already_checked":
+        return CheckInOutcome(status="CHECKIN_ALREADY", notes="Already signed in", url=page.url)
+
+    with spans.span("click"):
+        response = _click_and_capture_response(page, config)
+    with spans.span("outcome"):
+        if response is not None:
+            outcome = _classify_response(response, config, page.url)
+            if outcome is not None:
+                return outcome
 
-    clicked = False
-    for selector in selectors.checkin_triggers:
+        matched = _race_groups(
+            page,
+            {"success_indicators": selectors.success_indicators, "already_checked": selectors.already_checked},
+            timeout=run_cfg.action_timeout_ms,
+        )
+    if matched == "success_indicators":
+        return CheckInOutcome(status="CHECKIN_OK", notes="Success indicator detected", url=page.url)
+    if matched == "already_checked":
+        return CheckInOutcome(status="CHECKIN_ALREADY", notes="Check-in already completed", url=page.url)
+
+    raise SignInError("UNKNOWN", "No success indicator after click", retryable=True)
+
+
+async def _wait_for_any_async(page, selectors: Iterable[str], *, timeout: int, state: str = "visible") -> bool:
+    candidates = tuple(selectors)
+    if not candidates:
+        return False
+    try:
+        await _any_of(page, candidates).wait_for(state=state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+async def _race_groups_async(page, groups: Mapping[str, Iterable[str]], *, timeout: int) -> Optional[str]:
+    active = _active_groups(groups)
+    if not active:
+        return None
+    union = [selector for selectors in active.values() for selector in selectors]
+    deadline = time.monotonic() + timeout / 1000
+    while True:
+        remaining = _remaining_ms(deadline)
+        if remaining <= 0 or not await _wait_for_any_async(page, union, timeout=remaining):
+            return None
+        for name, selectors in active.items():
+            if await _any_of(page, selectors).is_visible():
+                return name
+
+
+async def _click_trigger_async(page, selectors: Sequence[str], *, timeout: int) -> bool:
+    visible = [await page.locator(selector).first.is_visible() for selector in selectors]
+    ordered = [selector for _, selector in sorted(zip(visible, selectors), key=lambda item: not item[0])]
+    for selector in ordered:
         locator = page.locator(selector).first
         try:
-            locator.wait_for(state="attached", timeout=run_cfg.action_timeout_ms)
-            locator.click(timeout=run_cfg.action_timeout_ms)
-            clicked = True
-            break
+            await locator.wait_for(state="attached", timeout=timeout)
+            await locator.click(timeout=timeout)
+            return True
         except PlaywrightTimeoutError:
             continue
-    if not clicked:
-        raise SignInError("SELECTOR_CHANGED", "Unable to locate check-in trigger", retryable=False)
+    return False
 
-    if selectors.success_indicators and _wait_for_any(
-        page, selectors.success_indicators, timeout=run_cfg.action_timeout_ms
-    ):
+
+async def navigate_async(
+    page, url: str, config: Config, *, ready_selectors: Optional[Sequence[str]] = None
+) -> Dict[str, object]:
+    """Async Playwright counterpart of :func:`navigate`."""
+    run_cfg = config.run
+    selectors = run_cfg.nav_ready_selectors if ready_selectors is None else ready_selectors
+    started = time.monotonic()
+    try:
+        await page.goto(url, wait_until=run_cfg.nav_wait_until, timeout=run_cfg.nav_timeout_ms)
+    except PlaywrightTimeoutError as exc:
+        raise SignInError("NAV_TIMEOUT", "Timed out waiting for page load") from exc
+    timings: Dict[str, object] = {"wait_until": run_cfg.nav_wait_until, "goto_ms": _elapsed_ms(started)}
+    if selectors:
+        ready_started = time.monotonic()
+        remaining = run_cfg.nav_timeout_ms - _elapsed_ms(started)
+        if remaining <= 0 or not await _wait_for_any_async(page, selectors, timeout=remaining):
+            raise SignInError("NAV_TIMEOUT", "Page did not become ready before nav_timeout_ms")
+        timings["ready_ms"] = _elapsed_ms(ready_started)
+    timings["total_ms"] = _elapsed_ms(started)
+    return timings
+
+
+async def _click_and_capture_response_async(page, config: Config):
+    run_cfg = config.run
+    rules = config.checkin_response
+    if not rules.url_pattern:
+        if not await _click_trigger_async(page, config.selectors.checkin_triggers, timeout=run_cfg.action_timeout_ms):
+            raise SignInError("SELECTOR_CHANGED", "Unable to locate check-in trigger", retryable=False)
+        return None
+    try:
+        async with page.expect_response(
+            _response_predicate(config), timeout=rules.timeout_ms or run_cfg.action_timeout_ms
+        ) as response_info:
+            if not await _click_trigger_async(
+                page, config.selectors.checkin_triggers, timeout=run_cfg.action_timeout_ms
+            ):
+                raise SignInError("SELECTOR_CHANGED", "Unable to locate check-in trigger", retryable=False)
+        return await response_info.value
+    except PlaywrightTimeoutError:
+        return None
+
+
+async def _classify_response_async(response, config: Config, url: str) -> Optional[CheckInOutcome]:
+    try:
+        body = await response.text()
+    except Exception:  # body unavailable (redirect, evicted); treat like a missing response
+        return None
+    try:
+        return classify_checkin_response(config.checkin_response, response.status, body, url=url)
+    except ResponseFormatError:
+        return None
+
+
+async def ensure_logged_in_async(page, config: Config) -> None:
+    """Async Playwright counterpart of :func:`ensure_logged_in`."""
+    selectors = config.selectors
+    matched = await _race_groups_async(
+        page,
+        {"login_required": selectors.login_required, "login_confirmed": selectors.login_confirmed},
+        timeout=config.run.action_timeout_ms,
+    )
+    if matched == "login_required":
+        raise SignInError("NEED_AUTH", "Login indicator detected; session renewal required", retryable=False)
+    if matched is None and selectors.login_confirmed:
+        raise SignInError("NEED_AUTH", "Unable to confirm authenticated session", retryable=False)
+
+
+async def perform_checkin_async(page, config: Config, *, spans: Optional[Spans] = None) -> CheckInOutcome:
+    """Async Playwright counterpart of :func:`perform_checkin`."""
+    selectors = config.selectors
+    run_cfg = config.run
+    spans = spans if spans is not None else Spans()
+    with spans.span("trigger"):
+        ready = await _race_groups_async(
+            page,
+            {"already_checked": selectors.already_checked, "checkin_triggers": selectors.checkin_triggers},
+            timeout=run_cfg.action_timeout_ms,
+        )
+    if ready == "already_checked":
+        return CheckInOutcome(status="CHECKIN_ALREADY", notes="Already signed in", url=page.url)
+
+    with spans.span("click"):
+        response = await _click_and_capture_response_async(page, config)
+    with spans.span("outcome"):
+        if response is not None:
+            outcome = await _classify_response_async(response, config, page.url)
+            if outcome is not None:
+                return outcome
+
+        matched = await _race_groups_async(
+            page,
+            {"success_indicators": selectors.success_indicators, "already_checked": selectors.already_checked},
+            timeout=run_cfg.action_timeout_ms,
+        )
+    if matched == "success_indicators":
         return CheckInOutcome(status="CHECKIN_OK", notes="Success indicator detected", url=page.url)
-    if selectors.already_checked and _wait_for_any(
-        page, selectors.already_checked, timeout=run_cfg.action_timeout_ms
-    ):
+    if matched == "already_checked":
         return CheckInOutcome(status="CHECKIN_ALREADY", notes="Check-in already completed", url=page.url)
 
     raise SignInError("UNKNOWN", "No success indicator after click", retryable=True)
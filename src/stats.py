@@ -0,0 +1,269 @@
+"""Streaming analytics over run history and JSONL logs.
+
+``python -m src.stats`` reads each account's history in a single pass and keeps
+only fixed-size aggregates per group: counters plus a log-bucketed latency
+histogram, so memory does not grow with the number of runs.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from zoneinfo import ZoneInfo
+
+from .config import Config, load_config, parse_schedule_time, select_accounts
+from .history import iter_history
+from .logs import iter_log_records
+from .store import open_store
+from .utils import get_timezone
+
+GROUPINGS: Sequence[str] = ("day", "slot", "account")
+SUCCESS_RESULTS = frozenset({"CHECKIN_OK", "CHECKIN_ALREADY"})
+_BUCKET_GROWTH = 1.05  # percentiles are exact to within ~5%
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram answering percentile queries in O(buckets)."""
+
+    def __init__(self) -> None:
+        self._buckets: Counter[int] = Counter()
+        self.count = 0
+        self.max = 0
+
+    @staticmethod
+    def _bucket(value: int) -> int:
+        return 0 if value <= 1 else math.ceil(math.log(value, _BUCKET_GROWTH))
+
+    def add(self, value: int) -> None:
+        value = max(0, int(value))
+        self._buckets[self._bucket(value)] += 1
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self._buckets.update(other._buckets)
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> Optional[int]:
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                upper = 1 if bucket == 0 else round(_BUCKET_GROWTH**bucket)
+                return min(upper, self.max)
+        return self.max
+
+
+@dataclass
+class RunStats:
+    runs: int = 0
+    successes: int = 0
+    retried: int = 0
+    skipped: int = 0
+    errors: Counter[str] = field(default_factory=Counter)
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def add(self, row: Mapping[str, str]) -> None:
+        result = row.get("result", "")
+        if result == "SKIPPED":
+            self.skipped += 1
+            return
+        self.runs += 1
+        if result in SUCCESS_RESULTS:
+            self.successes += 1
+        if _to_int(row.get("retry_count")) > 0:
+            self.retried += 1
+        if row.get("error_code"):
+            self.errors[row["error_code"]] += 1
+        self.latency.add(_to_int(row.get("duration_ms")))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "success_rate": self.successes / self.runs if self.runs else None,
+            "retry_rate": self.retried / self.runs if self.runs else None,
+            "p50_ms": self.latency.percentile(50),
+            "p95_ms": self.latency.percentile(95),
+            "p99_ms": self.latency.percentile(99),
+            "errors": dict(self.errors.most_common()),
+        }
+
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def schedule_slot(moment: datetime, times: Sequence[str]) -> str:
+    """Return the schedule entry a run belongs to: the latest slot at or before ``moment``."""
+    slots = sorted(parse_schedule_time(value) for value in times)
+    if not slots:
+        return "-"
+    current = moment.time().replace(tzinfo=None)
+    chosen = slots[-1]  # runs before the first slot belong to the previous day's last one
+    for slot in slots:
+        if slot <= current:
+            chosen = slot
+    return chosen.strftime("%H:%M")
+
+
+def iter_account_runs(config: Config) -> Iterator[Dict[str, str]]:
+    """Stream one account's history rows from ``history.csv`` or, when disabled, the run store."""
+    if config.run.history_csv and config.history_file.exists():
+        yield from iter_history(config.history_file)
+        return
+    for row in open_store(config).query_runs(account=config.account):
+        yield {key: "" if value is None else str(value) for key, value in row.items()}
+
+
+def _group_keys(
+    row: Mapping[str, str], account: str, tz: ZoneInfo, times: Sequence[str]
+) -> Optional[Dict[str, str]]:
+    try:
+        moment = datetime.fromisoformat(row["ts"])
+    except (KeyError, TypeError, ValueError):
+        logger.warning("Skipping %s history row %s with unreadable ts %r", account, row.get("run_id"), row.get("ts"))
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(tz)
+    return {"day": moment.date().isoformat(), "slot": schedule_slot(moment, times), "account": account}
+
+
+def aggregate_runs(
+    rows: Iterable[Tuple[str, Mapping[str, str]]],
+    *,
+    tz: ZoneInfo,
+    times: Sequence[str],
+    groupings: Sequence[str] = GROUPINGS,
+    stage: str = "CHECKIN",
+) -> Dict[str, Dict[str, RunStats]]:
+    """Fold ``(account, row)`` pairs into per-grouping stats in one pass.
+
+    An invalid ``times`` entry raises ``ValueError``; rows without a readable
+    timestamp are logged and left out.
+    """
+    for value in times:
+        parse_schedule_time(value)
+    report: Dict[str, Dict[str, RunStats]] = {grouping: {} for grouping in groupings}
+    total = RunStats()
+    for account, row in rows:
+        if stage and row.get("stage") != stage:
+            continue
+        keys = _group_keys(row, account, tz, times)
+        if keys is None:
+            continue
+        total.add(row)
+        for grouping in groupings:
+            report[grouping].setdefault(keys[grouping], RunStats()).add(row)
+    report["total"] = {"all": total}
+    return report
+
+
+def aggregate_log_steps(records: Iterable[Mapping[str, Any]]) -> Dict[str, LatencyHistogram]:
+    """Build latency histograms per pipeline step.
+
+    Both per-record ``step``/``duration_ms`` pairs and the per-run ``spans``
+    summary logged at the end of each check-in are folded in.
+    """
+    steps: Dict[str, LatencyHistogram] = {}
+    for record in records:
+        spans = record.get("spans")
+        if isinstance(spans, dict):
+            for name, elapsed in spans.items():
+                if isinstance(elapsed, (int, float)):
+                    steps.setdefault(f"span:{name}", LatencyHistogram()).add(int(elapsed))
+        step = record.get("step")
+        duration = record.get("duration_ms")
+        if not step or not isinstance(duration, (int, float)):
+            continue
+        steps.setdefault(str(step), LatencyHistogram()).add(int(duration))
+    return steps
+
+
+def _fmt_rate(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 100:.1f}%"
+
+
+def _fmt_ms(value: Optional[int]) -> str:
+    return "-" if value is None else str(value)
+
+
+def render_report(report: Mapping[str, Mapping[str, RunStats]], steps: Mapping[str, LatencyHistogram] | None) -> str:
+    lines: List[str] = []
+    header = f"{'group':<12} {'runs':>6} {'success':>8} {'retry':>7} {'p50':>7} {'p95':>7} {'p99':>7}  errors"
+    for grouping, groups in report.items():
+        lines.append(f"== by {grouping} ==" if grouping != "total" else "== total ==")
+        lines.append(header)
+        for key in sorted(groups):
+            stats = groups[key].as_dict()
+            errors = ", ".join(f"{code}={count}" for code, count in stats["errors"].items()) or "-"
+            lines.append(
+                f"{key:<12} {stats['runs']:>6} {_fmt_rate(stats['success_rate']):>8} {_fmt_rate(stats['retry_rate']):>7}"
+                f" {_fmt_ms(stats['p50_ms']):>7} {_fmt_ms(stats['p95_ms']):>7} {_fmt_ms(stats['p99_ms']):>7}  {errors}"
+            )
+        lines.append("")
+    if steps:
+        lines.append("== log steps (duration_ms) ==")
+        lines.append(f"{'step':<16} {'count':>6} {'p50':>7} {'p95':>7} {'p99':>7}")
+        for step in sorted(steps):
+            hist = steps[step]
+            lines.append(
+                f"{step:<16} {hist.count:>6} {_fmt_ms(hist.percentile(50)):>7}"
+                f" {_fmt_ms(hist.percentile(95)):>7} {_fmt_ms(hist.percentile(99)):>7}"
+            )
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Summarise check-in latency, retries and failures.")
+    parser.add_argument("--account", action="append", dest="accounts", help="limit to this account")
+    parser.add_argument("--by", action="append", choices=GROUPINGS, help="grouping (default: all)")
+    parser.add_argument("--stage", default="CHECKIN", help="history stage to analyse (default: CHECKIN)")
+    parser.add_argument("--logs", action="store_true", help="also summarise per-step durations from JSONL logs")
+    parser.add_argument("--json", action="store_true", help="emit JSON instead of tables")
+    args = parser.parse_args(list(argv) if argv is not None else [])
+
+    config = load_config()
+    tz = get_timezone(config.timezone)
+    accounts = select_accounts(config, args.accounts)
+    rows = ((account.account, row) for account in accounts for row in iter_account_runs(account))
+    report = aggregate_runs(
+        rows, tz=tz, times=config.schedule.times, groupings=args.by or GROUPINGS, stage=args.stage
+    )
+    steps = aggregate_log_steps(iter_log_records(config.logging.log_file)) if args.logs else None
+
+    if args.json:
+        payload: Dict[str, Any] = {
+            grouping: {key: stats.as_dict() for key, stats in sorted(groups.items())}
+            for grouping, groups in report.items()
+        }
+        if steps is not None:
+            payload["steps"] = {
+                step: {"count": hist.count, **{f"p{q}_ms": hist.percentile(q) for q in (50, 95, 99)}}
+                for step, hist in sorted(steps.items())
+            }
+        json.dump(payload, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    else:
+        sys.stdout.write(render_report(report, steps))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,328 @@
+"""Indexed SQLite store for run history and per-account meta state.
+
+All accounts share one database (``data/runs.db``) in WAL mode so concurrent
+workers and processes can write while others read. Every lookup used by the
+check-in flow hits an index, so cost stays flat as history grows.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import sqlite3
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence
+
+from .config import Config, load_config
+from .history import append_history_entry
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    day TEXT NOT NULL,
+    account TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    result TEXT NOT NULL,
+    error_code TEXT NOT NULL DEFAULT '',
+    retry_count INTEGER NOT NULL DEFAULT 0,
+    duration_ms INTEGER NOT NULL DEFAULT 0,
+    notes TEXT NOT NULL DEFAULT '',
+    spans TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS runs_account_day ON runs (account, day, stage, result);
+CREATE INDEX IF NOT EXISTS runs_day ON runs (day);
+CREATE INDEX IF NOT EXISTS runs_stage_result ON runs (stage, result, day);
+CREATE INDEX IF NOT EXISTS runs_error_code ON runs (error_code, day) WHERE error_code != '';
+CREATE INDEX IF NOT EXISTS runs_run_id ON runs (run_id);
+CREATE TABLE IF NOT EXISTS meta (
+    account TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (account, key)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = (
+    "ts",
+    "account",
+    "run_id",
+    "stage",
+    "result",
+    "error_code",
+    "retry_count",
+    "duration_ms",
+    "notes",
+    "spans",
+)
+_SUCCESS_EMAIL_KEY = "success_email_day"
+_CHECKIN_RESULTS = ("CHECKIN_OK", "CHECKIN_ALREADY")
+
+
+@dataclass
+class RunRecord:
+    ts: datetime
+    run_id: str
+    stage: str
+    result: str
+    error_code: str = ""
+    retry_count: int = 0
+    duration_ms: int = 0
+    notes: str = ""
+    spans: str = ""
+
+    def as_row(self) -> list[str]:
+        """Render the record in ``history.csv`` column order."""
+        return [
+            self.ts.isoformat(),
+            self.run_id,
+            self.stage,
+            self.result,
+            self.error_code,
+            str(self.retry_count),
+            str(self.duration_ms),
+            self.notes,
+            self.spans,
+        ]
+
+
+class RunStore:
+    """Thread-safe handle on the run database; share one instance per file via :func:`open_store`."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(runs)")}
+        if "spans" not in columns:
+            self._conn.execute("ALTER TABLE runs ADD COLUMN spans TEXT NOT NULL DEFAULT ''")
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"{self.path.as_uri()}?mode=ro", uri=True, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def record_run(self, account: str, record: RunRecord) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO runs"
+                " (ts, day, account, run_id, stage, result, error_code, retry_count, duration_ms, notes, spans)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.ts.isoformat(),
+                    record.ts.date().isoformat(),
+                    account,
+                    record.run_id,
+                    record.stage,
+                    record.result,
+                    record.error_code,
+                    record.retry_count,
+                    record.duration_ms,
+                    record.notes,
+                    record.spans,
+                ),
+            )
+
+    def last_checkin(self, account: str, day: date) -> Optional[Dict[str, Any]]:
+        """Return the latest successful check-in of ``account`` on ``day``, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM runs WHERE account = ? AND day = ? AND stage = 'CHECKIN' AND result IN (?, ?)"
+                " ORDER BY id DESC LIMIT 1",
+                (account, day.isoformat(), *_CHECKIN_RESULTS),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_meta(self, account: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE account = ? AND key = ?", (account, key)
+            ).fetchone()
+        return row["value"] if row is not None else None
+
+    def set_meta(self, account: str, key: str, value: str, *, now: datetime) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (account, key, value, updated_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (account, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (account, key, value, now.isoformat()),
+            )
+
+    def meta_items(self, account: str, prefix: str) -> Dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM meta WHERE account = ? AND key >= ? AND key < ?",
+                (account, prefix, prefix + "\uffff"),
+            ).fetchall()
+        return {row["key"]: row["value"] for row in rows}
+
+    def delete_meta(self, account: str, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM meta WHERE account = ? AND key = ?", (account, key))
+
+    def should_send_success_email(self, account: str, now: datetime) -> bool:
+        return self.get_meta(account, _SUCCESS_EMAIL_KEY) != now.date().isoformat()
+
+    def record_success_email_sent(self, account: str, now: datetime) -> None:
+        self.set_meta(account, _SUCCESS_EMAIL_KEY, now.date().isoformat(), now=now)
+
+    def query_runs(
+        self,
+        *,
+        account: Optional[str] = None,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        stage: Optional[str] = None,
+        result: Optional[str] = None,
+        error_code: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield matching runs, newest first."""
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, value in (("account", account), ("stage", stage), ("result", result), ("error_code", error_code)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(since.isoformat())
+        if until is not None:
+            clauses.append("day <= ?")
+            params.append(until.isoformat())
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM runs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        # A separate reader connection streams large exports without holding the writer lock.
+        conn = self._reader()
+        try:
+            for row in conn.execute(sql, params):
+                yield dict(row)
+        finally:
+            conn.close()
+
+    def summary(self, *, since: Optional[date] = None, until: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Count runs per account, stage and result."""
+        clauses: List[str] = []
+        params: List[Any] = []
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(since.isoformat())
+        if until is not None:
+            clauses.append("day <= ?")
+            params.append(until.isoformat())
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (
+            f"SELECT account, stage, result, COUNT(*) AS runs FROM runs{where}"
+            " GROUP BY account, stage, result ORDER BY account, stage, result"
+        )
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def export_csv(self, out: IO[str], **filters: Any) -> int:
+        writer = csv.writer(out)
+        writer.writerow(_COLUMNS)
+        count = 0
+        for row in self.query_runs(**filters):
+            writer.writerow([row[column] for column in _COLUMNS])
+            count += 1
+        return count
+
+
+_STORES: Dict[Path, RunStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def store_path(config: Config) -> Path:
+    return config.store_file or config.data_dir / "runs.db"
+
+
+def open_store(config: Config) -> RunStore:
+    """Return the process-wide :class:`RunStore` for ``config``'s database."""
+    path = store_path(config).resolve()
+    with _STORES_LOCK:
+        store = _STORES.get(path)
+        if store is None:
+            store = _STORES[path] = RunStore(path)
+        return store
+
+
+def record_run(config: Config, record: RunRecord) -> None:
+    """Store ``record`` for ``config.account`` and mirror it to ``history.csv`` when enabled."""
+    open_store(config).record_run(config.account, record)
+    if config.run.history_csv:
+        append_history_entry(config.history_file, config.run.history_limit, record.as_row())
+
+
+def _parse_day(value: str) -> date:
+    """Accept ``YYYY-MM-DD`` or a relative ``Nd`` (N days ago)."""
+    if value.endswith("d") and value[:-1].isdigit():
+        return date.today() - timedelta(days=int(value[:-1]))
+    return date.fromisoformat(value)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the run store.")
+    parser.add_argument("command", choices=("runs", "summary", "export-csv"))
+    parser.add_argument("--account", help="only this account")
+    parser.add_argument("--since", type=_parse_day, help="first day (YYYY-MM-DD or e.g. 7d)")
+    parser.add_argument("--until", type=_parse_day, help="last day (YYYY-MM-DD or e.g. 1d)")
+    parser.add_argument("--stage", help="e.g. CHECKIN or AUTH")
+    parser.add_argument("--result", help="e.g. CHECKIN_FAIL")
+    parser.add_argument("--error-code", help="e.g. NEED_AUTH")
+    parser.add_argument("--limit", type=int, help="maximum number of runs (runs default: 50)")
+    parser.add_argument("--output", type=Path, help="export-csv destination (default: stdout)")
+    args = parser.parse_args(list(argv) if argv is not None else [])
+
+    store = open_store(load_config())
+    if args.command == "summary":
+        for row in store.summary(since=args.since, until=args.until):
+            print(f"{row['account']:<16} {row['stage']:<10} {row['result']:<16} {row['runs']}")
+        return 0
+
+    filters = {
+        "account": args.account,
+        "since": args.since,
+        "until": args.until,
+        "stage": args.stage,
+        "result": args.result,
+        "error_code": args.error_code,
+    }
+    if args.command == "runs":
+        for row in store.query_runs(**filters, limit=args.limit or 50):
+            print(
+                f"{row['ts']}  {row['account']:<12} {row['stage']:<8} {row['result']:<16}"
+                f" {row['error_code'] or '-':<14} {row['notes']}"
+            )
+        return 0
+    if args.output is None:
+        store.export_csv(sys.stdout, **filters, limit=args.limit)
+        return 0
+    with args.output.open("w", newline="", encoding="utf-8") as fh:
+        store.export_csv(fh, **filters, limit=args.limit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
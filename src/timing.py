@@ -0,0 +1,54 @@
+"""Lightweight per-step timing spans for the check-in pipeline."""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterator, Optional
+
+
+class Spans:
+    """Accumulate wall-clock milliseconds per named step across a run's attempts.
+
+    A span costs two ``perf_counter`` calls and a dict update, so recording is
+    always on. Repeated spans (e.g. ``navigate`` on every retry) are summed.
+    """
+
+    __slots__ = ("_totals",)
+
+    def __init__(self) -> None:
+        self._totals: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (perf_counter() - started) * 1000)
+
+    def add(self, name: str, elapsed_ms: float) -> None:
+        self._totals[name] = self._totals.get(name, 0.0) + elapsed_ms
+
+    def as_dict(self) -> Dict[str, int]:
+        return {name: round(total) for name, total in self._totals.items()}
+
+    def summary(self) -> str:
+        """Compact ``name=ms;...`` form stored alongside the run in history."""
+        return ";".join(f"{name}={ms}" for name, ms in self.as_dict().items())
+
+    def __bool__(self) -> bool:
+        return bool(self._totals)
+
+
+def parse_spans(text: Optional[str]) -> Dict[str, int]:
+    """Inverse of :meth:`Spans.summary`; malformed entries are skipped."""
+    spans: Dict[str, int] = {}
+    for part in (text or "").split(";"):
+        name, sep, value = part.partition("=")
+        if not sep:
+            continue
+        try:
+            spans[name.strip()] = int(value)
+        except ValueError:
+            continue
+    return spans
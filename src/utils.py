@@ -1,7 +1,6 @@
 """Utility helpers for AnyRouter automation."""
 from __future__ import annotations
 
-import csv
 import json
 import time
 import uuid
@@ -37,7 +36,7 @@ class CheckInOutcome:
     url: Optional[str] = None
 
 
-_META_SUCCESS_FILE = "last_success_email.json"
+_AUTH_STATE_FILE = "auth_state.json"
 
 
 def ensure_directories(paths: Iterable[Path]) -> None:
@@ -67,55 +66,8 @@ def generate_run_id() -> str:
     return uuid.uuid4().hex
 
 
-def history_header() -> list[str]:
-    return ["ts", "run_id", "stage", "result", "error_code", "retry_count", "duration_ms", "notes"]
-
-
-def append_history_entry(path: Path, limit: int, row: list[str]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    lines: list[list[str]] = []
-    if path.exists():
-        with path.open("r", newline="", encoding="utf-8") as fh:
-            reader = csv.reader(fh)
-            lines = list(reader)
-    if not lines:
-        lines.append(history_header())
-    lines.append(row)
-    header, *entries = lines
-    max_entries = max(limit, 1)
-    if len(entries) > max_entries:
-        entries = entries[-max_entries:]
-    with path.open("w", newline="", encoding="utf-8") as fh:
-        writer = csv.writer(fh)
-        writer.writerow(header)
-        writer.writerows(entries)
-
-
-def success_email_state_path(meta_dir: Path) -> Path:
-    return meta_dir / _META_SUCCESS_FILE
-
-
-def should_send_success_email(meta_dir: Path, current_date: datetime) -> bool:
-    path = success_email_state_path(meta_dir)
-    if not path.exists():
-        return True
-    try:
-        with path.open("r", encoding="utf-8") as fh:
-            data = json.load(fh)
-        sent_on = data.get("date")
-        if not sent_on:
-            return True
-        return sent_on != current_date.date().isoformat()
-    except json.JSONDecodeError:
-        return True
-
-
-def record_success_email_sent(meta_dir: Path, current_date: datetime) -> None:
-    path = success_email_state_path(meta_dir)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    payload = {"date": current_date.date().isoformat(), "ts": current_date.isoformat()}
-    with path.open("w", encoding="utf-8") as fh:
-        json.dump(payload, fh)
+def auth_state_path(data_dir: Path) -> Path:
+    return data_dir / _AUTH_STATE_FILE
 
 
 def build_screenshot_path(
@@ -130,6 +82,36 @@ def build_screenshot_path(
     return screenshots_dir / f"{slug}.png"
 
 
+def build_trace_path(
+    traces_dir: Path,
+    run_id: str,
+    current_time: datetime,
+    *,
+    attempt: int,
+    error_code: str,
+) -> Path:
+    slug = f"{current_time.strftime('%Y%m%dT%H%M%S')}_{run_id}_a{attempt}_{error_code.lower()}"
+    return traces_dir / f"{slug}.zip"
+
+
+def prune_ring_buffer(directory: Path, max_bytes: int, pattern: str = "*") -> None:
+    """Delete the oldest files matching ``pattern`` until ``directory`` fits in ``max_bytes``."""
+    files = []
+    for path in directory.glob(pattern):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, path.name, path, stat.st_size))
+    files.sort()
+    total = sum(size for *_, size in files)
+    for _, _, path, size in files:
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
 def exponential_backoff(seconds: Iterable[float], attempt: int) -> float:
     seq = list(seconds)
     if not seq:
@@ -146,11 +128,6 @@ def serialize_duration_ms(start: datetime, end: datetime) -> int:
     return int((end - start).total_seconds() * 1000)
 
 
-def capture_screenshot(page, path: Path) -> Path:
-    page.screenshot(path=str(path), full_page=True)
-    return path
-
-
 def read_json(path: Path) -> dict:
     if not path.exists():
         return {}
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import re
+from email.message import EmailMessage
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from src.batch import run_batch
+from src.config import (
+    AccountConfig,
+    Config,
+    LoggingConfig,
+    NotifyConfig,
+    RunConfig,
+    ScheduleConfig,
+    SMTPConfig,
+    SelectorConfig,
+    SiteConfig,
+    select_accounts,
+)
+from src.utils import CheckInOutcome, SignInError
+
+
+class DriverStub:
+    async def __aenter__(self):
+        return object()
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+
+class NotifierStub:
+    instances: List["NotifierStub"] = []
+
+    def __init__(self, config: Config, tz) -> None:
+        self.config = config
+        self.success_calls: List[str] = []
+        self.failure_calls: List[str] = []
+        NotifierStub.instances.append(self)
+
+    def send_success(self, subject: str, body: str) -> bool:
+        self.success_calls.append(subject)
+        return True
+
+    def send_failure(self, subject: str, body: str, attachments=None, error_code=None) -> bool:
+        self.failure_calls.append(subject)
+        return True
+
+    def send_resolved(self, subject: str, body: str) -> bool:
+        return False
+
+
+@pytest.fixture
+def fleet_config(tmp_path: Path) -> Config:
+    return Config(
+        timezone="UTC",
+        schedule=ScheduleConfig(),
+        notify=NotifyConfig(),
+        run=RunConfig(max_retries=1, account_concurrency=2),
+        selectors=SelectorConfig(),
+        site=SiteConfig(base_url="https://example.com", checkin_url="https://example.com/checkin"),
+        logging=LoggingConfig(log_file=tmp_path / "logs.jsonl"),
+        project_root=tmp_path,
+        data_dir=tmp_path / "data",
+        history_file=tmp_path / "data" / "history.csv",
+        screenshots_dir=tmp_path / "screenshots",
+        userdata_dir=tmp_path / "data" / "userdata",
+        meta_dir=tmp_path / "data" / "meta",
+        accounts=tuple(AccountConfig(name=f"acct{i}") for i in range(5)),
+    )
+
+
+def test_run_batch_limits_concurrency_and_separates_accounts(fleet_config, monkeypatch) -> None:
+    NotifierStub.instances = []
+    monkeypatch.setattr("src.batch.EmailNotifier", NotifierStub)
+    state = {"active": 0, "peak": 0}
+
+    async def attempt_stub(driver, config, logger, run_id, tz, *, attempt, headless, **kwargs):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        if config.account == "acct3":
+            raise SignInError("NEED_AUTH", "expired", retryable=False)
+        return CheckInOutcome(status="CHECKIN_OK", notes="ok")
+
+    monkeypatch.setattr("src.batch._attempt_account", attempt_stub)
+
+    accounts = select_accounts(fleet_config)
+    results = asyncio.run(run_batch(fleet_config, accounts, driver_factory=DriverStub))
+
+    assert state["peak"] == 2
+    assert [result.account for result in results] == [f"acct{i}" for i in range(5)]
+    assert [result.exit_code for result in results] == [0, 0, 0, 1, 0]
+    for account in accounts:
+        with account.history_file.open(newline="", encoding="utf-8") as fh:
+            rows = list(csv.reader(fh))
+        assert len(rows) == 2
+        assert rows[1][3] == ("CHECKIN_FAIL" if account.account == "acct3" else "CHECKIN_OK")
+    failures = {stub.config.account: stub.failure_calls for stub in NotifierStub.instances}
+    assert failures["acct3"] == [failures["acct3"][0]]
+    assert "[acct3]" in failures["acct3"][0]
+    assert not any(calls for name, calls in failures.items() if name != "acct3")
+
+
+def test_select_accounts_scopes_paths(fleet_config) -> None:
+    (account,) = select_accounts(fleet_config, ["acct1"])
+    assert account.account == "acct1"
+    assert account.history_file == fleet_config.data_dir / "accounts" / "acct1" / "history.csv"
+    assert account.screenshots_dir == fleet_config.screenshots_dir / "acct1"
+    assert account.userdata_dir == fleet_config.data_dir / "accounts" / "acct1" / "userdata"
+    with pytest.raises(ValueError):
+        select_accounts(fleet_config, ["missing"])
+
+
+def test_run_batch_digest_sends_one_email(fleet_config, tmp_path, monkeypatch) -> None:
+    fleet_config.notify = NotifyConfig(
+        enable_email=True,
+        smtp=SMTPConfig(host="smtp.example.com", port=465, recipients=["ops@example.com"]),
+        digest=True,
+        digest_max_attachment_bytes=150,
+    )
+    sent: List[EmailMessage] = []
+    monkeypatch.setattr("src.notifier_email.EmailNotifier.send_now", lambda self, message: sent.append(message))
+
+    async def attempt_stub(driver, config, logger, run_id, tz, *, attempt, headless, **kwargs):
+        if config.account in {"acct1", "acct3"}:
+            if config.account == "acct1":
+                await asyncio.sleep(0.05)  # acct3 reports first; the digest still follows account order
+            shot = tmp_path / f"{config.account}.png"
+            shot.write_bytes(b"x" * 100)
+            raise SignInError("NEED_AUTH", "expired", retryable=False, screenshot_path=shot)
+        return CheckInOutcome(status="CHECKIN_OK", notes="ok")
+
+    monkeypatch.setattr("src.batch._attempt_account", attempt_stub)
+
+    results = asyncio.run(run_batch(fleet_config, select_accounts(fleet_config), driver_factory=DriverStub))
+
+    assert [result.exit_code for result in results] == [0, 1, 0, 1, 0]
+    assert len(sent) == 1
+    message = sent[0]
+    assert message["Subject"].startswith("[AnyRouter][DIGEST]")
+    assert message["Subject"].endswith("ok=3 fail=2")
+    body = message.get_body(preferencelist=("plain",)).get_content()
+    assert re.search(r"^acct3 +CHECKIN_FAIL +NEED_AUTH +1 ", body, re.MULTILINE)
+    assert "1 screenshot(s) omitted" in body and str(tmp_path / "acct3.png") in body
+    assert body.index("[acct1]") < body.index("[acct3]")
+    assert [part.get_filename() for part in message.iter_attachments()] == ["acct1.png"]
+
+    # Successes were recorded as mailed, so a second batch today only reports the failures.
+    sent.clear()
+    again = select_accounts(fleet_config, ["acct0"])
+    asyncio.run(run_batch(fleet_config, again, driver_factory=DriverStub, force=True))
+    assert sent == []
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+from dataclasses import replace
 from pathlib import Path
 
-from src.browser import launch_user_context
+from src.browser import BrowserSession, ContextPool, ResourceBlocker, launch_user_context
 from src.config import (
     Config,
     LoggingConfig,
@@ -109,3 +111,288 @@ def test_launch_user_context_respects_custom_accept_language(tmp_path: Path) ->
 
     assert chromium.launch_kwargs["headless"] is False
     assert context.extra_headers == {"Accept-Language": "en-GB,en;q=0.9"}
+
+
+class PageStub:
+    def __init__(self, context: "SessionContextStub") -> None:
+        self._context = context
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+        self._context.pages.remove(self)
+
+
+class TracingStub:
+    def __init__(self) -> None:
+        self.events = []
+
+    def start(self, **kwargs) -> None:
+        self.events.append(("start", kwargs))
+
+    def stop(self, path=None) -> None:
+        self.events.append(("stop", path))
+
+    def start_chunk(self) -> None:
+        self.events.append(("start_chunk", None))
+
+    def stop_chunk(self, path=None) -> None:
+        self.events.append(("stop_chunk", path))
+
+
+class SessionContextStub(ContextStub):
+    def __init__(self) -> None:
+        super().__init__()
+        self.tracing = TracingStub()
+        self.pages = []
+        self.unroute_calls = 0
+        self.closed = False
+
+    def new_page(self) -> PageStub:
+        page = PageStub(self)
+        self.pages.append(page)
+        return page
+
+    def unroute_all(self, behavior=None) -> None:
+        self.unroute_calls += 1
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class SessionChromiumStub:
+    def __init__(self) -> None:
+        self.contexts = []
+        self.launch_kwargs = []
+
+    def launch_persistent_context(self, **kwargs):
+        self.launch_kwargs.append(kwargs)
+        context = SessionContextStub()
+        self.contexts.append(context)
+        return context
+
+
+class DriverManagerStub:
+    def __init__(self) -> None:
+        self.chromium = SessionChromiumStub()
+        self.starts = 0
+        self.stops = 0
+
+    def start(self):
+        self.starts += 1
+        return PlaywrightStub(self.chromium)
+
+    def stop(self) -> None:
+        self.stops += 1
+
+
+def test_browser_session_reuses_context_across_attempts(tmp_path: Path) -> None:
+    config = make_config(tmp_path)
+    manager = DriverManagerStub()
+
+    with BrowserSession(config, driver_factory=lambda: manager) as session:
+        first = session.new_page(headless=True)
+        second = session.new_page(headless=True)
+
+    assert manager.starts == 1
+    assert manager.stops == 1
+    assert len(manager.chromium.contexts) == 1
+    context = manager.chromium.contexts[0]
+    assert first.closed and not second.closed
+    assert context.unroute_calls == 1
+    assert context.closed
+
+
+def test_browser_session_relaunches_on_mode_change_or_crash(tmp_path: Path) -> None:
+    config = make_config(tmp_path)
+    manager = DriverManagerStub()
+    session = BrowserSession(config, driver_factory=lambda: manager)
+
+    session.new_page(headless=True)
+    session.new_page(headless=False)
+    session.new_page(headless=False)
+    session.invalidate()
+    session.new_page(headless=False)
+    session.close()
+
+    assert manager.starts == 1
+    assert session.launches == 3
+    assert [kwargs["headless"] for kwargs in manager.chromium.launch_kwargs] == [True, False, False]
+    assert all(context.closed for context in manager.chromium.contexts)
+
+
+def test_browser_session_traces_attempts_as_chunks(tmp_path: Path) -> None:
+    config = make_config(tmp_path)
+    config.run.trace_on_failure = True
+    manager = DriverManagerStub()
+    kept = tmp_path / "traces" / "failed.zip"
+
+    with BrowserSession(config, driver_factory=lambda: manager) as session:
+        session.new_page(headless=True)
+        session.start_trace_chunk()
+        assert session.stop_trace_chunk() is None
+        session.new_page(headless=True)
+        session.start_trace_chunk()
+        assert session.stop_trace_chunk(kept) == kept
+
+    (context,) = manager.chromium.contexts
+    assert context.tracing.events == [
+        ("start", {"screenshots": True, "snapshots": True}),
+        ("start_chunk", None),
+        ("stop_chunk", None),
+        ("start_chunk", None),
+        ("stop_chunk", str(kept)),
+        ("stop", None),
+    ]
+
+
+def test_browser_session_profile_trace_keeps_every_attempt(tmp_path: Path) -> None:
+    config = make_config(tmp_path)
+    manager = DriverManagerStub()
+    trace_path = tmp_path / "profiles" / "run-1" / "trace.zip"
+
+    with BrowserSession(config, driver_factory=lambda: manager, trace_path=trace_path) as session:
+        session.new_page(headless=True)
+        session.start_trace_chunk()
+        session.new_page(headless=False)
+        session.start_trace_chunk()
+
+    first, second = manager.chromium.contexts
+    assert ("stop_chunk", str(trace_path.with_name("trace-1.zip"))) in first.tracing.events
+    assert ("stop_chunk", str(trace_path.with_name("trace-2.zip"))) in second.tracing.events
+
+
+def test_browser_session_does_not_trace_by_default(tmp_path: Path) -> None:
+    manager = DriverManagerStub()
+    with BrowserSession(make_config(tmp_path), driver_factory=lambda: manager) as session:
+        session.new_page(headless=True)
+        session.start_trace_chunk()
+        assert session.stop_trace_chunk(tmp_path / "x.zip") is None
+    assert manager.chromium.contexts[0].tracing.events == []
+
+
+class RouteStub:
+    def __init__(self, resource_type: str, url: str) -> None:
+        self.request = type("RequestStub", (), {"resource_type": resource_type, "url": url})()
+        self.action = None
+
+    def abort(self, error_code=None) -> None:
+        self.action = "abort"
+
+    def continue_(self) -> None:
+        self.action = "continue"
+
+
+def test_resource_blocker_applies_type_deny_and_allow_lists(tmp_path: Path) -> None:
+    config = make_config(tmp_path)
+    assert ResourceBlocker.from_config(config) is None
+    config.run.block_resource_types = ("image", "font")
+    config.run.block_url_patterns = (r"google-analytics\.com",)
+    config.run.allow_url_patterns = (r"example\.com/logo\.png$",)
+    blocker = ResourceBlocker.from_config(config)
+
+    routes = [
+        RouteStub("image", "https://cdn.example.net/banner.png"),
+        RouteStub("image", "https://example.com/logo.png"),
+        RouteStub("script", "https://www.google-analytics.com/analytics.js"),
+        RouteStub("xhr", "https://example.com/api/user/sign_in"),
+    ]
+    for route in routes:
+        blocker.handle(route)
+
+    assert [route.action for route in routes] == ["abort", "continue", "abort", "continue"]
+    assert blocker.summary() == {"requests": 2, "allowed": 2, "by_type": {"image": 1, "script": 1}}
+
+
+class AsyncContextStub:
+    def __init__(self, kwargs) -> None:
+        self.kwargs = kwargs
+        self.closed = False
+        self.saved_paths = []
+
+    async def set_extra_http_headers(self, headers) -> None:
+        self.headers = headers
+
+    def set_default_navigation_timeout(self, value: int) -> None:
+        self.nav_timeout = value
+
+    def set_default_timeout(self, value: int) -> None:
+        self.action_timeout = value
+
+    async def add_init_script(self, script: str) -> None:
+        return None
+
+    async def unroute_all(self, behavior=None) -> None:
+        return None
+
+    async def storage_state(self, *, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text('{"cookies": [], "origins": []}')
+        self.saved_paths.append(path)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class AsyncBrowserStub:
+    def __init__(self) -> None:
+        self.contexts = []
+        self.closed = False
+
+    async def new_context(self, **kwargs):
+        context = AsyncContextStub(kwargs)
+        self.contexts.append(context)
+        return context
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class AsyncChromiumStub:
+    def __init__(self) -> None:
+        self.browser = AsyncBrowserStub()
+        self.launches = []
+
+    async def launch(self, **kwargs):
+        self.launches.append(kwargs)
+        return self.browser
+
+
+def test_context_pool_reuses_recycles_and_caps_contexts(tmp_path: Path) -> None:
+    config = make_config(tmp_path)
+    config.run.pool_max_contexts = 1
+    config.run.pool_context_max_uses = 2
+    chromium = AsyncChromiumStub()
+
+    async def get_playwright():
+        return PlaywrightStub(chromium)
+
+    alice = replace(config, account="alice", data_dir=tmp_path / "alice")
+    bob = replace(config, account="bob", data_dir=tmp_path / "bob")
+
+    async def scenario() -> None:
+        pool = ContextPool(get_playwright, config)
+        first = await pool.acquire(alice)
+        await pool.release(alice, first)
+        second = await pool.acquire(alice)
+        assert second is first
+        await pool.release(alice, second)
+        assert first.closed  # reached pool_context_max_uses
+
+        third = await pool.acquire(alice)
+        assert third is not first
+        assert "storage_state" in third.kwargs
+        await pool.release(alice, third)
+        fourth = await pool.acquire(bob)  # cap of one evicts alice's idle context
+        assert third.closed
+        await pool.release(bob, fourth, healthy=False)
+        assert fourth.closed
+        await pool.close()
+
+    asyncio.run(scenario())
+
+    assert len(chromium.launches) == 1
+    assert "user_data_dir" not in chromium.launches[0]
+    assert chromium.browser.closed
+    assert (tmp_path / "alice" / "auth_state.json").exists()
+    assert not (tmp_path / "bob" / "auth_state.json").exists()
@@ -51,6 +51,10 @@ checkin_url = "https://example.com/checkin"
 
 [logging]
 log_file = "logs/signin.jsonl"
+
+[metrics]
+textfile = "textfile/anyrouter.prom"
+duration_buckets = [30, 5]
 """
     path = tmp_path / "config.toml"
     path.write_text(content)
@@ -64,6 +68,9 @@ def test_load_config_expands_paths(tmp_path: Path) -> None:
     assert config.project_root == tmp_path.resolve()
     assert config.data_dir == tmp_path.resolve() / "data"
     assert config.history_file == config.data_dir / "history.csv"
+    assert config.store_file == config.data_dir / "runs.db"
+    assert config.metrics.textfile == tmp_path.resolve() / "textfile" / "anyrouter.prom"
+    assert config.metrics.duration_buckets == (5.0, 30.0)
     assert config.screenshots_dir == tmp_path.resolve() / "screenshots"
     assert config.logging.log_file == tmp_path.resolve() / "logs" / "signin.jsonl"
     assert config.notify.smtp is not None
@@ -81,3 +88,61 @@ def test_load_config_missing_file_raises(tmp_path: Path) -> None:
     missing = tmp_path / "missing.toml"
     with pytest.raises(FileNotFoundError):
         load_config(missing)
+
+
+def test_load_config_parses_accounts(tmp_path: Path) -> None:
+    path = write_config(tmp_path)
+    path.write_text(
+        path.read_text()
+        + """
+[[accounts]]
+name = "alice"
+
+[[accounts]]
+name = "bob"
+userdata_dir = "profiles/bob"
+"""
+    )
+    config = load_config(path)
+    assert [account.name for account in config.accounts] == ["alice", "bob"]
+    assert config.accounts[0].userdata_dir is None
+    assert config.accounts[1].userdata_dir == tmp_path.resolve() / "profiles" / "bob"
+    assert config.account == "default"
+
+
+def test_load_config_rejects_unknown_nav_strategy(tmp_path: Path) -> None:
+    path = write_config(tmp_path)
+    path.write_text(path.read_text().replace("[run]\n", '[run]\nnav_wait_until = "idle"\n'))
+    with pytest.raises(ValueError):
+        load_config(path)
+
+
+def test_load_config_parses_webhooks(tmp_path: Path) -> None:
+    path = write_config(tmp_path)
+    hooks = """
+[[notify.webhooks]]
+url = "https://hooks.example.com/anyrouter"
+name = "chat"
+events = ["failure"]
+timeout_seconds = 3
+headers = { Authorization = "Bearer x" }
+"""
+    path.write_text(path.read_text().replace("[run]\n", hooks + "\n[run]\n"))
+    (hook,) = load_config(path).notify.webhooks
+    assert (hook.name, hook.events, hook.timeout_seconds) == ("chat", ("failure",), 3.0)
+    assert hook.headers == {"Authorization": "Bearer x"}
+
+    path.write_text(path.read_text().replace('events = ["failure"]', 'events = ["paged"]'))
+    with pytest.raises(ValueError):
+        load_config(path)
+
+
+def test_load_config_requires_success_rules_for_checkin_api(tmp_path: Path) -> None:
+    path = write_config(tmp_path)
+    api = 'checkin_url = "https://example.com/checkin"\ncheckin_api_url = "https://example.com/api/sign_in"\n'
+    path.write_text(path.read_text().replace('checkin_url = "https://example.com/checkin"\n', api))
+    with pytest.raises(ValueError):
+        load_config(path)
+
+    path.write_text(path.read_text() + '\n[checkin_response]\nsuccess = { success = true }\n')
+    assert load_config(path).site.checkin_api_url == "https://example.com/api/sign_in"
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+from zoneinfo import ZoneInfo
+
+from src.batch import AccountResult
+from src.config import (
+    Config,
+    LoggingConfig,
+    NotifyConfig,
+    RunConfig,
+    ScheduleConfig,
+    SelectorConfig,
+    SiteConfig,
+)
+from src.daemon import Daemon, Heartbeat, missed_slot, next_slot, parse_times, previous_slot
+from src.store import RunRecord, open_store
+
+TZ = ZoneInfo("Europe/Helsinki")
+
+
+def _at(day: int, hour: int, minute: int = 0) -> datetime:
+    return datetime(2024, 3, day, hour, minute, tzinfo=TZ)
+
+
+@pytest.fixture
+def daemon_config(tmp_path: Path) -> Config:
+    return Config(
+        timezone="Europe/Helsinki",
+        schedule=ScheduleConfig(times=("20:30", "08:30"), jitter_seconds=60.0, catch_up_seconds=3600.0),
+        notify=NotifyConfig(),
+        run=RunConfig(),
+        selectors=SelectorConfig(),
+        site=SiteConfig(base_url="https://example.com", checkin_url="https://example.com/checkin"),
+        logging=LoggingConfig(log_file=tmp_path / "logs.jsonl"),
+        project_root=tmp_path,
+        data_dir=tmp_path / "data",
+        history_file=tmp_path / "data" / "history.csv",
+        screenshots_dir=tmp_path / "screenshots",
+        userdata_dir=tmp_path / "data" / "userdata",
+        meta_dir=tmp_path / "data" / "meta",
+    )
+
+
+class SessionStub:
+    instances: List["SessionStub"] = []
+
+    def __init__(self, config: Config) -> None:
+        self.blocker = None
+        self.pages = 0
+        self.closed = False
+        SessionStub.instances.append(self)
+
+    def new_page(self, *, headless: bool):
+        self.pages += 1
+        return self
+
+    def close(self) -> None:
+        self.closed = True
+
+    def invalidate(self) -> None:
+        return None
+
+
+def test_slots_wrap_around_midnight() -> None:
+    times = parse_times(("20:30", "08:30"))
+    assert next_slot(_at(1, 21), times) == _at(2, 8, 30)
+    assert next_slot(_at(1, 8, 30), times) == _at(1, 20, 30)
+    assert previous_slot(_at(2, 7), times) == _at(1, 20, 30)
+    assert previous_slot(_at(1, 8, 30), times) == _at(1, 8, 30)
+
+
+def test_parse_times_accepts_every_validated_entry() -> None:
+    # load_config accepts single-digit hours and minutes; the daemon must not choke on them.
+    assert parse_times(("08:5", "7:30", "23:59")) == [dtime(7, 30), dtime(8, 5), dtime(23, 59)]
+
+
+def test_missed_slot_uses_recorded_runs(daemon_config: Config) -> None:
+    times = parse_times(daemon_config.schedule.times)
+    assert missed_slot([daemon_config], _at(1, 9), times, 3600) == _at(1, 8, 30)
+    assert missed_slot([daemon_config], _at(1, 10), times, 3600) is None  # too old to catch up
+    open_store(daemon_config).record_run(
+        daemon_config.account,
+        RunRecord(ts=_at(1, 8, 31), run_id="r1", stage="CHECKIN", result="CHECKIN_FAIL", error_code="NEED_AUTH"),
+    )
+    assert missed_slot([daemon_config], _at(1, 9), times, 3600) is None
+
+
+def _run_daemon(daemon_config: Config, monkeypatch, start: datetime):
+    SessionStub.instances = []
+    monkeypatch.setattr("src.daemon.BrowserSession", SessionStub)
+    clock = {"now": start}
+    fired = []
+    daemon = Daemon(daemon_config, clock=lambda: clock["now"], jitter=lambda: 0.5)
+
+    def wait(seconds: float) -> bool:
+        clock["now"] += timedelta(seconds=seconds)
+        return False
+
+    def run_checkin(config, logger, notifier, run_id, tz, *, start, spans, session=None, heartbeat, **kwargs):
+        heartbeat()  # once per attempt in the real loop
+        fired.append((clock["now"], session))
+        clock["now"] += timedelta(seconds=20)
+        if len(fired) == 2:
+            daemon.stop()
+        return 0
+
+    monkeypatch.setattr(daemon, "_wait", wait)
+    monkeypatch.setattr("src.daemon._run_checkin", run_checkin)
+    assert daemon.run() == 0
+    return fired
+
+
+def test_daemon_catches_up_then_fires_with_jitter_on_warm_session(
+    daemon_config: Config, monkeypatch, tmp_path: Path
+) -> None:
+    notify_path = tmp_path / "notify.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    listener.bind(str(notify_path))
+    listener.settimeout(1.0)
+    messages: List[str] = []
+
+    def drain() -> None:
+        try:
+            while True:
+                messages.append(listener.recv(4096).decode())
+        except OSError:  # socket.timeout once the daemon has stopped
+            pass
+
+    reader = threading.Thread(target=drain)
+    reader.start()
+    monkeypatch.setenv("NOTIFY_SOCKET", str(notify_path))
+    monkeypatch.setenv("WATCHDOG_USEC", "20000000")
+    monkeypatch.delenv("WATCHDOG_PID", raising=False)
+
+    fired = _run_daemon(daemon_config, monkeypatch, _at(1, 9))
+
+    (session,) = SessionStub.instances
+    assert session.pages == 1  # warmed up once, then reused
+    assert session.closed
+    assert fired[0] == (_at(1, 9), session)  # 08:30 was missed by 30 minutes
+    assert fired[1] == (_at(1, 20, 30) + timedelta(seconds=30), session)
+
+    reader.join()
+    listener.close()
+    assert messages[0].startswith("READY=1")
+    # Pinged while running the catch-up, not only while idle afterwards.
+    catch_up = messages.index("STATUS=Running check-in for 2024-03-01T08:30+02:00")
+    assert messages[catch_up + 1] == "WATCHDOG=1"
+    assert any(message.startswith("STATUS=Next check-in at 2024-03-01T20:30:30") for message in messages)
+    assert messages[-1] == "STOPPING=1"
+
+
+def test_daemon_without_warm_browser_skips_old_slots(daemon_config: Config, monkeypatch) -> None:
+    daemon_config.schedule.warm_browser = False
+    fired = _run_daemon(daemon_config, monkeypatch, _at(1, 11))
+
+    assert SessionStub.instances == []
+    jitter = timedelta(seconds=30)
+    assert [when for when, _ in fired] == [_at(1, 20, 30) + jitter, _at(2, 8, 30) + jitter]
+    assert all(session is None for _, session in fired)
+
+
+class EngineStub:
+    instances: List["EngineStub"] = []
+
+    def __init__(self, config: Config, accounts) -> None:
+        self.loops = set()
+        self.events: List[str] = []
+        EngineStub.instances.append(self)
+
+    async def warm_up(self) -> None:
+        self.loops.add(asyncio.get_running_loop())
+        self.events.append("warm_up")
+
+    async def run(self, accounts, *, heartbeat):
+        self.loops.add(asyncio.get_running_loop())
+        heartbeat()
+        self.events.append("run")
+        return [
+            AccountResult(account=account.account, run_id="r", exit_code=0, duration_ms=1, attempts=1)
+            for account in accounts
+        ]
+
+    async def close(self) -> None:
+        self.events.append("close")
+
+
+def test_daemon_pool_mode_keeps_batch_engine_warm(daemon_config: Config, monkeypatch) -> None:
+    daemon_config.run.browser_mode = "pool"
+    EngineStub.instances = []
+    monkeypatch.setattr("src.daemon.BatchEngine", EngineStub)
+    clock = {"now": _at(1, 11)}
+    daemon = Daemon(daemon_config, clock=lambda: clock["now"], jitter=lambda: 0.0)
+    fired: List[Dict[str, int]] = []
+    fire = daemon.fire
+
+    def wait(seconds: float) -> bool:
+        clock["now"] += timedelta(seconds=seconds)
+        return False
+
+    def fire_and_count(slot, *, catch_up=False):
+        fired.append(fire(slot, catch_up=catch_up))
+        if len(fired) == 2:
+            daemon.stop()
+        return fired[-1]
+
+    monkeypatch.setattr(daemon, "_wait", wait)
+    monkeypatch.setattr(daemon, "fire", fire_and_count)
+    monkeypatch.setattr("src.daemon._run_checkin", lambda *args, **kwargs: pytest.fail("serial path used"))
+    assert daemon.run() == 0
+
+    (engine,) = EngineStub.instances  # one driver and pool across both firings
+    assert engine.events == ["warm_up", "run", "run", "close"]
+    assert len(engine.loops) == 1
+    assert fired == [{"default": 0}, {"default": 0}]
+
+
+def test_heartbeat_stops_pinging_once_progress_stalls(monkeypatch) -> None:
+    sent: List[str] = []
+    monkeypatch.setattr("src.daemon.sd_notify", lambda *fields: sent.extend(fields) or True)
+
+    with Heartbeat(0.01, stall=0.05):
+        time.sleep(0.2)
+        stalled = len(sent)
+        time.sleep(0.1)
+        assert len(sent) == stalled  # no beat for longer than ``stall``: let systemd step in
+
+    assert 2 < stalled < 10
+    with Heartbeat(None, stall=0.05) as heartbeat:
+        heartbeat.beat()
+    assert len(sent) == stalled
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import csv
+import io
+import threading
+from pathlib import Path
+
+from src import history
+from src.history import append_history_entry, compact_history, export_history, history_header, iter_history
+
+
+def _row(index: int) -> list[str]:
+    return [f"2024-01-01T00:00:{index:02d}", f"run-{index}", "CHECKIN", "CHECKIN_OK", "", "0", "10", ""]
+
+
+def _read(path: Path) -> list[list[str]]:
+    with path.open(newline="", encoding="utf-8") as fh:
+        return list(csv.reader(fh))
+
+
+def test_append_writes_header_once(tmp_path: Path) -> None:
+    path = tmp_path / "data" / "history.csv"
+    append_history_entry(path, 10, _row(1))
+    append_history_entry(path, 10, _row(2))
+
+    rows = _read(path)
+    assert rows[0] == history_header()
+    assert [row[1] for row in rows[1:]] == ["run-1", "run-2"]
+
+
+def test_append_compacts_only_past_threshold(tmp_path: Path, monkeypatch) -> None:
+    path = tmp_path / "history.csv"
+    monkeypatch.setattr(history, "_ROW_BYTES_ESTIMATE", 100)
+    limit = 3
+
+    for index in range(5):
+        append_history_entry(path, limit, _row(index))
+    assert len(_read(path)) == 6  # under the threshold, nothing trimmed yet
+
+    index = 5
+    while len(_read(path)) > limit + 1:
+        append_history_entry(path, limit, _row(index))
+        index += 1
+    rows = _read(path)
+    assert rows[0] == history_header()
+    assert [row[1] for row in rows[1:]] == [f"run-{i}" for i in range(index - limit, index)]
+    assert path.stat().st_size <= history.compaction_threshold(limit)
+
+
+def test_wide_rows_still_compact_rarely(tmp_path: Path, monkeypatch) -> None:
+    path = tmp_path / "history.csv"
+    rewrites = []
+    compact = history._compact_locked
+    monkeypatch.setattr(history, "_compact_locked", lambda *args: rewrites.append(1) or compact(*args))
+    note = "Page.goto: Timeout 20000ms exceeded.\nCall log:\n  - navigating to \"https://example.com/checkin\"" * 3
+    spans = "launch=812;context=95;navigate=20011;screenshot=240"
+    limit = 100
+
+    for index in range(1000):
+        row = [f"2024-01-01T{index:06d}", f"run-{index}", "CHECKIN", "CHECKIN_FAIL", "NAV_TIMEOUT", "2", "41000"]
+        append_history_entry(path, limit, row + [note, spans])
+
+    # Rows far wider than the estimate: still about one rewrite per ``limit`` appends.
+    assert 1 <= len(rewrites) <= 1000 // limit
+    assert 100 <= len(_read(path)) - 1 <= 2 * limit + 1
+
+
+def test_concurrent_appends_keep_every_row(tmp_path: Path) -> None:
+    path = tmp_path / "history.csv"
+
+    def worker(offset: int) -> None:
+        for index in range(25):
+            append_history_entry(path, 10_000, _row(offset * 100 + index))
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows = list(iter_history(path))
+    assert len(rows) == 200
+    assert len({row["run_id"] for row in rows}) == 200
+
+
+def test_export_and_compact(tmp_path: Path) -> None:
+    path = tmp_path / "history.csv"
+    for index in range(6):
+        append_history_entry(path, 100, _row(index))
+
+    out = io.StringIO()
+    assert export_history(path, out, limit=2) == 2
+    exported = list(csv.reader(io.StringIO(out.getvalue())))
+    assert exported[0] == history_header()
+    assert [row[1] for row in exported[1:]] == ["run-4", "run-5"]
+
+    compact_history(path, 3)
+    assert [row[1] for row in _read(path)[1:]] == ["run-3", "run-4", "run-5"]
+
+
+def test_rows_under_legacy_header_gain_new_columns(tmp_path: Path) -> None:
+    path = tmp_path / "history.csv"
+    path.write_text(",".join(history_header()[:8]) + "\n" + ",".join(_row(0)[:8]) + "\n", encoding="utf-8")
+    append_history_entry(path, 100, _row(1) + ["navigate=10"])
+
+    rows = list(iter_history(path))
+    assert rows[0]["run_id"] == "run-0" and "spans" not in rows[0]
+    assert rows[1]["spans"] == "navigate=10"
+
+    compact_history(path, 100)
+    assert _read(path)[0] == history_header()
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from src.config import (
+    CheckinResponseConfig,
+    Config,
+    LoggingConfig,
+    NotifyConfig,
+    RunConfig,
+    ScheduleConfig,
+    SelectorConfig,
+    SiteConfig,
+)
+from src.http_checkin import FastPathUnavailable, HttpClient, http_checkin, load_cookie_header
+from src.utils import auth_state_path
+
+
+class CheckinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    mode = "ok"
+
+    def setup(self) -> None:
+        super().setup()
+        CheckinHandler.connections += 1
+
+    def log_message(self, *args) -> None:
+        return None
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if "session=abc" not in (self.headers.get("Cookie") or ""):
+            status, body = 401, b'{"message": "unauthorized"}'
+        elif CheckinHandler.mode == "html":
+            status, body = 200, b"<html>maintenance</html>"
+        else:
+            status, body = 200, json.dumps({"success": True, "message": ""}).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    CheckinHandler.connections = 0
+    CheckinHandler.mode = "ok"
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), CheckinHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_config(tmp_path: Path, api_url: str) -> Config:
+    return Config(
+        timezone="UTC",
+        schedule=ScheduleConfig(),
+        notify=NotifyConfig(),
+        run=RunConfig(http_fast_path=True),
+        selectors=SelectorConfig(),
+        site=SiteConfig(
+            base_url="http://127.0.0.1",
+            checkin_url="http://127.0.0.1/console",
+            checkin_api_url=api_url,
+        ),
+        logging=LoggingConfig(log_file=tmp_path / "logs.jsonl"),
+        project_root=tmp_path,
+        data_dir=tmp_path / "data",
+        history_file=tmp_path / "data" / "history.csv",
+        screenshots_dir=tmp_path / "screenshots",
+        userdata_dir=tmp_path / "data" / "userdata",
+        meta_dir=tmp_path / "data" / "meta",
+        checkin_response=CheckinResponseConfig(url_pattern="sign_in", success={"success": True}),
+    )
+
+
+def write_state(config: Config, cookies) -> None:
+    path = auth_state_path(config.data_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"cookies": cookies, "origins": []}))
+
+
+def cookie(name: str, value: str, domain: str = "127.0.0.1", **extra) -> dict:
+    return {"name": name, "value": value, "domain": domain, "path": "/", "expires": -1, **extra}
+
+
+def test_load_cookie_header_filters_domain_expiry_and_secure(tmp_path: Path) -> None:
+    state = tmp_path / "state.json"
+    state.write_text(
+        json.dumps(
+            {
+                "cookies": [
+                    cookie("session", "abc", ".example.com"),
+                    cookie("other", "x", "other.com"),
+                    cookie("stale", "y", "example.com", expires=10),
+                    cookie("secure", "z", "example.com", secure=True),
+                ]
+            }
+        )
+    )
+    assert load_cookie_header(state, "https://api.example.com/sign_in", now=100) == "session=abc; secure=z"
+    assert load_cookie_header(state, "http://example.com/sign_in", now=100) == "session=abc"
+
+
+def test_http_checkin_reuses_pooled_connection(tmp_path: Path, server: str) -> None:
+    config = make_config(tmp_path, f"{server}/api/user/sign_in")
+    write_state(config, [cookie("session", "abc")])
+    client = HttpClient(timeout=5)
+    try:
+        first = http_checkin(config, client)
+        second = http_checkin(config, client)
+    finally:
+        client.close()
+    assert first.status == second.status == "CHECKIN_OK"
+    assert CheckinHandler.connections == 1
+
+
+def test_http_checkin_requests_fallback_on_auth_and_format(tmp_path: Path, server: str) -> None:
+    config = make_config(tmp_path, f"{server}/api/user/sign_in")
+    client = HttpClient(timeout=5)
+    try:
+        with pytest.raises(FastPathUnavailable) as missing:
+            http_checkin(config, client)
+        assert missing.value.error_code == "NEED_AUTH"
+
+        write_state(config, [cookie("session", "expired-token")])
+        with pytest.raises(FastPathUnavailable) as unauthorized:
+            http_checkin(config, client)
+        assert unauthorized.value.error_code == "NEED_AUTH"
+
+        write_state(config, [cookie("session", "abc")])
+        CheckinHandler.mode = "html"
+        with pytest.raises(FastPathUnavailable) as malformed:
+            http_checkin(config, client)
+        assert malformed.value.error_code == "BAD_RESPONSE"
+    finally:
+        client.close()
+
+
+class ConnStub:
+    def __init__(self, fail_request=None, fail_read=None) -> None:
+        self.fail_request = fail_request
+        self.fail_read = fail_read
+        self.closed = False
+
+    def request(self, method, target, body=None, headers=None) -> None:
+        if self.fail_request is not None:
+            raise self.fail_request
+
+    def getresponse(self):
+        conn = self
+
+        class Raw:
+            def read(self):
+                raise conn.fail_read
+
+        return Raw()
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_http_client_closes_connection_when_read_or_retry_fails(monkeypatch) -> None:
+    client = HttpClient(timeout=5)
+    broken_body = ConnStub(fail_read=TimeoutError("read timed out"))
+    monkeypatch.setattr(client, "_connect", lambda origin: broken_body)
+    with pytest.raises(TimeoutError):
+        client.request("GET", "https://example.com/api")
+    assert broken_body.closed
+
+    stale = ConnStub(fail_request=ConnectionResetError())
+    fresh = ConnStub(fail_request=OSError("connection refused"))
+    client._idle[("https", "example.com", 443)].append(stale)
+    monkeypatch.setattr(client, "_connect", lambda origin: fresh)
+    with pytest.raises(OSError):
+        client.request("GET", "https://example.com/api")
+    assert stale.closed and fresh.closed
+    assert client._idle[("https", "example.com", 443)] == []
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from zoneinfo import ZoneInfo
+
+from src.config import Config, LoggingConfig, NotifyConfig, RunConfig, ScheduleConfig, SelectorConfig, SiteConfig
+from src.logging_setup import CompressingRotatingHandler, JsonFormatter, setup_logging, shutdown_logging
+from src.logs import iter_log_records, rotated_segments
+
+
+def _config(tmp_path: Path, log_name: str = "signin.jsonl") -> Config:
+    return Config(
+        timezone="Europe/Helsinki",
+        schedule=ScheduleConfig(),
+        notify=NotifyConfig(),
+        run=RunConfig(),
+        selectors=SelectorConfig(),
+        site=SiteConfig(base_url="https://example.com", checkin_url="https://example.com/checkin"),
+        logging=LoggingConfig(log_file=tmp_path / "logs" / log_name),
+        project_root=tmp_path,
+        data_dir=tmp_path / "data",
+        history_file=tmp_path / "data" / "history.csv",
+        screenshots_dir=tmp_path / "screenshots",
+        userdata_dir=tmp_path / "userdata",
+        meta_dir=tmp_path / "meta",
+    )
+
+
+@pytest.fixture(autouse=True)
+def _reset_logging():
+    yield
+    shutdown_logging()
+
+
+def _read(path: Path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_setup_logging_is_idempotent_and_flushes_through_queue(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+    first = setup_logging(config, "run-1")
+    second = setup_logging(config, "run-2")
+
+    handlers = logging.getLogger("anyrouter").handlers
+    assert len(handlers) == 1
+    first.info("hello %s", "world", extra={"step": "start"})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        second.exception("failed", extra={"error_code": "UNKNOWN"})
+    shutdown_logging()
+
+    records = _read(config.logging.log_file)
+    assert [record["message"] for record in records] == ["hello world", "failed"]
+    assert records[0]["run_id"] == "run-1" and records[0]["step"] == "start"
+    assert records[1]["run_id"] == "run-2" and "ValueError: boom" in records[1]["exc_info"]
+    assert not logging.getLogger("anyrouter").handlers
+
+
+def test_setup_logging_replaces_handlers_when_settings_change(tmp_path: Path) -> None:
+    setup_logging(_config(tmp_path, "a.jsonl"), "run-1").info("first")
+    setup_logging(_config(tmp_path, "b.jsonl"), "run-2").info("second")
+    shutdown_logging()
+
+    assert [r["message"] for r in _read(tmp_path / "logs" / "a.jsonl")] == ["first"]
+    assert [r["message"] for r in _read(tmp_path / "logs" / "b.jsonl")] == ["second"]
+
+
+def test_json_formatter_timestamp_matches_isoformat() -> None:
+    tz = ZoneInfo("Europe/Helsinki")
+    formatter = JsonFormatter(tz)
+    for created in (1_700_000_000.123456, 1_700_000_000.9, 1_711_846_799.5, 1_711_846_800.25):
+        record = logging.LogRecord("anyrouter", logging.INFO, __file__, 1, "msg", None, None)
+        record.created = created
+        expected = datetime.fromtimestamp(created, tz).isoformat(timespec="microseconds")
+        assert json.loads(formatter.format(record))["ts"][:26] == expected[:26]
+        assert json.loads(formatter.format(record))["ts"][-6:] == expected[-6:]
+
+
+def _emit(handler, message: str, created: float | None = None) -> None:
+    record = logging.LogRecord("anyrouter", logging.INFO, __file__, 1, message, None, None)
+    if created is not None:
+        record.created = created
+    handler.handle(record)
+
+
+def test_rotated_segments_are_compressed_and_capped(tmp_path: Path) -> None:
+    log_file = tmp_path / "signin.jsonl"
+    handler = CompressingRotatingHandler(
+        log_file, max_bytes=200, max_total_bytes=10_000, tz=ZoneInfo("UTC"), compress=True
+    )
+    handler.setFormatter(JsonFormatter(ZoneInfo("UTC")))
+    for index in range(40):
+        _emit(handler, f"message {index:03d} " + "x" * 40, created=1_700_000_000 + index)
+    handler.close()
+
+    segments = rotated_segments(log_file)
+    assert segments and all(path.name.endswith(".jsonl.gz") for path in segments)
+    assert segments[0].name.startswith("signin.20231114T")
+    messages = [record["message"] for record in iter_log_records(log_file)]
+    assert messages == [f"message {index:03d} " + "x" * 40 for index in range(40)]
+
+    handler = CompressingRotatingHandler(log_file, max_bytes=200, max_total_bytes=150, tz=ZoneInfo("UTC"))
+    handler.close()
+    remaining = rotated_segments(log_file)
+    assert sum(path.stat().st_size for path in remaining) <= 150
+    assert len(remaining) < len(segments)
+
+
+def test_daily_rotation_follows_configured_timezone(tmp_path: Path) -> None:
+    tz = ZoneInfo("Europe/Helsinki")
+    log_file = tmp_path / "signin.jsonl"
+    handler = CompressingRotatingHandler(
+        log_file, max_bytes=0, max_total_bytes=10_000_000, tz=tz, daily=True, compress=False
+    )
+    handler.setFormatter(JsonFormatter(tz))
+    before_midnight = datetime(2024, 3, 1, 23, 59, tzinfo=tz).timestamp()
+    _emit(handler, "late", created=before_midnight)
+    _emit(handler, "still late", created=before_midnight + 30)
+    _emit(handler, "next day", created=before_midnight + 120)
+    handler.close()
+
+    (segment,) = rotated_segments(log_file)
+    assert segment.name == "signin.20240301T235900.jsonl"
+    assert [json.loads(line)["message"] for line in segment.read_text().splitlines()] == ["late", "still late"]
+    assert [json.loads(line)["message"] for line in log_file.read_text().splitlines()] == ["next day"]
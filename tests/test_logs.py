@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from src import logging_setup
+from src.logging_setup import compress_segment
+from src.logs import LogIndex, find_run_lines, index_path, index_segment, iter_gzip_members, main
+
+
+def _write_segment(path: Path, records: list[dict]) -> None:
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+
+def _records(run_id: str, day: str, count: int, error_code: str = "") -> list[dict]:
+    return [
+        {"ts": f"{day}T08:00:{i:02d}+00:00", "run_id": run_id, "message": f"{run_id} {i} " + "x" * 60,
+         **({"error_code": error_code} if error_code and i == count - 1 else {})}
+        for i in range(count)
+    ]
+
+
+def test_compressed_segments_are_indexed_by_member(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(logging_setup, "_COMPRESS_CHUNK_BYTES", 256)
+    log_file = tmp_path / "signin.jsonl"
+    index = LogIndex(index_path(log_file))
+    segment = tmp_path / "signin.20240301T080000.jsonl"
+    _write_segment(segment, _records("run-a", "2024-03-01", 10) + _records("run-b", "2024-03-01", 10, "NEED_AUTH"))
+    compressed = compress_segment(segment, index)
+
+    with compressed.open("rb") as fh:
+        members = list(iter_gzip_members(fh))
+    assert len(members) > 2
+    located = index.locate("run-b")
+    assert located and all(name == compressed.name for name, _ in located)
+    assert {offset for _, offset in located} < {offset for offset, _ in members}
+    assert index.find_runs(error_code="NEED_AUTH") == [("2024-03-01", "run-b", "NEED_AUTH")]
+
+    _write_segment(log_file, _records("run-b", "2024-03-02", 1) + _records("run-c", "2024-03-02", 2))
+    lines = [json.loads(line) for line in find_run_lines(log_file, "run-b")]
+    assert [line["message"].split()[1] for line in lines] == [str(i) for i in range(10)] + ["0"]
+    assert lines[-1]["ts"].startswith("2024-03-02")
+
+    index.drop_segment(compressed.name)
+    assert index.locate("run-b") == []
+    index_segment(index, compressed)
+    assert index.locate("run-b") == located
+
+
+def test_show_reports_missing_run(tmp_path: Path, monkeypatch, capsys) -> None:
+    log_file = tmp_path / "signin.jsonl"
+    _write_segment(log_file, _records("run-a", "2024-03-01", 2))
+
+    class _Logging:
+        pass
+
+    class _Config:
+        logging = _Logging()
+
+    _Config.logging.log_file = log_file
+    monkeypatch.setattr("src.config.load_config", lambda: _Config)
+
+    assert main(["show", "run-a"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 2
+    assert main(["show", "run-z"]) == 1
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.config import (
+    Config,
+    LoggingConfig,
+    MetricsConfig,
+    NotifyConfig,
+    RunConfig,
+    ScheduleConfig,
+    SelectorConfig,
+    SiteConfig,
+)
+from src.metrics import RunMetrics, export_run_metrics, state_path
+
+
+def _config(tmp_path: Path) -> Config:
+    return Config(
+        timezone="UTC",
+        schedule=ScheduleConfig(),
+        notify=NotifyConfig(),
+        run=RunConfig(),
+        selectors=SelectorConfig(),
+        site=SiteConfig(base_url="https://example.com", checkin_url="https://example.com/checkin"),
+        logging=LoggingConfig(log_file=tmp_path / "logs.jsonl"),
+        project_root=tmp_path,
+        data_dir=tmp_path / "data",
+        history_file=tmp_path / "data" / "history.csv",
+        screenshots_dir=tmp_path / "screenshots",
+        userdata_dir=tmp_path / "userdata",
+        meta_dir=tmp_path / "meta",
+        metrics=MetricsConfig(textfile=tmp_path / "collector" / "anyrouter.prom", duration_buckets=(1.0, 10.0)),
+    )
+
+
+def _run(account: str, result: str, duration_ms: int, *, error_code: str = "", attempts: int = 1, ts: int = 1_700_000_000):
+    return RunMetrics(
+        account=account,
+        result=result,
+        error_code=error_code,
+        attempts=attempts,
+        duration_ms=duration_ms,
+        finished=datetime.fromtimestamp(ts, timezone.utc),
+    )
+
+
+def test_export_accumulates_per_account(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+    export_run_metrics(config, _run("alice", "CHECKIN_OK", 800))
+    export_run_metrics(config, _run("alice", "CHECKIN_FAIL", 15_000, error_code="NEED_AUTH", attempts=3, ts=1_700_000_100))
+    path = export_run_metrics(config, _run("bob", "CHECKIN_ALREADY", 4_000))
+
+    lines = set(path.read_text().splitlines())
+    assert 'anyrouter_checkin_last_success_timestamp_seconds{account="alice"} 1700000000.0' in lines
+    assert 'anyrouter_checkin_last_run_success{account="alice"} 0' in lines
+    assert 'anyrouter_checkin_duration_seconds_bucket{account="alice",le="1.0"} 1' in lines
+    assert 'anyrouter_checkin_duration_seconds_bucket{account="alice",le="10.0"} 1' in lines
+    assert 'anyrouter_checkin_duration_seconds_bucket{account="alice",le="+Inf"} 2' in lines
+    assert 'anyrouter_checkin_duration_seconds_sum{account="alice"} 15.8' in lines
+    assert 'anyrouter_checkin_attempts_total{account="alice"} 4' in lines
+    assert 'anyrouter_checkin_errors_total{account="alice",error_code="NEED_AUTH"} 1' in lines
+    assert 'anyrouter_checkin_runs_total{account="bob",result="CHECKIN_ALREADY"} 1' in lines
+    assert "# TYPE anyrouter_checkin_duration_seconds histogram" in lines
+    assert sorted(p.name for p in path.parent.iterdir()) == sorted(
+        [path.name, state_path(path).name, f"{state_path(path).name}.lock"]
+    )
+
+
+def test_export_is_disabled_without_textfile(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+    config.metrics = MetricsConfig()
+    assert export_run_metrics(config, _run("alice", "CHECKIN_OK", 100)) is None
+    assert not (tmp_path / "collector").exists()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+from datetime import datetime, timezone
 from email.message import EmailMessage
 from pathlib import Path
 from typing import List
@@ -18,6 +19,7 @@ from src.config import (
     SMTPConfig,
     )
 from src.notifier_email import EmailNotifier
+from src.store import open_store
 from smtplib import SMTPResponseException
 
 
@@ -49,6 +51,10 @@ def config_with_email(tmp_path: Path) -> Config:
     )
 
 
+def _success_email_pending(config: Config) -> bool:
+    return open_store(config).should_send_success_email(config.account, datetime.now(timezone.utc))
+
+
 class SendRecorder:
     def __init__(self) -> None:
         self.sent: List[EmailMessage] = []
@@ -60,11 +66,8 @@ class SendRecorder:
 def test_send_success_dispatches_and_records(config_with_email, monkeypatch) -> None:
     notifier = EmailNotifier(config_with_email, tz=None)
 
-    monkeypatch.setattr("src.notifier_email.should_send_success_email", lambda *_: True)
-    recorded: List[Path] = []
-    monkeypatch.setattr("src.notifier_email.record_success_email_sent", lambda meta_dir, now: recorded.append(meta_dir))
     sender = SendRecorder()
-    monkeypatch.setattr(EmailNotifier, "_send", lambda self, message: sender(message))
+    monkeypatch.setattr(EmailNotifier, "send_now", lambda self, message: sender(message))
 
     result = notifier.send_success("Subject", "Body")
 
@@ -73,7 +76,9 @@ def test_send_success_dispatches_and_records(config_with_email, monkeypatch) ->
     message = sender.sent[0]
     assert message["Subject"] == "Subject"
     assert "ops@example.com" in message["To"]
-    assert recorded == [config_with_email.meta_dir]
+    assert not _success_email_pending(config_with_email)
+    assert notifier.send_success("Subject", "Body") is False
+    assert len(sender.sent) == 1
 
 
 def test_send_success_skips_when_disabled(config_with_email) -> None:
@@ -84,38 +89,27 @@ def test_send_success_skips_when_disabled(config_with_email) -> None:
 
 def test_send_success_respects_daily_limit(config_with_email, monkeypatch) -> None:
     notifier = EmailNotifier(config_with_email, tz=None)
-    monkeypatch.setattr("src.notifier_email.should_send_success_email", lambda *_: False)
-    monkeypatch.setattr(EmailNotifier, "_send", lambda self, message: (_ for _ in ()).throw(RuntimeError("should not send")))
+    open_store(config_with_email).record_success_email_sent(config_with_email.account, datetime.now(timezone.utc))
+    monkeypatch.setattr(EmailNotifier, "send_now", lambda self, message: (_ for _ in ()).throw(RuntimeError("should not send")))
     assert notifier.send_success("Subject", "Body") is False
 
 
 def test_send_success_handles_smtp_error(config_with_email, monkeypatch) -> None:
     notifier = EmailNotifier(config_with_email, tz=None)
-    monkeypatch.setattr("src.notifier_email.should_send_success_email", lambda *_: True)
-
-    recorded: List[Path] = []
-    monkeypatch.setattr("src.notifier_email.record_success_email_sent", lambda meta_dir, now: recorded.append(meta_dir))
 
     def raise_error(self, message):
         raise SMTPResponseException(451, b"temporary failure")
 
-    monkeypatch.setattr(EmailNotifier, "_send", raise_error)
+    monkeypatch.setattr(EmailNotifier, "send_now", raise_error)
 
     result = notifier.send_success("Subject", "Body")
 
     assert result is False
-    assert recorded == []
+    assert _success_email_pending(config_with_email)
 
 
 def test_send_success_ignores_quit_error(config_with_email, monkeypatch, caplog) -> None:
     notifier = EmailNotifier(config_with_email, tz=None)
-    monkeypatch.setattr("src.notifier_email.should_send_success_email", lambda *_: True)
-
-    recorded: List[Path] = []
-    monkeypatch.setattr(
-        "src.notifier_email.record_success_email_sent",
-        lambda meta_dir, now: recorded.append(meta_dir),
-    )
 
     class DummySMTP:
         instances: List["DummySMTP"] = []
@@ -155,7 +149,7 @@ def test_send_success_ignores_quit_error(config_with_email, monkeypatch, caplog)
         result = notifier.send_success("Subject", "Body")
 
     assert result is True
-    assert recorded == [config_with_email.meta_dir]
+    assert not _success_email_pending(config_with_email)
     assert DummySMTP.instances and DummySMTP.instances[0].messages
     assert any("SMTP server error during quit" in rec.message for rec in caplog.records)
 
@@ -165,7 +159,7 @@ def test_send_failure_with_attachments(config_with_email, tmp_path, monkeypatch)
     attachment.write_bytes(b"content")
 
     sender = SendRecorder()
-    monkeypatch.setattr(EmailNotifier, "_send", lambda self, message: sender(message))
+    monkeypatch.setattr(EmailNotifier, "send_now", lambda self, message: sender(message))
 
     result = notifier.send_failure("Subject", "Body", attachments=[attachment])
 
@@ -189,8 +183,62 @@ def test_send_failure_handles_smtp_error(config_with_email, monkeypatch) -> None
     def raise_error(self, message):
         raise SMTPResponseException(451, b"temporary failure")
 
-    monkeypatch.setattr(EmailNotifier, "_send", raise_error)
+    monkeypatch.setattr(EmailNotifier, "send_now", raise_error)
 
     result = notifier.send_failure("Subject", "Body")
 
     assert result is False
+
+
+def test_repeated_failures_are_suppressed_escalated_and_resolved(config_with_email, monkeypatch) -> None:
+    config_with_email.notify.failure_cooldown_seconds = 6 * 3600
+    config_with_email.notify.failure_escalate_counts = (3,)
+    notifier = EmailNotifier(config_with_email, tz=None)
+    sender = SendRecorder()
+    monkeypatch.setattr(EmailNotifier, "send_now", lambda self, message: sender(message))
+    clock = {"now": datetime(2024, 1, 1, 8, 30, tzinfo=timezone.utc)}
+    monkeypatch.setattr("src.notifier_email.now_tz", lambda tz=None: clock["now"])
+
+    def fail(hour: int, code: str = "NEED_AUTH") -> bool:
+        clock["now"] = clock["now"].replace(hour=hour)
+        return notifier.send_failure(f"[FAIL][{code}]", "Body", error_code=code)
+
+    assert fail(8) is True
+    assert fail(9) is False  # same code inside the cooldown
+    assert fail(10, "NAV_TIMEOUT") is True  # a new failure type is never hidden
+    assert fail(11) is True  # third in a row escalates
+    assert fail(12) is False
+    assert fail(18) is True  # cooldown elapsed since the escalation
+    subjects = [message["Subject"] for message in sender.sent]
+    assert subjects[0] == "[FAIL][NEED_AUTH]"
+    assert subjects[2] == "[FAIL][NEED_AUTH] [ESCALATED x3]"
+    assert subjects[3] == "[FAIL][NEED_AUTH] [REPEAT x5]"
+    assert "1 alert(s) suppressed" in sender.sent[2].get_content()
+
+    assert notifier.send_resolved("[RESOLVED]", "Healthy again.") is True
+    resolved = sender.sent[-1]
+    assert resolved["Subject"] == "[RESOLVED] NAV_TIMEOUT,NEED_AUTH"
+    assert "NEED_AUTH: 5 failure(s)" in resolved.get_content()
+    assert notifier.send_resolved("[RESOLVED]", "Healthy again.") is False
+    assert fail(19) is True  # state was cleared by the success
+
+
+def test_resolved_alerts_stay_open_until_the_email_is_delivered(config_with_email, monkeypatch) -> None:
+    notifier = EmailNotifier(config_with_email, tz=None)
+    sender = SendRecorder()
+    outage = {"down": False}
+
+    def send(self, message: EmailMessage) -> None:
+        if outage["down"]:
+            raise OSError("SMTP unreachable")
+        sender(message)
+
+    monkeypatch.setattr(EmailNotifier, "send_now", send)
+    assert notifier.send_failure("[FAIL][NEED_AUTH]", "Body", error_code="NEED_AUTH") is True
+
+    outage["down"] = True
+    assert notifier.send_resolved("[RESOLVED]", "Healthy again.") is False
+    outage["down"] = False
+    assert notifier.send_resolved("[RESOLVED]", "Healthy again.") is True
+    assert sender.sent[-1]["Subject"] == "[RESOLVED] NEED_AUTH"
+    assert notifier.send_resolved("[RESOLVED]", "Healthy again.") is False
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+
+from src.config import (
+    Config,
+    LoggingConfig,
+    NotifyConfig,
+    RunConfig,
+    ScheduleConfig,
+    SelectorConfig,
+    SiteConfig,
+    WebhookConfig,
+)
+from src.notifiers import Backend, FanoutNotifier, build_notifier
+from src.store import RunRecord, open_store
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    received: List[dict] = []
+    status = 204
+    connections = 0
+
+    def setup(self) -> None:
+        super().setup()
+        WebhookHandler.connections += 1
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server API
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length))
+        payload["_token"] = self.headers.get("X-Token")
+        WebhookHandler.received.append(payload)
+        self.send_response(WebhookHandler.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args) -> None:
+        return None
+
+
+@pytest.fixture
+def webhook_url():
+    WebhookHandler.received = []
+    WebhookHandler.status = 204
+    WebhookHandler.connections = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), WebhookHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/hook"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class RecordingLogger:
+    def __init__(self) -> None:
+        self.records: List[tuple[str, str, dict]] = []
+
+    def info(self, message: str, extra: Optional[dict] = None) -> None:
+        self.records.append(("info", message, extra or {}))
+
+    def warning(self, message: str, extra: Optional[dict] = None) -> None:
+        self.records.append(("warning", message, extra or {}))
+
+
+class EmailStub:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.failures: List[str] = []
+
+    def send_success(self, subject: str, body: str) -> bool:
+        return True
+
+    def send_failure(self, subject: str, body: str, *, attachments=None, error_code=None) -> bool:
+        time.sleep(self.delay)
+        self.failures.append(subject)
+        return True
+
+    def send_resolved(self, subject: str, body: str) -> bool:
+        return False
+
+
+def make_config(tmp_path: Path, url: str) -> Config:
+    return Config(
+        timezone="UTC",
+        schedule=ScheduleConfig(),
+        notify=NotifyConfig(
+            webhooks=(
+                WebhookConfig(url=url, name="ops", headers={"X-Token": "t0k"}, timeout_seconds=2.0),
+            ),
+        ),
+        run=RunConfig(),
+        selectors=SelectorConfig(),
+        site=SiteConfig(base_url="https://example.com", checkin_url="https://example.com/checkin"),
+        logging=LoggingConfig(log_file=tmp_path / "logs.jsonl"),
+        project_root=tmp_path,
+        data_dir=tmp_path / "data",
+        history_file=tmp_path / "data" / "history.csv",
+        screenshots_dir=tmp_path / "screenshots",
+        userdata_dir=tmp_path / "userdata",
+        meta_dir=tmp_path / "meta",
+    )
+
+
+def test_fanout_posts_webhook_and_logs_per_backend(tmp_path: Path, webhook_url: str) -> None:
+    config = make_config(tmp_path, webhook_url)
+    logger = RecordingLogger()
+    email = EmailStub()
+    notifier = build_notifier(config, email, logger)
+
+    assert notifier.send_failure("[FAIL][NEED_AUTH]", "Body", error_code="NEED_AUTH") is True
+    assert email.failures == ["[FAIL][NEED_AUTH]"]
+    (payload,) = WebhookHandler.received
+    assert payload["event"] == "failure"
+    assert payload["error_code"] == "NEED_AUTH"
+    assert payload["_token"] == "t0k"
+    level, _, extra = logger.records[-1]
+    assert level == "info" and extra["step"] == "notify"
+    assert set(extra["notify"]) == {"email", "webhook:ops"}
+    assert all(report["sent"] and report["ms"] >= 0 for report in extra["notify"].values())
+
+    # Success events are not subscribed; resolved only follows a failed check-in.
+    assert notifier.send_success("[OK]", "Body") is True
+    open_store(config).record_run(
+        config.account,
+        RunRecord(
+            ts=datetime.now(timezone.utc), run_id="r1", stage="CHECKIN", result="CHECKIN_FAIL", error_code="NEED_AUTH"
+        ),
+    )
+    assert notifier.send_resolved("[RESOLVED]", "Healthy") is True
+    assert [item["event"] for item in WebhookHandler.received] == ["failure", "resolved"]
+    assert WebhookHandler.connections == 1  # one keep-alive connection for every event
+
+    WebhookHandler.status = 500
+    notifier.send_failure("[FAIL][NAV_TIMEOUT]", "Body", error_code="NAV_TIMEOUT")
+    level, _, extra = logger.records[-1]
+    assert level == "warning"
+    assert "HTTP 500" in extra["notify"]["webhook:ops"]["error"]
+    assert extra["notify"]["email"]["sent"] is True
+    notifier.close()
+
+
+def test_slow_backend_times_out_without_delaying_others(tmp_path: Path) -> None:
+    logger = RecordingLogger()
+    fast, slow = EmailStub(), EmailStub(delay=2.0)
+    notifier = FanoutNotifier([Backend("fast", fast, 1.0), Backend("slow", slow, 0.1)], logger)
+
+    started = time.monotonic()
+    assert notifier.send_failure("[FAIL]", "Body") is True
+    assert time.monotonic() - started < 1.0
+    assert fast.failures == ["[FAIL]"]
+    _, _, extra = logger.records[-1]
+    assert extra["notify"]["slow"]["error"] == "timeout"
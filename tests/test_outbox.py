@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from email.message import EmailMessage
+from pathlib import Path
+from smtplib import SMTPServerDisconnected
+
+import pytest
+
+from src.config import (
+    Config,
+    LoggingConfig,
+    NotifyConfig,
+    RunConfig,
+    ScheduleConfig,
+    SelectorConfig,
+    SiteConfig,
+    SMTPConfig,
+)
+from src.notifier_email import EmailNotifier
+from src.outbox import Outbox, flush_outboxes, outbox_dir
+
+
+def _message(subject: str) -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["To"] = "ops@example.com"
+    message.set_content("body")
+    return message
+
+
+@pytest.fixture
+def notify() -> NotifyConfig:
+    return NotifyConfig(outbox=True, outbox_max_attempts=3, outbox_backoff_seconds=(10.0, 60.0))
+
+
+def test_failed_delivery_is_kept_and_retried_with_backoff(tmp_path: Path, notify) -> None:
+    box = Outbox(tmp_path / "outbox", notify)
+    box.enqueue(_message("first"), kind="failure", now=1000.0)
+    box.enqueue(_message("second"), kind="success", now=1001.0)
+    sent: list[str] = []
+
+    def flaky(message) -> None:
+        if message["Subject"] == "first":
+            raise SMTPServerDisconnected("gone")
+        sent.append(message["Subject"])
+
+    assert box.deliver_due(flaky, now=1002.0) == {"sent": 1, "retry": 1, "dead": 0}
+    assert sent == ["second"]
+    (entry_id, state), = box.entries()
+    assert state["attempts"] == 1 and state["next_attempt"] == 1012.0
+    assert "SMTPServerDisconnected" in state["last_error"]
+
+    assert box.deliver_due(flaky, now=1005.0) == {"sent": 0, "retry": 0, "dead": 0}
+    box.deliver_due(flaky, now=1012.0)
+    assert box.deliver_due(flaky, now=2000.0)["dead"] == 1
+    assert list(box.entries()) == []
+    assert (tmp_path / "outbox" / "dead" / f"{entry_id}.eml").exists()
+
+
+def test_notifier_queues_and_delivers_in_background(tmp_path: Path, notify, monkeypatch) -> None:
+    notify.enable_email = True
+    notify.smtp = SMTPConfig(host="smtp.example.com", port=465, recipients=("ops@example.com",))
+    config = Config(
+        timezone="UTC",
+        schedule=ScheduleConfig(),
+        notify=notify,
+        run=RunConfig(),
+        selectors=SelectorConfig(),
+        site=SiteConfig(base_url="https://example.com", checkin_url="https://example.com/checkin"),
+        logging=LoggingConfig(log_file=tmp_path / "logs.jsonl"),
+        project_root=tmp_path,
+        data_dir=tmp_path / "data",
+        history_file=tmp_path / "data" / "history.csv",
+        screenshots_dir=tmp_path / "screenshots",
+        userdata_dir=tmp_path / "userdata",
+        meta_dir=tmp_path / "meta",
+    )
+    sent: list[EmailMessage] = []
+    monkeypatch.setattr(EmailNotifier, "send_now", lambda self, message: sent.append(message))
+    attachment = tmp_path / "failure.jpg"
+    attachment.write_bytes(b"\xff\xd8jpeg")
+
+    notifier = EmailNotifier(config, tz=None)
+    assert notifier.send_failure("Subject", "Body", attachments=[attachment]) is True
+    assert flush_outboxes(5.0)
+
+    assert len(sent) == 1 and sent[0]["Subject"] == "Subject"
+    (part,) = sent[0].iter_attachments()
+    assert part.get_content() == b"\xff\xd8jpeg"
+    assert list(Outbox(outbox_dir(config), notify).entries()) == []
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+
+from src.config import Config, LoggingConfig, NotifyConfig, RunConfig, ScheduleConfig, SelectorConfig, SiteConfig
+from src.profiling import add_profile_arguments, profile_run, prune_profiles, should_profile
+from src.timing import Spans
+
+
+class RecordingLogger:
+    def __init__(self) -> None:
+        self.infos = []
+
+    def info(self, message, extra=None) -> None:
+        self.infos.append((message, extra))
+
+    def warning(self, message, extra=None, **kwargs) -> None:  # pragma: no cover - failure path
+        raise AssertionError(message)
+
+
+def _config(tmp_path: Path, **run) -> Config:
+    return Config(
+        timezone="UTC",
+        schedule=ScheduleConfig(),
+        notify=NotifyConfig(),
+        run=RunConfig(**run),
+        selectors=SelectorConfig(),
+        site=SiteConfig(base_url="https://example.com", checkin_url="https://example.com/checkin"),
+        logging=LoggingConfig(log_file=tmp_path / "logs.jsonl"),
+        project_root=tmp_path,
+        data_dir=tmp_path / "data",
+        history_file=tmp_path / "data" / "history.csv",
+        screenshots_dir=tmp_path / "screenshots",
+        userdata_dir=tmp_path / "userdata",
+        meta_dir=tmp_path / "meta",
+    )
+
+
+def _busy(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def test_profile_run_writes_dump_and_logs_summary(tmp_path: Path) -> None:
+    config = _config(tmp_path)
+    logger = RecordingLogger()
+    spans = Spans()
+    spans.add("navigate", 900)
+    spans.add("click", 40)
+
+    with profile_run(config, "run-1", logger, enabled=True, top=5, spans=spans) as profile:
+        _busy(50_000)
+
+    assert profile is not None and profile.trace_path is None
+    assert (profile.directory / "profile.pstats").stat().st_size > 0
+    assert "_busy" in (profile.directory / "summary.txt").read_text()
+    (message, extra), = logger.infos
+    summary = extra["profile"]
+    assert extra["step"] == "profile" and len(summary["top"]) <= 5
+    assert summary["slowest_actions"][0] == {"action": "navigate", "ms": 900}
+
+
+def test_profile_run_reports_trace_chunks(tmp_path: Path) -> None:
+    logger = RecordingLogger()
+    with profile_run(_config(tmp_path), "run-1", logger, enabled=True, trace=True) as profile:
+        # BrowserSession keeps every attempt as trace-<n>.zip next to trace_path.
+        for name in ("trace-2.zip", "trace-1.zip", "trace-10.zip"):
+            profile.trace_path.with_name(name).write_bytes(b"PK")
+
+    (message, extra), = logger.infos
+    assert [Path(path).name for path in extra["profile"]["trace"]] == ["trace-1.zip", "trace-2.zip", "trace-10.zip"]
+
+    with profile_run(_config(tmp_path), "run-2", logger, enabled=True, trace=True):
+        pass
+    assert logger.infos[-1][1]["profile"]["trace"] is None
+
+
+def test_profile_run_disabled_yields_none(tmp_path: Path) -> None:
+    logger = RecordingLogger()
+    with profile_run(_config(tmp_path), "run-1", logger, enabled=False) as profile:
+        pass
+    assert profile is None and not logger.infos
+    assert not (tmp_path / "data" / "profiles").exists()
+
+
+def test_prune_profiles_drops_oldest_runs(tmp_path: Path) -> None:
+    root = tmp_path / "profiles"
+    for index in range(4):
+        run = root / f"run-{index}"
+        run.mkdir(parents=True)
+        (run / "profile.pstats").write_bytes(b"x" * 100)
+        os.utime(run, (1_700_000_000 + index, 1_700_000_000 + index))
+
+    prune_profiles(root, 250, keep=root / "run-0")
+
+    assert sorted(path.name for path in root.iterdir()) == ["run-0", "run-3"]
+
+
+def test_profile_sampling(monkeypatch) -> None:
+    parser = argparse.ArgumentParser()
+    add_profile_arguments(parser)
+    monkeypatch.setattr("src.profiling.random.random", lambda: 0.5)
+    assert not should_profile(parser.parse_args([]))
+    assert should_profile(parser.parse_args(["--profile"]))
+    assert not should_profile(parser.parse_args(["--profile", "--profile-sample", "0.25"]))
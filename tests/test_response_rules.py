@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from src.config import CheckinResponseConfig
+from src.response_rules import ResponseFormatError, classify_checkin_response, response_matches
+from src.utils import SignInError
+
+
+@pytest.fixture
+def rules() -> CheckinResponseConfig:
+    return CheckinResponseConfig(
+        url_pattern=r"/api/user/sign_in$",
+        method="POST",
+        success={"success": True},
+        already={"success": False, "data.reason": ["already", "duplicate"]},
+    )
+
+
+def test_response_matches_url_and_method(rules) -> None:
+    assert response_matches(rules, "https://example.com/api/user/sign_in", "post")
+    assert not response_matches(rules, "https://example.com/api/user/sign_in", "GET")
+    assert not response_matches(rules, "https://example.com/api/user/self", "POST")
+
+
+def test_classify_success_and_already(rules) -> None:
+    ok = classify_checkin_response(rules, 200, json.dumps({"success": True, "message": ""}))
+    assert ok.status == "CHECKIN_OK"
+    already = classify_checkin_response(
+        rules, 200, json.dumps({"success": False, "data": {"reason": "duplicate"}})
+    )
+    assert already.status == "CHECKIN_ALREADY"
+
+
+def test_classify_failures(rules) -> None:
+    with pytest.raises(SignInError) as exc:
+        classify_checkin_response(rules, 401, "")
+    assert exc.value.error_code == "NEED_AUTH"
+    with pytest.raises(ResponseFormatError):
+        classify_checkin_response(rules, 200, "<html></html>")
+    with pytest.raises(SignInError) as rejected:
+        classify_checkin_response(rules, 200, json.dumps({"success": False, "message": "quota"}))
+    assert rejected.value.error_code == "UNKNOWN"
+    assert "quota" in str(rejected.value)
+
+
+def test_boolean_rules_do_not_match_integers(rules) -> None:
+    with pytest.raises(SignInError):
+        classify_checkin_response(rules, 200, json.dumps({"success": 1}))
+    numeric = CheckinResponseConfig(url_pattern="sign_in", success={"code": [0, 1]})
+    with pytest.raises(SignInError):
+        classify_checkin_response(numeric, 200, json.dumps({"code": False}))
+    assert classify_checkin_response(numeric, 200, json.dumps({"code": 1.0})).status == "CHECKIN_OK"
+
+
+def test_classify_without_success_rules_accepts_2xx_unless_rejected() -> None:
+    rules = CheckinResponseConfig(url_pattern="sign_in")
+    assert classify_checkin_response(rules, 200, "{}").status == "CHECKIN_OK"
+    with pytest.raises(SignInError):
+        classify_checkin_response(rules, 200, json.dumps({"success": False, "message": "no"}))
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import pytest
+
+from src import screenshots
+from src.config import RunConfig
+from src.screenshots import (
+    ScreenshotWriter,
+    capture_bytes,
+    capture_options,
+    email_attachment,
+    email_copy_path,
+    screenshot_file,
+)
+
+
+class LocatorStub:
+    def __init__(self, visible: bool, calls: list) -> None:
+        self.first = self
+        self._visible = visible
+        self._calls = calls
+
+    def is_visible(self) -> bool:
+        return self._visible
+
+    def screenshot(self, **kwargs) -> bytes:
+        self._calls.append(("element", kwargs))
+        return b"element"
+
+
+class PageStub:
+    def __init__(self, visible: dict) -> None:
+        self.calls: list = []
+        self._visible = visible
+
+    def locator(self, selector: str) -> LocatorStub:
+        return LocatorStub(self._visible.get(selector, False), self.calls)
+
+    def screenshot(self, **kwargs) -> bytes:
+        self.calls.append(("page", kwargs))
+        return b"page"
+
+
+def test_capture_clips_to_first_visible_element_and_falls_back_to_viewport() -> None:
+    run_cfg = RunConfig(screenshot_mode="element", screenshot_clip_selectors=("#missing", "main"))
+    page = PageStub({"main": True})
+    assert capture_bytes(page, run_cfg) == b"element"
+    assert page.calls == [("element", {"timeout": 2000, "type": "jpeg", "quality": 70})]
+
+    page = PageStub({})
+    assert capture_bytes(page, run_cfg) == b"page"
+    assert page.calls == [("page", {"full_page": False, "type": "jpeg", "quality": 70})]
+
+
+def test_webp_falls_back_to_jpeg_without_pillow(monkeypatch) -> None:
+    monkeypatch.setattr(screenshots, "Image", None)
+    run_cfg = RunConfig(screenshot_format="webp", screenshot_quality=55)
+    assert screenshot_file(Path("shot.png"), run_cfg) == Path("shot.jpg")
+    assert capture_options(run_cfg) == {"type": "jpeg", "quality": 55}
+    assert capture_options(RunConfig(screenshot_format="png")) == {"type": "png"}
+
+
+def test_writer_writes_in_background_and_drains(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(screenshots, "Image", None)
+    writer = ScreenshotWriter()
+    path = tmp_path / "shots" / "failure.jpg"
+    writer.submit(b"jpeg-bytes", path, RunConfig())
+    assert writer.drain(timeout=5)
+    assert path.read_bytes() == b"jpeg-bytes"
+    assert email_attachment(path) == path
+
+
+def test_writer_produces_downscaled_email_copy(tmp_path: Path) -> None:
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (2000, 1000), "white").save(buffer, format="PNG")
+    path = tmp_path / "failure.webp"
+
+    writer = ScreenshotWriter()
+    writer.submit(buffer.getvalue(), path, RunConfig(screenshot_format="webp", screenshot_email_max_width=500))
+    assert writer.drain(timeout=10)
+
+    assert Image.open(path).format == "WEBP"
+    assert email_attachment(path) == email_copy_path(path)
+    assert Image.open(email_copy_path(path)).size == (500, 250)
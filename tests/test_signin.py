@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
@@ -10,6 +11,7 @@ from zoneinfo import ZoneInfo
 from src.config import (
     Config,
     LoggingConfig,
+    MetricsConfig,
     NotifyConfig,
     RunConfig,
     ScheduleConfig,
@@ -17,17 +19,24 @@ from src.config import (
     SiteConfig,
     SMTPConfig,
 )
+from src.http_checkin import FastPathUnavailable
 from src.signin import CheckInOutcome, SignInError, main
+from src.store import RunRecord, open_store
+from src.timing import parse_spans
 
 
 class DummyLogger:
     def __init__(self) -> None:
         self.infos: List[tuple[str, Optional[dict]]] = []
+        self.warnings: List[tuple[str, Optional[dict]]] = []
         self.errors: List[tuple[str, Optional[dict]]] = []
 
     def info(self, message: str, extra: Optional[dict] = None) -> None:
         self.infos.append((message, extra))
 
+    def warning(self, message: str, extra: Optional[dict] = None, **kwargs) -> None:
+        self.warnings.append((message, extra))
+
     def error(self, message: str, extra: Optional[dict] = None) -> None:
         self.errors.append((message, extra))
 
@@ -42,10 +51,15 @@ class NotifierStub:
         self.success_calls.append((subject, body))
         return True
 
-    def send_failure(self, subject: str, body: str, attachments: Optional[List[Path]] = None) -> bool:
+    def send_failure(
+        self, subject: str, body: str, attachments: Optional[List[Path]] = None, error_code: Optional[str] = None
+    ) -> bool:
         self.failure_calls.append((subject, body, attachments))
         return True
 
+    def send_resolved(self, subject: str, body: str) -> bool:
+        return False
+
 
 @pytest.fixture
 def base_config(tmp_path: Path) -> Config:
@@ -119,17 +133,19 @@ def test_main_success_flow(tmp_path, base_config, notifier_stub, dummy_logger, d
     outcome = CheckInOutcome(status="CHECKIN_OK", notes="done", url="https://example.com/checkin")
     monkeypatch.setattr("src.signin._attempt_checkin", lambda *args, **kwargs: outcome)
 
-    history_records: List[List[str]] = []
+    history_records: List[RunRecord] = []
     monkeypatch.setattr(
-        "src.signin.append_history_entry",
-        lambda path, limit, row: history_records.append(row),
+        "src.signin.record_run",
+        lambda config, record: history_records.append(record),
     )
 
     exit_code = main()
 
     assert exit_code == 0
     assert len(history_records) == 1
-    assert history_records[0][3] == "CHECKIN_OK"
+    assert history_records[0].result == "CHECKIN_OK"
+    assert "email=" in history_records[0].spans
+    assert any(extra and "spans" in extra for _, extra in dummy_logger.infos)
     assert len(notifier_stub.success_calls) == 1
     subject, body = notifier_stub.success_calls[0]
     assert subject.startswith("[AnyRouter][OK]")
@@ -140,6 +156,7 @@ def test_main_success_flow(tmp_path, base_config, notifier_stub, dummy_logger, d
 def test_main_retry_and_failure_flow(tmp_path, base_config, notifier_stub, dummy_logger, deterministic_run, monkeypatch) -> None:
     config = base_config
     config.notify.email_on_failure_always = True
+    config.metrics = MetricsConfig(textfile=tmp_path / "textfile" / "anyrouter.prom")
     monkeypatch.setattr("src.signin.load_config", lambda: config)
     monkeypatch.setattr("src.signin.ensure_data_tree", lambda *args, **kwargs: None)
 
@@ -179,10 +196,10 @@ def test_main_retry_and_failure_flow(tmp_path, base_config, notifier_stub, dummy
 
     monkeypatch.setattr("src.signin.time", SleepModule)
 
-    history_records: List[List[str]] = []
+    history_records: List[RunRecord] = []
     monkeypatch.setattr(
-        "src.signin.append_history_entry",
-        lambda path, limit, row: history_records.append(row),
+        "src.signin.record_run",
+        lambda config, record: history_records.append(record),
     )
 
     exit_code = main()
@@ -191,10 +208,122 @@ def test_main_retry_and_failure_flow(tmp_path, base_config, notifier_stub, dummy
     assert attempts["count"] == 2
     assert sleeps == [2.5]
     assert len(history_records) == 1
-    assert history_records[0][3] == "CHECKIN_FAIL"
-    assert history_records[0][4] == "FINAL"
+    assert history_records[0].result == "CHECKIN_FAIL"
+    assert history_records[0].error_code == "FINAL"
     assert len(notifier_stub.failure_calls) == 1
     failure_subject, failure_body, attachments = notifier_stub.failure_calls[0]
     assert "FINAL" in failure_subject
     assert attachments and attachments[0] == Path(screenshot_path)
     assert notifier_stub.success_calls == []
+    metrics = config.metrics.textfile.read_text()
+    assert 'anyrouter_checkin_errors_total{account="default",error_code="FINAL"} 1' in metrics
+    assert 'anyrouter_checkin_attempts_total{account="default"} 2' in metrics
+
+
+def test_main_http_fast_path_skips_browser(base_config, notifier_stub, dummy_logger, deterministic_run, monkeypatch) -> None:
+    config = base_config
+    config.run.http_fast_path = True
+    config.site.checkin_api_url = "https://example.com/api/user/sign_in"
+    monkeypatch.setattr("src.signin.load_config", lambda: config)
+    monkeypatch.setattr("src.signin.ensure_data_tree", lambda *args, **kwargs: None)
+    records = []
+    monkeypatch.setattr("src.signin.record_run", lambda config, record: records.append(record))
+    monkeypatch.setattr(
+        "src.signin.http_checkin",
+        lambda config, client: CheckInOutcome(status="CHECKIN_OK", notes="Check-in API reported success"),
+    )
+
+    def browser_attempt(*args, **kwargs):
+        raise AssertionError("browser should not be used")
+
+    monkeypatch.setattr("src.signin._attempt_checkin", browser_attempt)
+
+    assert main() == 0
+    assert len(notifier_stub.success_calls) == 1
+    # The http span is the first one of the run and must still be recorded.
+    assert "http" in parse_spans(records[-1].spans)
+
+
+def test_main_http_fast_path_falls_back_on_auth_error(
+    base_config, notifier_stub, dummy_logger, deterministic_run, monkeypatch
+) -> None:
+    config = base_config
+    config.run.http_fast_path = True
+    config.site.checkin_api_url = "https://example.com/api/user/sign_in"
+    monkeypatch.setattr("src.signin.load_config", lambda: config)
+    monkeypatch.setattr("src.signin.ensure_data_tree", lambda *args, **kwargs: None)
+    monkeypatch.setattr("src.signin.record_run", lambda config, record: None)
+
+    def expired(config, client):
+        raise FastPathUnavailable("NEED_AUTH", "cookies expired")
+
+    monkeypatch.setattr("src.signin.http_checkin", expired)
+    browser_calls = []
+
+    def browser_attempt(*args, **kwargs):
+        browser_calls.append(kwargs["attempt"])
+        return CheckInOutcome(status="CHECKIN_ALREADY", notes="done")
+
+    monkeypatch.setattr("src.signin._attempt_checkin", browser_attempt)
+
+    assert main() == 0
+    assert browser_calls == [1]
+    assert dummy_logger.warnings and dummy_logger.warnings[0][1]["error_code"] == "NEED_AUTH"
+
+
+def test_main_skips_when_success_already_recorded(
+    base_config, notifier_stub, dummy_logger, deterministic_run, monkeypatch
+) -> None:
+    config = base_config
+    monkeypatch.setattr("src.signin.load_config", lambda: config)
+    monkeypatch.setattr("src.signin.ensure_data_tree", lambda *args, **kwargs: None)
+    configure_time(
+        monkeypatch,
+        [
+            datetime(2024, 1, 1, 7, 0, tzinfo=ZoneInfo("UTC")),
+            datetime(2024, 1, 1, 7, 0, 5, tzinfo=ZoneInfo("UTC")),
+            datetime(2024, 1, 1, 12, 30, tzinfo=ZoneInfo("UTC")),
+            datetime(2024, 1, 1, 12, 30, tzinfo=ZoneInfo("UTC")),
+            datetime(2024, 1, 1, 12, 30, 5, tzinfo=ZoneInfo("UTC")),
+        ],
+    )
+    attempts: List[int] = []
+
+    def attempt_stub(*args, **kwargs):
+        attempts.append(kwargs["attempt"])
+        return CheckInOutcome(status="CHECKIN_OK", notes="done")
+
+    monkeypatch.setattr("src.signin._attempt_checkin", attempt_stub)
+
+    assert main() == 0
+    assert main() == 0
+    assert attempts == [1]
+    runs = list(open_store(config).query_runs(account=config.account))
+    assert [run["result"] for run in runs] == ["SKIPPED", "CHECKIN_OK"]
+    assert "run-123" in runs[0]["notes"]
+
+    assert main(["--force"]) == 0
+    assert attempts == [1, 1]
+
+
+def test_failure_traces_are_kept_in_bounded_ring_buffer(tmp_path, base_config) -> None:
+    from src.signin import _keep_failure_trace
+
+    class SessionStub:
+        def stop_trace_chunk(self, path=None):
+            if path is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(b"z" * 100)
+            return path
+
+    config = base_config
+    config.run.trace_on_failure = True
+    config.run.trace_max_bytes = 250
+    for attempt in range(1, 5):
+        now = datetime(2024, 1, 1, 7, 0, attempt, tzinfo=ZoneInfo("UTC"))
+        _keep_failure_trace(SessionStub(), config, "run-1", ZoneInfo("UTC"), attempt=attempt, error_code="NAV_TIMEOUT")
+        trace = next((tmp_path / "traces").glob(f"*_a{attempt}_*.zip"))
+        os.utime(trace, (now.timestamp(), now.timestamp()))
+
+    kept = sorted(path.name.split("_")[2] for path in (tmp_path / "traces").iterdir())
+    assert kept == ["a3", "a4"]
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from email.message import EmailMessage
+from smtplib import SMTPServerDisconnected
+from typing import List
+
+import pytest
+
+from src.config import SMTPConfig
+from src.smtp_session import SMTPSession, pooled_smtp, send_message
+
+
+class FakeSMTP:
+    instances: List["FakeSMTP"] = []
+    drop_after: int | None = None
+
+    def __init__(self, host, port, timeout=30):
+        self.timeout = timeout
+        self.messages: List[EmailMessage] = []
+        self.logins = 0
+        self.quit_called = False
+        FakeSMTP.instances.append(self)
+
+    def ehlo(self):
+        return None
+
+    def starttls(self):
+        return None
+
+    def login(self, username, password):
+        self.logins += 1
+
+    def send_message(self, message):
+        if FakeSMTP.drop_after is not None and len(self.messages) >= FakeSMTP.drop_after:
+            raise SMTPServerDisconnected("Connection unexpectedly closed")
+        self.messages.append(message)
+        return {}
+
+    def quit(self):
+        self.quit_called = True
+
+    def close(self):
+        return None
+
+
+@pytest.fixture
+def smtp(monkeypatch) -> SMTPConfig:
+    FakeSMTP.instances = []
+    FakeSMTP.drop_after = None
+    monkeypatch.setattr("src.smtp_session.smtplib.SMTP_SSL", FakeSMTP)
+    return SMTPConfig(host="smtp.example.com", port=465, username="bot", password="secret")
+
+
+def _message(n: int) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = f"message {n}"
+    msg.set_content("body")
+    return msg
+
+
+def test_pooled_sends_share_one_login(smtp) -> None:
+    with pooled_smtp():
+        with pooled_smtp():
+            send_message(smtp, _message(1))
+        send_message(smtp, _message(2))
+        send_message(smtp, _message(3))
+        assert not FakeSMTP.instances[0].quit_called
+
+    (client,) = FakeSMTP.instances
+    assert client.logins == 1
+    assert len(client.messages) == 3
+    assert client.quit_called
+
+    send_message(smtp, _message(4))
+    assert len(FakeSMTP.instances) == 2 and FakeSMTP.instances[1].quit_called
+
+
+def test_session_reconnects_once_after_server_drop(smtp) -> None:
+    FakeSMTP.drop_after = 1
+    session = SMTPSession(smtp)
+    session.send(_message(1))
+    session.send(_message(2))  # first connection is dropped; a fresh one delivers it
+    assert session.connects == 2
+    assert session.sent == 2
+
+    FakeSMTP.drop_after = 0
+    fresh = SMTPSession(smtp)
+    with pytest.raises(SMTPServerDisconnected):
+        fresh.send(_message(3))
+
+
+def test_send_message_uses_configured_timeout(smtp) -> None:
+    send_message(smtp, _message(1), timeout=7.5)
+    with pooled_smtp():
+        send_message(smtp, _message(2), timeout=4)
+    assert [client.timeout for client in FakeSMTP.instances] == [7.5, 4]
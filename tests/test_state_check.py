@@ -6,6 +6,7 @@ from typing import Callable, Dict, Optional
 import pytest
 
 from src.config import (
+    CheckinResponseConfig,
     Config,
     LoggingConfig,
     NotifyConfig,
@@ -19,6 +20,7 @@ from src.state_check import (
     PlaywrightTimeoutError,
     ensure_logged_in,
     evaluate_checkin_state,
+    navigate,
     perform_checkin,
 )
 from src.utils import CheckInOutcome, SignInError
@@ -41,6 +43,33 @@ class LocatorStub:
             raise PlaywrightTimeoutError("click timeout")
         func(timeout=timeout)
 
+    def is_visible(self) -> bool:
+        return "wait_for" in self._behavior
+
+    def or_(self, other) -> "CombinedLocatorStub":
+        return CombinedLocatorStub([self, other])
+
+
+class CombinedLocatorStub:
+    def __init__(self, members) -> None:
+        self._members = members
+        self.first = self
+
+    def wait_for(self, *, state: str, timeout: int) -> None:
+        for member in self._members:
+            try:
+                member.wait_for(state=state, timeout=timeout)
+                return
+            except PlaywrightTimeoutError:
+                continue
+        raise PlaywrightTimeoutError("timeout")
+
+    def is_visible(self) -> bool:
+        return any(member.is_visible() for member in self._members)
+
+    def or_(self, other) -> "CombinedLocatorStub":
+        return CombinedLocatorStub([*self._members, other])
+
 
 class PageStub:
     def __init__(self, behaviors: Dict[str, Dict[str, Callable]], url: str = "https://example.com") -> None:
@@ -48,7 +77,41 @@ class PageStub:
         self.url = url
 
     def locator(self, selector: str) -> LocatorStub:
-        return LocatorStub(self._behaviors.get(selector, {}))
+        return LocatorStub(self._behaviors.get(selector.removesuffix(" >> visible=true"), {}))
+
+
+class DomLocatorStub:
+    """Resolves like Playwright: ``.first`` is the first match in document order."""
+
+    def __init__(self, elements) -> None:
+        self._elements = elements
+
+    @property
+    def first(self) -> "DomLocatorStub":
+        return DomLocatorStub(self._elements[:1])
+
+    def or_(self, other: "DomLocatorStub") -> "DomLocatorStub":
+        merged = [element for element in DOM if element in self._elements or element in other._elements]
+        return DomLocatorStub(merged)
+
+    def is_visible(self) -> bool:
+        return bool(self._elements) and self._elements[0][1]
+
+    def wait_for(self, *, state: str, timeout: int) -> None:
+        if not self.is_visible():
+            raise PlaywrightTimeoutError("timeout")
+
+
+DOM = [("#login", False), ("#ok", True)]  # collapsed login button precedes the account menu
+
+
+class DomPageStub:
+    url = "https://example.com"
+
+    def locator(self, selector: str) -> DomLocatorStub:
+        base = selector.removesuffix(" >> visible=true")
+        only_visible = base != selector
+        return DomLocatorStub([element for element in DOM if element[0] == base and (element[1] or not only_visible)])
 
 
 @pytest.fixture
@@ -95,6 +158,10 @@ def test_ensure_logged_in_validates_confirmation(base_config):
     ensure_logged_in(page, base_config)
 
 
+def test_ensure_logged_in_ignores_hidden_earlier_candidate(base_config):
+    ensure_logged_in(DomPageStub(), base_config)
+
+
 def test_ensure_logged_in_raises_when_confirmation_missing(base_config):
     page = PageStub({})
     with pytest.raises(SignInError) as exc:
@@ -164,3 +231,126 @@ def test_perform_checkin_raises_when_no_success_indicators(base_config):
     with pytest.raises(SignInError) as exc:
         perform_checkin(page, config)
     assert exc.value.error_code == "UNKNOWN"
+
+
+def test_ensure_logged_in_races_groups_with_one_shared_timeout(base_config):
+    config = replace(
+        base_config,
+        selectors=replace(
+            base_config.selectors,
+            login_required=("#login", "#signin", "#oauth"),
+            login_confirmed=("#ok",),
+        ),
+    )
+    timeouts = []
+    page = PageStub({"#ok": {"wait_for": lambda **kwargs: timeouts.append(kwargs["timeout"])}})
+    ensure_logged_in(page, config)
+    assert len(timeouts) == 1
+    assert timeouts[0] <= config.run.action_timeout_ms
+
+
+def test_ensure_logged_in_prefers_login_required_when_both_visible(base_config):
+    page = PageStub({"#login": {"wait_for": lambda **_: None}, "#ok": {"wait_for": lambda **_: None}})
+    with pytest.raises(SignInError) as exc:
+        ensure_logged_in(page, base_config)
+    assert exc.value.error_code == "NEED_AUTH"
+
+
+class ResponseStub:
+    def __init__(self, url: str, status: int, body: str, method: str = "POST") -> None:
+        self.url = url
+        self.status = status
+        self._body = body
+        self.request = type("RequestStub", (), {"method": method})()
+
+    def text(self) -> str:
+        return self._body
+
+
+class ExpectResponseStub:
+    def __init__(self, page: "NetworkPageStub", predicate, timeout: int) -> None:
+        self._page = page
+        self._predicate = predicate
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+    @property
+    def value(self):
+        for response in self._page.responses:
+            if self._predicate(response):
+                return response
+        raise PlaywrightTimeoutError("no response")
+
+
+class NetworkPageStub(PageStub):
+    def __init__(self, behaviors, responses) -> None:
+        super().__init__(behaviors)
+        self.responses = responses
+
+    def expect_response(self, predicate, *, timeout: int) -> ExpectResponseStub:
+        return ExpectResponseStub(self, predicate, timeout)
+
+
+@pytest.fixture
+def network_config(base_config):
+    return replace(
+        base_config,
+        checkin_response=CheckinResponseConfig(url_pattern="/api/sign_in", success={"success": True}),
+    )
+
+
+def test_perform_checkin_uses_network_response(network_config):
+    behaviors = {"button.checkin": {"wait_for": lambda **_: None, "click": lambda **_: None}}
+    response = ResponseStub("https://example.com/api/sign_in", 200, '{"success": true}')
+    page = NetworkPageStub(behaviors, [response])
+    outcome = perform_checkin(page, network_config)
+    assert outcome.status == "CHECKIN_OK"
+    assert "API" in outcome.notes
+
+
+def test_perform_checkin_falls_back_to_dom_without_response(network_config):
+    behaviors = {
+        "button.checkin": {"wait_for": lambda **_: None, "click": lambda **_: None},
+        ".success": {"wait_for": lambda **_: None},
+    }
+    page = NetworkPageStub(behaviors, [ResponseStub("https://example.com/other", 200, "{}")])
+    outcome = perform_checkin(page, network_config)
+    assert outcome.status == "CHECKIN_OK"
+    assert outcome.notes == "Success indicator detected"
+
+
+class NavigationPageStub(PageStub):
+    def __init__(self, behaviors, *, goto_error: bool = False) -> None:
+        super().__init__(behaviors)
+        self.goto_calls = []
+        self._goto_error = goto_error
+
+    def goto(self, url: str, *, wait_until: str, timeout: int) -> None:
+        self.goto_calls.append((url, wait_until, timeout))
+        if self._goto_error:
+            raise PlaywrightTimeoutError("goto timeout")
+
+
+def test_navigate_uses_strategy_and_ready_selectors(base_config):
+    config = replace(
+        base_config,
+        run=replace(base_config.run, nav_wait_until="commit", nav_ready_selectors=("button.checkin",)),
+    )
+    page = NavigationPageStub({"button.checkin": {"wait_for": lambda **_: None}})
+    timings = navigate(page, "https://example.com/checkin", config)
+    assert page.goto_calls == [("https://example.com/checkin", "commit", config.run.nav_timeout_ms)]
+    assert timings["wait_until"] == "commit"
+    assert {"goto_ms", "ready_ms", "total_ms"} <= set(timings)
+
+
+def test_navigate_raises_when_page_never_ready(base_config):
+    config = replace(base_config, run=replace(base_config.run, nav_ready_selectors=("#never",)))
+    with pytest.raises(SignInError) as exc:
+        navigate(NavigationPageStub({}), "https://example.com", config)
+    assert exc.value.error_code == "NAV_TIMEOUT"
+    with pytest.raises(SignInError):
+        navigate(NavigationPageStub({}, goto_error=True), "https://example.com", base_config)
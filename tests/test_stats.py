@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from zoneinfo import ZoneInfo
+
+from src.logs import iter_log_records
+from src.stats import LatencyHistogram, aggregate_log_steps, aggregate_runs, schedule_slot
+
+UTC = ZoneInfo("UTC")
+TIMES = ("08:30", "12:30", "20:30")
+
+
+def _row(ts: str, result: str, duration: int, *, retries: int = 0, error_code: str = "") -> dict:
+    return {
+        "ts": ts,
+        "run_id": "r",
+        "stage": "CHECKIN",
+        "result": result,
+        "error_code": error_code,
+        "retry_count": str(retries),
+        "duration_ms": str(duration),
+        "notes": "",
+    }
+
+
+def test_histogram_percentiles_are_close_to_exact() -> None:
+    hist = LatencyHistogram()
+    for value in range(1, 1001):
+        hist.add(value)
+    for q, exact in ((50, 500), (95, 950), (99, 990)):
+        assert abs(hist.percentile(q) - exact) <= exact * 0.05
+    assert hist.percentile(100) == 1000
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_schedule_slot_uses_latest_slot_and_wraps_before_first() -> None:
+    assert schedule_slot(datetime(2024, 1, 1, 8, 31, tzinfo=UTC), TIMES) == "08:30"
+    assert schedule_slot(datetime(2024, 1, 1, 13, 0, tzinfo=UTC), TIMES) == "12:30"
+    assert schedule_slot(datetime(2024, 1, 1, 2, 0, tzinfo=UTC), TIMES) == "20:30"
+
+
+def test_aggregate_runs_groups_by_day_slot_and_account() -> None:
+    rows = [
+        ("alice", _row("2024-01-01T08:30:05+00:00", "CHECKIN_OK", 4000)),
+        ("alice", _row("2024-01-01T12:30:09+00:00", "SKIPPED", 0)),
+        ("bob", _row("2024-01-01T08:30:20+00:00", "CHECKIN_FAIL", 20000, retries=2, error_code="NAV_TIMEOUT")),
+        ("bob", _row("2024-01-02T08:30:06+02:00", "CHECKIN_ALREADY", 5000)),
+        ("bob", {**_row("2024-01-02T09:00:00+00:00", "AUTH_OK", 1), "stage": "AUTH"}),
+    ]
+
+    report = aggregate_runs(rows, tz=UTC, times=TIMES)
+
+    total = report["total"]["all"].as_dict()
+    assert total["runs"] == 3 and total["skipped"] == 1
+    assert abs(total["success_rate"] - 2 / 3) < 1e-9
+    assert abs(total["retry_rate"] - 1 / 3) < 1e-9
+    assert total["errors"] == {"NAV_TIMEOUT": 1}
+    assert report["account"]["bob"].as_dict()["runs"] == 2
+    assert set(report["day"]) == {"2024-01-01", "2024-01-02"}
+    # 08:30+02:00 is 06:30 UTC, before the first slot, so it belongs to the previous evening's run.
+    assert report["slot"]["20:30"].runs == 1
+    assert report["slot"]["08:30"].runs == 2
+
+
+def test_aggregate_runs_accepts_single_digit_times_and_logs_bad_rows(caplog) -> None:
+    rows = [
+        ("alice", _row("2024-01-01T08:06:00+00:00", "CHECKIN_OK", 4000)),
+        ("alice", {**_row("yesterday", "CHECKIN_OK", 4000), "run_id": "r-bad"}),
+    ]
+
+    with caplog.at_level(logging.WARNING, logger="src.stats"):
+        report = aggregate_runs(rows, tz=UTC, times=("8:5", "20:30"))
+
+    assert report["total"]["all"].runs == 1
+    assert report["slot"]["08:05"].runs == 1
+    assert "r-bad" in caplog.text and "'yesterday'" in caplog.text
+    with pytest.raises(ValueError):
+        aggregate_runs(rows, tz=UTC, times=("8h30",))
+
+
+def test_log_steps_stream_rotated_segments(tmp_path: Path) -> None:
+    log_file = tmp_path / "signin.jsonl"
+    (tmp_path / "signin.jsonl.1").write_text(json.dumps({"step": "navigate", "duration_ms": 900}) + "\n")
+    log_file.write_text(
+        "\n".join(
+            [
+                json.dumps({"step": "navigate", "duration_ms": 1100}),
+                json.dumps({"step": "attempt"}),
+                "not json",
+            ]
+        )
+        + "\n"
+    )
+
+    steps = aggregate_log_steps(iter_log_records(log_file))
+
+    assert set(steps) == {"navigate"}
+    assert steps["navigate"].count == 2
+    assert steps["navigate"].percentile(99) == 1100
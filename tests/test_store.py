@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import csv
+import io
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+from zoneinfo import ZoneInfo
+
+from src.config import (
+    AccountConfig,
+    Config,
+    LoggingConfig,
+    NotifyConfig,
+    RunConfig,
+    ScheduleConfig,
+    SelectorConfig,
+    SiteConfig,
+    select_accounts,
+)
+from src.store import RunRecord, RunStore, open_store, record_run
+
+
+def _ts(day: int, hour: int = 7) -> datetime:
+    return datetime(2024, 1, day, hour, tzinfo=ZoneInfo("UTC"))
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> RunStore:
+    return RunStore(tmp_path / "runs.db")
+
+
+@pytest.fixture
+def fleet_config(tmp_path: Path) -> Config:
+    data_dir = tmp_path / "data"
+    return Config(
+        timezone="UTC",
+        schedule=ScheduleConfig(),
+        notify=NotifyConfig(),
+        run=RunConfig(),
+        selectors=SelectorConfig(),
+        site=SiteConfig(base_url="https://example.com", checkin_url="https://example.com/checkin"),
+        logging=LoggingConfig(log_file=tmp_path / "logs.jsonl"),
+        project_root=tmp_path,
+        data_dir=data_dir,
+        history_file=data_dir / "history.csv",
+        screenshots_dir=tmp_path / "screenshots",
+        userdata_dir=data_dir / "userdata",
+        meta_dir=data_dir / "meta",
+        accounts=(AccountConfig(name="alice"), AccountConfig(name="bob")),
+        store_file=data_dir / "runs.db",
+    )
+
+
+def test_query_filters_by_account_day_and_error(store: RunStore) -> None:
+    store.record_run("alice", RunRecord(ts=_ts(1), run_id="r1", stage="CHECKIN", result="CHECKIN_OK"))
+    store.record_run(
+        "bob", RunRecord(ts=_ts(2), run_id="r2", stage="CHECKIN", result="CHECKIN_FAIL", error_code="NEED_AUTH")
+    )
+    store.record_run(
+        "bob", RunRecord(ts=_ts(5), run_id="r3", stage="CHECKIN", result="CHECKIN_FAIL", error_code="NEED_AUTH")
+    )
+
+    failures = list(store.query_runs(error_code="NEED_AUTH", since=date(2024, 1, 2), until=date(2024, 1, 4)))
+    assert [(row["account"], row["run_id"]) for row in failures] == [("bob", "r2")]
+    assert [row["run_id"] for row in store.query_runs(account="bob")] == ["r3", "r2"]
+    assert [row["run_id"] for row in store.query_runs(limit=1)] == ["r3"]
+    assert {(row["account"], row["result"], row["runs"]) for row in store.summary()} == {
+        ("alice", "CHECKIN_OK", 1),
+        ("bob", "CHECKIN_FAIL", 2),
+    }
+
+    out = io.StringIO()
+    assert store.export_csv(out, account="alice") == 1
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows[0][:3] == ["ts", "account", "run_id"]
+    assert rows[1][1:3] == ["alice", "r1"]
+
+
+def test_last_checkin_and_success_email_state_are_per_account_and_day(store: RunStore) -> None:
+    store.record_run("alice", RunRecord(ts=_ts(1), run_id="r1", stage="CHECKIN", result="CHECKIN_FAIL"))
+    assert store.last_checkin("alice", date(2024, 1, 1)) is None
+    store.record_run("alice", RunRecord(ts=_ts(1, 12), run_id="r2", stage="CHECKIN", result="CHECKIN_ALREADY"))
+    assert store.last_checkin("alice", date(2024, 1, 1))["run_id"] == "r2"
+    assert store.last_checkin("alice", date(2024, 1, 2)) is None
+    assert store.last_checkin("bob", date(2024, 1, 1)) is None
+
+    assert store.should_send_success_email("alice", _ts(1))
+    store.record_success_email_sent("alice", _ts(1))
+    assert not store.should_send_success_email("alice", _ts(1, 20))
+    assert store.should_send_success_email("alice", _ts(2))
+    assert store.should_send_success_email("bob", _ts(1))
+
+
+def test_accounts_share_one_store_and_mirror_csv(fleet_config: Config) -> None:
+    accounts = select_accounts(fleet_config)
+    threads = [
+        threading.Thread(
+            target=lambda account=account, i=i: record_run(
+                account, RunRecord(ts=_ts(1), run_id=f"{account.account}-{i}", stage="CHECKIN", result="CHECKIN_OK")
+            )
+        )
+        for account in accounts
+        for i in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store = open_store(accounts[0])
+    assert store is open_store(fleet_config)
+    assert len(list(store.query_runs(account="alice"))) == 20
+    assert len(list(store.query_runs(account="bob"))) == 20
+    with accounts[1].history_file.open(newline="", encoding="utf-8") as fh:
+        assert len(list(csv.reader(fh))) == 21
+
+    fleet_config.run.history_csv = False
+    (alice,) = select_accounts(fleet_config, ["alice"])
+    record_run(alice, RunRecord(ts=_ts(2), run_id="no-csv", stage="CHECKIN", result="CHECKIN_OK"))
+    with alice.history_file.open(newline="", encoding="utf-8") as fh:
+        assert len(list(csv.reader(fh))) == 21
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import pytest
+
+from src.timing import Spans, parse_spans
+
+
+def test_spans_accumulate_and_round_trip(monkeypatch) -> None:
+    ticks = iter([0.0, 0.120, 1.0, 1.030, 2.0, 2.5])
+    monkeypatch.setattr("src.timing.perf_counter", lambda: next(ticks))
+    spans = Spans()
+
+    with spans.span("navigate"):
+        pass
+    with spans.span("navigate"):
+        pass
+    with pytest.raises(RuntimeError):
+        with spans.span("click"):
+            raise RuntimeError("boom")
+
+    assert spans.as_dict() == {"navigate": 150, "click": 500}
+    assert spans.summary() == "navigate=150;click=500"
+    assert parse_spans(spans.summary()) == spans.as_dict()
+    assert parse_spans("bad;x=;launch=12") == {"launch": 12}
+    assert not Spans()